@@ -53,6 +53,11 @@ int ShowGrid = -1;
 int DefaultTemp = -1;
 
 float pixels[64];
+int16_t binaryPayload[64];
+uint32_t frameSequence = 0;
+bool binaryMode = false;
+bool streaming = false;
+unsigned long lastStreamFrameMs = 0;
 
 float HDTemp[80][80];
 
@@ -60,11 +65,12 @@ Adafruit_GFX_Button KeyPadBtn[12];
 
 Adafruit_AMG88xx ThermalSensor;
 
-void UpdateThermalData();
+void UpdateThermalData(bool withSequence);
 void InterpolateRows();
 void InterpolateCols();
 void DisplayGradient();
 uint16_t GetColor(float val);
+void sendBinaryFrame(const float* values, uint8_t rows, uint8_t cols, int16_t* payload);
 void SetTempScale();
 void Getabcd();
 void DrawLegend();
@@ -143,13 +149,24 @@ void setup() {
 void loop() {
   if (Serial.available()) {
     char command = Serial.read();
-    if (command == 'T') {
-      UpdateThermalData();
+    if (command == 'T' || command == 'B') {
+      binaryMode = command == 'B';
+      UpdateThermalData(false);
+    } else if (command == 'S') {
+      streaming = true;
+    } else if (command == 'P') {
+      streaming = false;
     }
   }
+
+  // Modo continuo: el AMG8833 refresca a 10 Hz, se envía cada lectura sin esperar una petición
+  if (streaming && millis() - lastStreamFrameMs >= 100) {
+    lastStreamFrameMs = millis();
+    UpdateThermalData(true);
+  }
 }
 
-void UpdateThermalData() {
+void UpdateThermalData(bool withSequence) {
   ThermalSensor.readPixels(pixels);
 
   SetTempScale();
@@ -160,7 +177,17 @@ void UpdateThermalData() {
 
   DisplayGradient();
 
-  Serial.println("START DATA");
+  if (binaryMode) {
+    sendBinaryFrame(pixels, 8, 8, binaryPayload);
+    return;
+  }
+
+  Serial.print("START DATA");
+  if (withSequence) {
+    Serial.print(" ");
+    Serial.print(frameSequence++);
+  }
+  Serial.println();
 
   for (row = 0; row < 8; row++) {
     for (col = 0; col < 8; col++) {
@@ -323,4 +350,41 @@ void drawMeasurement() {
   Display.setTextSize(2);
   sprintf(buf, "%s:%2d", "Temp", centerTemp);
   Display.print(buf);
+}
+
+// Formato binario (comando 'B'): cabecera de 12 bytes little-endian
+// magic 0xA5 0x5A, filas, columnas, secuencia (uint32) y CRC32 de filas, columnas,
+// secuencia y carga útil; después la carga útil en int16 con centésimas de grado.
+uint32_t crc32Update(uint32_t crc, const uint8_t* data, size_t length) {
+  for (size_t i = 0; i < length; i++) {
+    crc ^= data[i];
+    for (uint8_t bit = 0; bit < 8; bit++) {
+      crc = (crc >> 1) ^ (0xEDB88320UL & (0UL - (crc & 1UL)));
+    }
+  }
+  return crc;
+}
+
+void sendBinaryFrame(const float* values, uint8_t rows, uint8_t cols, int16_t* payload) {
+  uint16_t count = (uint16_t)rows * cols;
+  for (uint16_t i = 0; i < count; i++) {
+    float centi = values[i] * 100.0f;
+    if (centi > 32767.0f) centi = 32767.0f;
+    if (centi < -32768.0f) centi = -32768.0f;
+    payload[i] = (int16_t)lroundf(centi);
+  }
+
+  uint8_t header[12];
+  uint32_t sequence = frameSequence++;
+  header[0] = 0xA5;
+  header[1] = 0x5A;
+  header[2] = rows;
+  header[3] = cols;
+  memcpy(&header[4], &sequence, 4);
+  uint32_t crc = crc32Update(0xFFFFFFFFUL, &header[2], 6);
+  crc = crc32Update(crc, (const uint8_t*)payload, count * 2) ^ 0xFFFFFFFFUL;
+  memcpy(&header[8], &crc, 4);
+
+  Serial.write(header, sizeof(header));
+  Serial.write((const uint8_t*)payload, count * 2);
 }
\ No newline at end of file
@@ -53,14 +53,19 @@ int ShowGrid = -1;
 int DefaultTemp = -1;
 
 float pixels[32 * 24];
+int16_t binaryPayload[32 * 24];
+uint32_t frameSequence = 0;
+bool binaryMode = false;
+bool streaming = false;
 
 Adafruit_GFX_Button KeyPadBtn[12];
 
 Adafruit_MLX90640 mlx;
 
-void UpdateThermalData();
+void UpdateThermalData(bool withSequence);
 void DisplayMLXData();
 uint16_t GetColor(float val);
+void sendBinaryFrame(const float* values, uint8_t rows, uint8_t cols, int16_t* payload);
 void SetTempScale();
 void Getabcd();
 void DrawLegend();
@@ -140,19 +145,39 @@ void setup() {
 void loop() {
   if (Serial.available()) {
     char command = Serial.read();
-    if (command == 'T') {
-      UpdateThermalData();
+    if (command == 'T' || command == 'B') {
+      binaryMode = command == 'B';
+      UpdateThermalData(false);
+    } else if (command == 'S') {
+      streaming = true;
+    } else if (command == 'P') {
+      streaming = false;
     }
   }
+
+  // Modo continuo: cada lectura del sensor se envía sin esperar una petición
+  if (streaming) {
+    UpdateThermalData(true);
+  }
 }
 
-void UpdateThermalData() {
+void UpdateThermalData(bool withSequence) {
   mlx.readPixels(pixels);
 
   SetTempScale();
 
   DisplayMLXData();
-  Serial.println("START DATA");
+  if (binaryMode) {
+    sendBinaryFrame(pixels, 24, 32, binaryPayload);
+    return;
+  }
+
+  Serial.print("START DATA");
+  if (withSequence) {
+    Serial.print(" ");
+    Serial.print(frameSequence++);
+  }
+  Serial.println();
 
   for (row = 0; row < 24; row++) {
     for (col = 0; col < 32; col++) {
@@ -289,4 +314,41 @@ void drawMeasurement() {
   Display.setTextSize(2);
   sprintf(buf, "%s:%.1fC", "Temp", centerTemp);
   Display.print(buf);
+}
+
+// Formato binario (comando 'B'): cabecera de 12 bytes little-endian
+// magic 0xA5 0x5A, filas, columnas, secuencia (uint32) y CRC32 de filas, columnas,
+// secuencia y carga útil; después la carga útil en int16 con centésimas de grado.
+uint32_t crc32Update(uint32_t crc, const uint8_t* data, size_t length) {
+  for (size_t i = 0; i < length; i++) {
+    crc ^= data[i];
+    for (uint8_t bit = 0; bit < 8; bit++) {
+      crc = (crc >> 1) ^ (0xEDB88320UL & (0UL - (crc & 1UL)));
+    }
+  }
+  return crc;
+}
+
+void sendBinaryFrame(const float* values, uint8_t rows, uint8_t cols, int16_t* payload) {
+  uint16_t count = (uint16_t)rows * cols;
+  for (uint16_t i = 0; i < count; i++) {
+    float centi = values[i] * 100.0f;
+    if (centi > 32767.0f) centi = 32767.0f;
+    if (centi < -32768.0f) centi = -32768.0f;
+    payload[i] = (int16_t)lroundf(centi);
+  }
+
+  uint8_t header[12];
+  uint32_t sequence = frameSequence++;
+  header[0] = 0xA5;
+  header[1] = 0x5A;
+  header[2] = rows;
+  header[3] = cols;
+  memcpy(&header[4], &sequence, 4);
+  uint32_t crc = crc32Update(0xFFFFFFFFUL, &header[2], 6);
+  crc = crc32Update(crc, (const uint8_t*)payload, count * 2) ^ 0xFFFFFFFFUL;
+  memcpy(&header[8], &crc, 4);
+
+  Serial.write(header, sizeof(header));
+  Serial.write((const uint8_t*)payload, count * 2);
 }
\ No newline at end of file
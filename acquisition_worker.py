@@ -0,0 +1,110 @@
+import threading
+from collections import deque
+
+from app_parameters import ACQUISITION_READ_TIMEOUT_S, FRAME_QUEUE_SIZE
+from telemetry import telemetry
+
+
+class LatestFrameQueue:
+    """
+    Cola acotada entre el hilo de adquisición y los consumidores.
+    Si está llena se descarta el fotograma más antiguo: el productor nunca se bloquea.
+    """
+
+    def __init__(self, maxsize=FRAME_QUEUE_SIZE):
+        self._frames = deque(maxlen=max(1, maxsize))
+        self._not_empty = threading.Condition(threading.Lock())
+        self.dropped_frames = 0
+
+    def put(self, frame):
+        with self._not_empty:
+            if len(self._frames) == self._frames.maxlen:
+                self.dropped_frames += 1
+            self._frames.append(frame)
+            self._not_empty.notify()
+
+    def get(self, timeout=None):
+        with self._not_empty:
+            if not self._frames:
+                self._not_empty.wait(timeout)
+            if not self._frames:
+                return None
+            return self._frames.popleft()
+
+    def get_latest(self):
+        with self._not_empty:
+            if not self._frames:
+                return None
+            frame = self._frames.pop()
+            self.dropped_frames += len(self._frames)
+            self._frames.clear()
+            return frame
+
+    def drain(self):
+        with self._not_empty:
+            frames = list(self._frames)
+            self._frames.clear()
+            return frames
+
+    def clear(self):
+        with self._not_empty:
+            self._frames.clear()
+
+    def __len__(self):
+        return len(self._frames)
+
+
+class AcquisitionWorker(threading.Thread):
+    """
+    Hilo que consume un FrameSource (sensor serial, reproducción de un registro o
+    simulador) y entrega cada fotograma a la cola sin pasar por el bucle de eventos de Qt.
+    Si se indica `frame_filter` (FrameFilter), cada fotograma se calibra y filtra aquí,
+    fuera del hilo de la interfaz. Con `alarm_engine` (AlarmEngine) las alarmas se evalúan
+    con todos los fotogramas, también los que la interfaz no llega a dibujar.
+    """
+
+    def __init__(self, source, frame_queue, frame_filter=None, alarm_engine=None):
+        super().__init__(name="AcquisitionWorker", daemon=True)
+        self.source = source
+        self.frame_queue = frame_queue
+        self.frame_filter = frame_filter
+        self.alarm_engine = alarm_engine
+        self.error = None
+        self.frames_received = 0
+        self._stop_event = threading.Event()
+
+    @property
+    def dropped_frames(self):
+        return self.source.dropped_frames
+
+    @property
+    def timeouts(self):
+        return self.source.timeouts
+
+    def request_stop(self):
+        """Pide al hilo que termine sin esperarlo (stop() además espera a que termine)."""
+        self._stop_event.set()
+
+    def stop(self, timeout=None):
+        self.request_stop()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(ACQUISITION_READ_TIMEOUT_S + 1 if timeout is None else timeout)
+
+    def run(self):
+        for frame in self.source.frames(self._stop_event):
+            self._publish(frame)
+            if self._stop_event.is_set():
+                break
+        self.error = self.source.error
+
+    def _publish(self, frame):
+        if self.frame_filter is not None:
+            started = telemetry.start()
+            self.frame_filter.apply(frame.data)
+            telemetry.stop("filter", started)
+        if self.alarm_engine is not None:
+            started = telemetry.start()
+            self.alarm_engine.process(frame)
+            telemetry.stop("alarms", started)
+        self.frames_received += 1
+        self.frame_queue.put(frame)
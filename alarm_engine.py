@@ -0,0 +1,424 @@
+import csv
+import math
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from app_parameters import ALARM_RULES, ALARM_DEFAULT_HYSTERESIS_C, ALARM_DEFAULT_DEBOUNCE_FRAMES, \
+    ALARM_RATE_TIME_CONSTANT_S, ALARM_DEFAULT_NOISE_SIGMA
+from frame_stats import FrameStatsEngine
+
+try:
+    from scipy import ndimage
+except ImportError:
+    ndimage = None
+
+ALARM_RULE_TYPES = ("threshold", "rate", "hotspot")
+
+# state: "raised" al activarse la alarma, "cleared" al volver a la normalidad.
+# hotspots: tupla de Hotspot (solo reglas "hotspot")
+AlarmEvent = namedtuple("AlarmEvent", [
+    "timestamp", "sequence", "rule", "kind", "state", "value", "threshold", "target", "hotspots"
+])
+Hotspot = namedtuple("Hotspot", ["row", "col", "pixels", "max"])
+
+_EIGHT_CONNECTED = np.ones((3, 3), dtype=bool)
+
+
+def label_components(mask):
+    """
+    Componentes conexas (vecindad de 8) de una máscara booleana: (etiquetas, número).
+    Con scipy usa ndimage.label; sin él, propaga la etiqueta máxima de cada vecindario
+    hasta que no cambia (unas pocas iteraciones en un sensor de 24x32).
+    """
+    if ndimage is not None:
+        return ndimage.label(mask, structure=_EIGHT_CONNECTED)
+    pixels = int(np.count_nonzero(mask))
+    if not pixels:
+        return np.zeros(mask.shape, dtype=np.int32), 0
+    rows, cols = mask.shape
+    padded = np.zeros((rows + 2, cols + 2), dtype=np.int32)
+    labels = padded[1:-1, 1:-1]
+    labels[mask] = np.arange(1, pixels + 1, dtype=np.int32)
+    vertical = np.empty((rows, cols + 2), dtype=np.int32)
+    spread = np.empty((rows, cols), dtype=np.int32)
+    while True:
+        # Máximo del vecindario 3x3 separado en filas y columnas: 4 operaciones en lugar de 9
+        np.maximum(padded[:-2], padded[1:-1], out=vertical)
+        np.maximum(vertical, padded[2:], out=vertical)
+        np.maximum(vertical[:, :-2], vertical[:, 1:-1], out=spread)
+        np.maximum(spread, vertical[:, 2:], out=spread)
+        spread *= mask
+        if np.array_equal(spread, labels):
+            break
+        np.copyto(labels, spread)
+    unique, inverse = np.unique(labels[mask], return_inverse=True)
+    compact = np.zeros(mask.shape, dtype=np.int32)
+    compact[mask] = inverse + 1
+    return compact, len(unique)
+
+
+class AlarmRule:
+    """
+    Regla con histéresis y antirrebote: se activa cuando el valor medido supera el umbral
+    durante `debounce` fotogramas seguidos y se desactiva cuando baja de umbral - histéresis
+    otros tantos. Con direction="below" se vigilan temperaturas bajas (umbral + histéresis).
+    El objetivo es "frame" (todo el fotograma) o el nombre de una ROI de STATS_ROIS.
+    Con `noise_sigma` > 0 la histéresis crece hasta noise_sigma veces el ruido temporal
+    medio del objetivo (FrameFilter.noise_std), así el ruido del sensor no hace oscilar la alarma.
+    """
+
+    kind = None
+
+    def __init__(self, name, threshold, target="frame", statistic="max", direction="above",
+                 hysteresis=ALARM_DEFAULT_HYSTERESIS_C, debounce=ALARM_DEFAULT_DEBOUNCE_FRAMES,
+                 noise_sigma=ALARM_DEFAULT_NOISE_SIGMA):
+        if statistic not in ("min", "max", "mean"):
+            raise ValueError(f"Regla '{name}': estadístico desconocido '{statistic}' (min, max o mean).")
+        if direction not in ("above", "below"):
+            raise ValueError(f"Regla '{name}': dirección desconocida '{direction}' (above o below).")
+        self.name = name
+        self.threshold = float(threshold)
+        self.target = target
+        self.statistic = statistic
+        self.sign = 1.0 if direction == "above" else -1.0
+        self.hysteresis = float(hysteresis)
+        self.debounce = max(1, int(debounce))
+        self.noise_sigma = max(0.0, float(noise_sigma))
+        self.reset()
+
+    def reset(self):
+        self.band = self.hysteresis
+        self.active = False
+        self._streak = 0
+        self._missing_target = False
+
+    def _target_value(self, stats, statistic=None):
+        statistic = statistic or self.statistic
+        if self.target == "frame":
+            return getattr(stats, statistic)
+        try:
+            position = stats.roi_names.index(self.target)
+        except ValueError:
+            if not self._missing_target:
+                print(f"Aviso: la ROI '{self.target}' de la regla '{self.name}' no existe. Se ignora.")
+                self._missing_target = True
+            return None
+        return float(getattr(stats, f"roi_{statistic}")[position])
+
+    def adapt_to_noise(self, noise, noise_stats):
+        """Ajusta la histéresis al ruido por píxel `noise` (°C) y a sus estadísticas."""
+        level = self._target_value(noise_stats, "mean")
+        if level is not None:
+            self.band = max(self.hysteresis, self.noise_sigma * level)
+
+    def measure(self, data, stats, timestamp):
+        return self._target_value(stats)
+
+    def _crossed(self, value):
+        if self.active:
+            return self.sign * value < self.sign * self.threshold - self.band
+        return self.sign * value > self.sign * self.threshold
+
+    def update(self, value):
+        """Devuelve True si la regla cambia de estado con este valor."""
+        self._streak = self._streak + 1 if self._crossed(value) else 0
+        if self._streak < self.debounce:
+            return False
+        self.active = not self.active
+        self._streak = 0
+        return True
+
+
+class ThresholdRule(AlarmRule):
+    kind = "threshold"
+
+
+class RateRule(AlarmRule):
+    """
+    Velocidad de subida (°C/s) estimada con el retardo de una media exponencial de
+    constante `time_constant` s: ante una rampa, la media queda por detrás del valor en
+    proporción a la pendiente. No guarda historial y admite periodos de muestreo variables.
+    Con target="pixel" se estima por píxel y se vigila el píxel que más rápido sube.
+    """
+
+    kind = "rate"
+
+    def __init__(self, name, rate, time_constant=ALARM_RATE_TIME_CONSTANT_S, **kwargs):
+        # La histéresis por defecto en °C no tiene sentido para una velocidad: mitad del umbral
+        kwargs.setdefault("hysteresis", 0.5 * abs(rate))
+        if kwargs.get("noise_sigma"):
+            raise ValueError(f"Regla '{name}': noise_sigma no se aplica a velocidades de subida.")
+        kwargs["noise_sigma"] = 0.0
+        super().__init__(name, rate, **kwargs)
+        self.time_constant = max(float(time_constant), 1e-3)
+
+    def reset(self):
+        super().reset()
+        self._average = None
+        self._residual = None
+        self._last_timestamp = None
+
+    def measure(self, data, stats, timestamp):
+        value = data if self.target == "pixel" else self._target_value(stats)
+        if value is None:
+            return None
+        if self._average is None or np.shape(self._average) != np.shape(value):
+            self._average = np.array(value, dtype=np.float64)
+            self._residual = np.zeros_like(self._average)
+            self._last_timestamp = timestamp
+            return 0.0
+        dt = timestamp - self._last_timestamp
+        if dt <= 0:
+            return None
+        self._last_timestamp = timestamp
+        alpha = 1.0 - math.exp(-dt / self.time_constant)
+        residual = self._residual
+        np.subtract(value, self._average, out=residual)
+        residual *= alpha
+        self._average += residual
+        # Retardo estacionario de la media discreta ante una rampa r: r * dt * (1 - alpha) / alpha
+        np.subtract(value, self._average, out=residual)
+        residual *= alpha / ((1.0 - alpha) * dt) if alpha < 1.0 else 0.0
+        if self.target == "pixel":
+            return float(residual.max() if self.sign > 0 else residual.min())
+        return float(residual)
+
+
+class HotspotRule(AlarmRule):
+    """
+    Puntos calientes: componentes conexas de al menos `min_pixels` píxeles por encima del
+    umbral. Mientras la alarma está activa la máscara usa umbral - histéresis, así un punto
+    que oscila alrededor del umbral no se fragmenta ni genera eventos repetidos.
+    El valor medido es el número de puntos calientes. Con `noise_sigma` la histéresis se
+    calcula por píxel, a partir del ruido de cada uno.
+    """
+
+    kind = "hotspot"
+
+    def __init__(self, name, threshold, min_pixels=1, **kwargs):
+        kwargs.setdefault("target", "pixel")
+        super().__init__(name, threshold, **kwargs)
+        self.min_pixels = max(1, int(min_pixels))
+        self.hotspots = ()
+
+    def measure(self, data, stats, timestamp):
+        level = self.threshold - self.band if self.active else self.threshold
+        mask = data > level
+        if not mask.any():
+            self.hotspots = ()
+            return 0
+        labels, count = label_components(mask)
+        # Solo los píxeles de la máscara, agrupados por componente
+        component = labels[mask] - 1
+        sizes = np.bincount(component, minlength=count)
+        keep = np.flatnonzero(sizes >= self.min_pixels)
+        if not keep.size:
+            self.hotspots = ()
+            return 0
+        pixel_rows, pixel_cols = np.nonzero(mask)
+        row_sum = np.bincount(component, pixel_rows, minlength=count)
+        col_sum = np.bincount(component, pixel_cols, minlength=count)
+        order = np.argsort(component, kind="stable")
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        peaks = np.maximum.reduceat(data[mask][order], starts)
+        self.hotspots = tuple(
+            Hotspot(float(row_sum[k] / sizes[k]), float(col_sum[k] / sizes[k]), int(sizes[k]), float(peaks[k]))
+            for k in keep.tolist()
+        )
+        return len(self.hotspots)
+
+    def adapt_to_noise(self, noise, noise_stats):
+        self.band = np.maximum(self.hysteresis, self.noise_sigma * noise)
+
+    def _crossed(self, value):
+        return value == 0 if self.active else value > 0
+
+
+_RULE_CLASSES = {"threshold": ThresholdRule, "rate": RateRule, "hotspot": HotspotRule}
+
+
+def create_rule(spec):
+    """Regla a partir de un diccionario de ALARM_RULES, p. ej. {"type": "rate", "name": ..., "rate": 2.0}."""
+    spec = dict(spec)
+    rule_type = spec.pop("type", "threshold")
+    if rule_type not in _RULE_CLASSES:
+        raise ValueError(f"Tipo de regla desconocido: {rule_type}. Opciones: {', '.join(ALARM_RULE_TYPES)}")
+    return _RULE_CLASSES[rule_type](**spec)
+
+
+class AlarmEngine:
+    """
+    Evalúa todas las reglas con cada fotograma en el hilo de adquisición, antes de la
+    cola de la interfaz, de modo que el retardo hasta la alarma no depende del refresco
+    de la GUI. Los cambios de estado se entregan como AlarmEvent a los oyentes
+    registrados con add_listener (se llaman desde ese mismo hilo).
+    `noise_source` (p. ej. FrameFilter.noise_std) da el ruido por píxel que usan las reglas
+    con noise_sigma; se consulta con cada fotograma, después del filtro.
+    """
+
+    def __init__(self, rules=ALARM_RULES, stats_engine=None, noise_source=None):
+        self.rules = [rule if isinstance(rule, AlarmRule) else create_rule(rule) for rule in rules]
+        self._stats_engine = stats_engine or FrameStatsEngine()
+        self._needs_stats = any(rule.target != "pixel" for rule in self.rules)
+        self._noise_source = noise_source
+        self._noise_rules = [rule for rule in self.rules if rule.noise_sigma > 0]
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    @property
+    def active_rules(self):
+        return [rule.name for rule in self.rules if rule.active]
+
+    def add_listener(self, listener):
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        with self._lock:
+            self._listeners.remove(listener)
+
+    def reset(self):
+        for rule in self.rules:
+            rule.reset()
+
+    def process(self, frame):
+        """Evalúa un fotograma (Frame) y devuelve los eventos generados."""
+        if not self.rules:
+            return []
+        data = frame.data
+        stats = self._stats_engine.compute(data) if self._needs_stats else None
+        if self._noise_rules and self._noise_source is not None:
+            noise = self._noise_source()
+            if noise is not None and noise.shape == data.shape:
+                # Las mismas ROI reducen el mapa de ruido: ruido medio de cada objetivo
+                noise_stats = self._stats_engine.compute(noise)
+                for rule in self._noise_rules:
+                    rule.adapt_to_noise(noise, noise_stats)
+        events = []
+        for rule in self.rules:
+            value = rule.measure(data, stats, frame.timestamp)
+            if value is None or not rule.update(value):
+                continue
+            events.append(AlarmEvent(
+                timestamp=frame.timestamp,
+                sequence=frame.sequence,
+                rule=rule.name,
+                kind=rule.kind,
+                state="raised" if rule.active else "cleared",
+                value=float(value),
+                threshold=rule.threshold,
+                target=rule.target,
+                hotspots=getattr(rule, "hotspots", ()),
+            ))
+        if events:
+            with self._lock:
+                listeners = list(self._listeners)
+            for event in events:
+                for listener in listeners:
+                    listener(event)
+        return events
+
+
+def format_event(event):
+    """Texto de un evento para la interfaz."""
+    state = "ACTIVADA" if event.state == "raised" else "normal"
+    units = "°C/s" if event.kind == "rate" else ("puntos" if event.kind == "hotspot" else "°C")
+    decimals = 2 if event.kind == "rate" else 1
+    text = f"{event.rule}: {state} ({event.value:.{decimals}f} {units}, umbral {event.threshold:.{decimals}f})"
+    if event.hotspots:
+        text += " en " + ", ".join(f"({h.row:.0f}, {h.col:.0f}) {h.max:.1f}°C" for h in event.hotspots[:3])
+    return text
+
+
+class AlarmLog:
+    """Registro CSV de eventos de alarma, una fila por evento, escrita al momento."""
+
+    HEADER = ["timestamp", "sequence", "rule", "kind", "state", "value", "threshold", "target", "hotspots"]
+
+    def __init__(self, path):
+        self._file = open(path, "a", newline="")
+        self._writer = csv.writer(self._file)
+        self._lock = threading.Lock()
+        if self._file.tell() == 0:
+            self._writer.writerow(self.HEADER)
+
+    def write(self, event):
+        hotspots = ";".join(f"{h.row:.1f}:{h.col:.1f}:{h.pixels}:{h.max:.2f}" for h in event.hotspots)
+        with self._lock:
+            self._writer.writerow([f"{event.timestamp:.3f}", event.sequence, event.rule, event.kind, event.state,
+                                   f"{event.value:.3f}", event.threshold, event.target, hotspots])
+            self._file.flush()
+
+    __call__ = write
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import timeit
+
+    from frame_parser import Frame
+
+    parser = argparse.ArgumentParser(description="Evalúa reglas de alarma sobre un registro o mide su coste")
+    parser.add_argument("log", nargs="?", help="Registro CSV (píxeles o Tiempo,Temperatura) a evaluar")
+    parser.add_argument("--rule", action="append", dest="rules", metavar="JSON",
+                        help='Regla en JSON, p. ej. \'{"type": "rate", "name": "subida", "rate": 0.05}\'')
+    args = parser.parse_args()
+
+    if args.log:
+        from log_reader import read_log_info, read_series, read_frames
+
+        engine = AlarmEngine([json.loads(rule) for rule in args.rules] if args.rules else ALARM_RULES)
+        if not engine.rules:
+            parser.error("Indica al menos una regla con --rule o en ALARM_RULES.")
+        engine.add_listener(lambda event: print(f"{event.timestamp:8.2f} s  {format_event(event)}"))
+        if read_log_info(args.log).kind == "series":
+            times, temperatures = read_series(args.log)
+            frames = temperatures.reshape(-1, 1, 1)
+        else:
+            frames, timestamps, _ = read_frames(args.log)
+            times = timestamps if timestamps is not None else np.arange(len(frames)) / 10.0
+        for position, (elapsed, data) in enumerate(zip(times.tolist(), frames)):
+            engine.process(Frame(data, elapsed, position))
+        raise SystemExit(0)
+
+    print(f"Componentes conexas con {'scipy.ndimage' if ndimage is not None else 'NumPy'}")
+    mask = np.zeros((24, 32), dtype=bool)
+    mask[2:5, 2:5] = mask[10, 10:20] = mask[11:20, 19] = mask[20, 30] = True
+    labels, count = label_components(mask)
+    print("Etiquetado correcto:", count == 3 and len(np.unique(labels[mask])) == 3)
+
+    # Escenario: punto caliente que aparece a los 2 s y calentamiento lento de la ROI a 1 °C/s
+    rules = [
+        {"type": "threshold", "name": "maxima", "threshold": 38.0, "debounce": 2},
+        {"type": "rate", "name": "subida", "target": "zona", "statistic": "mean", "rate": 0.5},
+        {"type": "rate", "name": "subida_pixel", "target": "pixel", "rate": 5.0},
+        {"type": "hotspot", "name": "puntos", "threshold": 36.0, "min_pixels": 2},
+    ]
+    engine = AlarmEngine(rules, FrameStatsEngine([{"name": "zona", "rect": (0, 12, 0, 16)}]))
+    engine.add_listener(lambda event: print(f"{event.timestamp:5.2f} s  {format_event(event)}"))
+    rng = np.random.default_rng(0)
+    fps = 16
+    for position in range(8 * fps):
+        elapsed = position / fps
+        data = rng.normal(25, 0.3, (24, 32)).astype(np.float32)
+        if elapsed >= 3:
+            data[:12, :16] += min(elapsed - 3, 3)
+        if 2 <= elapsed < 6:
+            data[15:18, 20:23] += 15
+        engine.process(Frame(data, elapsed, position))
+
+    for rule_set in ([rules[0]], rules):
+        engine = AlarmEngine(rule_set, FrameStatsEngine([{"name": "zona", "rect": (0, 12, 0, 16)}]))
+        frames = [Frame(rng.normal(25, 0.3, (24, 32)).astype(np.float32), i / 16, i) for i in range(64)]
+        frames[-1].data[15:18, 20:23] += 15
+        engine.process(frames[0])
+        number = 5000
+        elapsed = timeit.timeit(lambda: engine.process(frames[-1]), number=number)
+        print(f"24x32 con {len(rule_set)} regla(s): {elapsed / number * 1e6:.1f} µs por fotograma")
@@ -3,18 +3,47 @@ from PyQt5.QtWidgets import (
     QPushButton, QComboBox, QLineEdit, QFileDialog, QMessageBox, QFrame,
     QApplication
 )
-from PyQt5.QtCore import Qt, pyqtSignal, QDateTime
+from PyQt5.QtCore import Qt, pyqtSignal, QDateTime, QTimer
 from PyQt5.QtGui import QFont
 
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 import numpy as np
 
 from app_parameters import (
     APP_TITLE, SENSOR_ROWS, SENSOR_COLS,
     DEFAULT_MIN_TEMP_C, DEFAULT_MAX_TEMP_C,
-    CSV_FILENAME_PREFIX
+    CSV_FILENAME_PREFIX, HEATMAP_RENDERER, HEATMAP_COLORMAP,
+    FRAME_FILTER_MODE
 )
+from colormap_lut import build_lut, apply_lut
+from telemetry import telemetry
+from color_scale import ColorScale, COLOR_SCALE_MODES, limits_changed
+from upsampling import Upsampler, UPSAMPLING_METHODS
+
+COLOR_SCALE_LABELS = {
+    "fixed": "Fija",
+    "minmax": "Mínimo / Máximo",
+    "percentile": "Percentiles",
+    "smoothed": "Percentiles suavizados",
+}
+
+FRAME_FILTER_LABELS = {
+    "none": "Ninguno",
+    "ema": "Media exponencial",
+    "median": "Mediana",
+}
+
+# Modo "qimage": la colorbar va siempre de 0 a 1 con marcas fijas y HeatmapCanvas pinta encima
+# el valor de cada marca. La etiqueta de relleno reserva el ancho de los valores en la figura
+COLORBAR_TICKS = np.linspace(0, 1, 6)
+COLORBAR_LABEL_PLACEHOLDER = "-00.0"
+
+UPSAMPLING_LABELS = {
+    "none": "Ninguna",
+    "bilinear": "Bilineal",
+    "bicubic": "Bicúbica",
+    "lanczos": "Lanczos",
+}
+
 
 class AppGUI(QMainWindow):
     connect_signal = pyqtSignal(str)
@@ -22,6 +51,7 @@ class AppGUI(QMainWindow):
     start_record_signal = pyqtSignal(str, int)
     stop_record_signal = pyqtSignal()
     select_file_signal = pyqtSignal()
+    filter_mode_signal = pyqtSignal(str)
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -34,9 +64,15 @@ class AppGUI(QMainWindow):
         self.current_center_temp = (DEFAULT_MIN_TEMP_C + DEFAULT_MAX_TEMP_C) / 2
 
         self.recording_duration_str = "60"
+        self.color_scale = ColorScale()
+        self.upsampler = Upsampler()
+        self.alarm_history = []
+        # La figura de matplotlib se crea después de mostrar la ventana (ver showEvent):
+        # importar matplotlib y construir la figura es la parte más lenta del arranque
+        self.canvas = None
+        self.heatmap_im = None
 
         self.create_widgets()
-        self.setup_heatmap()
 
     def create_widgets(self):
         central_widget = QWidget()
@@ -51,6 +87,8 @@ class AppGUI(QMainWindow):
         serial_layout.addWidget(QLabel("Puerto COM:"))
         self.port_combobox = QComboBox()
         self.port_combobox.setPlaceholderText("Selecciona un puerto")
+        # Editable para escribir URL de pyserial, p. ej. la del emulador (socket://127.0.0.1:7000)
+        self.port_combobox.setEditable(True)
         serial_layout.addWidget(self.port_combobox)
         self.connect_button = QPushButton("Conectar")
         self.connect_button.clicked.connect(self._on_connect_button_click)
@@ -62,6 +100,31 @@ class AppGUI(QMainWindow):
         main_layout.addWidget(serial_frame_container)
 
         heatmap_frame_container, heatmap_frame_layout_for_content = self._create_section_frame_with_layout("Mapa de Calor")
+        color_scale_layout = QHBoxLayout()
+        heatmap_frame_layout_for_content.addLayout(color_scale_layout)
+        color_scale_layout.addWidget(QLabel("Escala de color:"))
+        self.color_scale_combobox = QComboBox()
+        for mode, label in COLOR_SCALE_LABELS.items():
+            self.color_scale_combobox.addItem(label, mode)
+        self.color_scale_combobox.setCurrentIndex(COLOR_SCALE_MODES.index(self.color_scale.mode))
+        self.color_scale_combobox.currentIndexChanged.connect(self._on_color_scale_changed)
+        color_scale_layout.addWidget(self.color_scale_combobox)
+        color_scale_layout.addWidget(QLabel("Interpolación:"))
+        self.upsampling_combobox = QComboBox()
+        for method, label in UPSAMPLING_LABELS.items():
+            self.upsampling_combobox.addItem(label, method)
+        self.upsampling_combobox.setCurrentIndex(UPSAMPLING_METHODS.index(self.upsampler.method))
+        self.upsampling_combobox.currentIndexChanged.connect(self._on_upsampling_changed)
+        color_scale_layout.addWidget(self.upsampling_combobox)
+        color_scale_layout.addWidget(QLabel("Filtro:"))
+        self.filter_combobox = QComboBox()
+        for mode, label in FRAME_FILTER_LABELS.items():
+            self.filter_combobox.addItem(label, mode)
+        self.filter_combobox.setCurrentIndex(list(FRAME_FILTER_LABELS).index(FRAME_FILTER_MODE))
+        self.filter_combobox.currentIndexChanged.connect(
+            lambda index: self.filter_mode_signal.emit(self.filter_combobox.itemData(index)))
+        color_scale_layout.addWidget(self.filter_combobox)
+        color_scale_layout.addStretch(1)
         self.heatmap_layout = QVBoxLayout()
         heatmap_frame_layout_for_content.addLayout(self.heatmap_layout)
         main_layout.addWidget(heatmap_frame_container, 1)
@@ -80,6 +143,14 @@ class AppGUI(QMainWindow):
         stats_layout.addWidget(self.min_temp_label, 1, Qt.AlignLeft)
         stats_layout.addWidget(self.max_temp_label, 1, Qt.AlignCenter)
         stats_layout.addWidget(self.center_temp_label, 1, Qt.AlignRight)
+        self.roi_stats_label = QLabel()
+        self.roi_stats_label.setWordWrap(True)
+        self.roi_stats_label.setVisible(False)
+        stats_frame_layout_for_content.addWidget(self.roi_stats_label)
+        self.alarm_label = QLabel()
+        self.alarm_label.setWordWrap(True)
+        self.alarm_label.setVisible(False)
+        stats_frame_layout_for_content.addWidget(self.alarm_label)
         main_layout.addWidget(stats_frame_container)
 
         record_frame_container, record_frame_layout_for_content = self._create_section_frame_with_layout("Registro de Datos")
@@ -127,23 +198,78 @@ class AppGUI(QMainWindow):
         main_frame_layout.addLayout(content_layout)
         return frame, content_layout
 
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.canvas is None:
+            QTimer.singleShot(0, self.setup_heatmap)
+
     def setup_heatmap(self):
-        self.fig, self.ax = plt.subplots(figsize=(6, 5))
-        self.canvas = FigureCanvas(self.fig)
+        if self.canvas is not None:
+            return
+        # Figure directamente, sin pyplot: sin su estado global ni el gestor de figuras
+        from matplotlib.figure import Figure
+        from heatmap_canvas import HeatmapCanvas
+
+        self.fig = Figure(figsize=(6, 5))
+        self.ax = self.fig.add_subplot()
+        self.canvas = HeatmapCanvas(self.fig)
         self.heatmap_layout.addWidget(self.canvas)
+
+        # En modo "qimage" la figura (ejes, título, degradado de la colorbar) solo se dibuja con
+        # Agg al cambiar la forma o el tamaño; el mapa y los valores de la colorbar los pinta Qt
+        self._use_qimage = HEATMAP_RENDERER == "qimage"
+        self._colormap_lut = build_lut(HEATMAP_COLORMAP) if self._use_qimage else None
+        self._heatmap_rgba = None
+
+        self._create_heatmap_artists(self.current_heatmap_data)
+
+    def _create_heatmap_artists(self, data):
         self.heatmap_im = self.ax.imshow(
-            self.current_heatmap_data,
-            cmap='jet',
+            data,
+            cmap=HEATMAP_COLORMAP,
             vmin=DEFAULT_MIN_TEMP_C,
             vmax=DEFAULT_MAX_TEMP_C,
-            interpolation='none'
+            interpolation=self.upsampler.method if self.upsampler.enabled else 'none'
         )
         self.ax.set_title("Mapa de Calor del Sensor")
         self.ax.set_xticks([])
         self.ax.set_yticks([])
-        self.colorbar = self.fig.colorbar(self.heatmap_im, ax=self.ax, orientation='vertical', fraction=0.046, pad=0.04)
+        if self._use_qimage:
+            # El degradado no depende de la escala: la colorbar no sigue a la imagen (un
+            # set_clim la recalcularía y redibujarla con Agg cuesta ~20 ms)
+            from matplotlib.cm import ScalarMappable
+            from matplotlib.colors import Normalize
+
+            mappable = ScalarMappable(Normalize(0, 1), cmap=HEATMAP_COLORMAP)
+        else:
+            mappable = self.heatmap_im
+        self.colorbar = self.fig.colorbar(mappable, ax=self.ax, orientation='vertical', fraction=0.046, pad=0.04)
         self.colorbar.set_label("Temperatura (°C)")
+        if self._use_qimage:
+            self.colorbar.set_ticks(COLORBAR_TICKS, labels=[COLORBAR_LABEL_PLACEHOLDER] * len(COLORBAR_TICKS))
+            for label in self.colorbar.ax.get_yticklabels():
+                label.set_alpha(0)
         self.fig.tight_layout()
+        if self._use_qimage:
+            # La imagen y los valores de la colorbar los pinta HeatmapCanvas
+            self.heatmap_im.set_visible(False)
+            self.canvas.heatmap_axes = self.ax
+            self.canvas.colorbar_axes = self.colorbar.ax
+            self._update_colorbar_labels()
+            self._update_heatmap_image(data)
+
+    def _update_colorbar_labels(self):
+        vmin, vmax = self.heatmap_im.get_clim()
+        self.canvas.set_colorbar_labels([f"{vmin + tick * (vmax - vmin):.1f}" for tick in COLORBAR_TICKS])
+
+    def _update_heatmap_image(self, data):
+        # La escala de color y las estadísticas usan el fotograma original; solo la imagen se interpola
+        image = self.upsampler(data)
+        if self._heatmap_rgba is None or self._heatmap_rgba.shape[:2] != image.shape:
+            self._heatmap_rgba = np.empty(image.shape + (4,), dtype=np.uint8)
+        vmin, vmax = self.heatmap_im.get_clim()
+        apply_lut(image, vmin, vmax, self._colormap_lut, out=self._heatmap_rgba)
+        self.canvas.set_heatmap_rgba(self._heatmap_rgba)
 
     def update_port_list(self, ports):
         self.port_combobox.clear()
@@ -162,50 +288,101 @@ class AppGUI(QMainWindow):
         """
         if data is None:
             return
+        self.setup_heatmap()
 
         # Redimensionar el imshow si los datos tienen una forma diferente
         # (Esto es crucial para soportar AMG8833 y MLX90640 dinámicamente)
-        if self.heatmap_im.get_array().shape != data.shape:
+        shape_changed = self.heatmap_im.get_array().shape != data.shape
+        if shape_changed:
+            # Quitar la colorbar vieja antes de limpiar el eje al que está asociada
+            self.colorbar.remove()
             self.ax.clear() # Limpiar el eje actual
-            self.heatmap_im = self.ax.imshow(
-                data,
-                cmap='jet',
-                vmin=DEFAULT_MIN_TEMP_C,
-                vmax=DEFAULT_MAX_TEMP_C,
-                interpolation='none'
-            )
-            self.ax.set_title("Mapa de Calor del Sensor")
-            self.ax.set_xticks([])
-            self.ax.set_yticks([])
-            # Quitar la colorbar vieja si existe y añadir la nueva
-            if hasattr(self, 'colorbar') and self.colorbar:
-                self.colorbar.remove()
-            self.colorbar = self.fig.colorbar(self.heatmap_im, ax=self.ax, orientation='vertical', fraction=0.046, pad=0.04)
-            self.colorbar.set_label("Temperatura (°C)")
-            self.fig.tight_layout()
+            self._create_heatmap_artists(data)
         else:
             self.heatmap_im.set_array(data)
 
-        p_min = np.percentile(data, 1)
-        p_max = np.percentile(data, 99)
-
-        if p_max - p_min < 0.1:
-            p_min -= 0.5
-            p_max += 0.5
+        # Los cambios de escala por debajo del umbral se ignoran: evita el parpadeo
+        # de la colorbar y el coste de redibujarla en cada fotograma
+        started = telemetry.start()
+        vmin, vmax = self.color_scale.update(data)
+        telemetry.stop("color_scale", started)
+        clim_changed = shape_changed or limits_changed(self.heatmap_im.get_clim(), (vmin, vmax))
 
         # This line correctly sets the color limits for the image.
         # The colorbar automatically reflects these limits.
-        self.heatmap_im.set_clim(vmin=p_min, vmax=p_max)
+        if clim_changed:
+            self.heatmap_im.set_clim(vmin=vmin, vmax=vmax)
+
+        if not self._use_qimage:
+            started = telemetry.start()
+            self.canvas.draw() # This redraws the entire canvas, updating the heatmap and colorbar
+            telemetry.stop("canvas_draw", started)
+            return
+
+        if shape_changed:
+            started = telemetry.start()
+            self.canvas.draw()
+            telemetry.stop("canvas_draw", started)
+        if clim_changed:
+            started = telemetry.start()
+            self._update_colorbar_labels()
+            telemetry.stop("colorbar", started)
+        started = telemetry.start()
+        self._update_heatmap_image(data)
+        telemetry.stop("lut", started)
 
-        # self.colorbar.draw_all() # <--- THIS LINE IS THE ONE TO REMOVE
+    def _on_color_scale_changed(self, index):
+        self.color_scale.set_mode(self.color_scale_combobox.itemData(index))
 
-        self.canvas.draw() # This redraws the entire canvas, updating the heatmap and colorbar
+    def _on_upsampling_changed(self, index):
+        self.upsampler.set_method(self.upsampling_combobox.itemData(index))
+        if self.heatmap_im is None:
+            return
+        if self._use_qimage:
+            self._update_heatmap_image(self.heatmap_im.get_array())
+        else:
+            # El renderizador de matplotlib interpola con los mismos núcleos
+            self.heatmap_im.set_interpolation(self.upsampler.method if self.upsampler.enabled else 'none')
+            self.canvas.draw()
+
+    def show_telemetry(self, visible):
+        self.statusBar().setVisible(visible)
+
+    def update_telemetry(self, text):
+        self.statusBar().showMessage(text)
 
     def update_stats(self, min_val, max_val, center_val):
         self.min_temp_label.setText(f"Mínima: {min_val:.1f}°C")
         self.max_temp_label.setText(f"Máxima: {max_val:.1f}°C")
         self.center_temp_label.setText(f"Centro: {center_val:.1f}°C")
 
+    def update_roi_stats(self, stats):
+        if not stats.roi_names:
+            self.roi_stats_label.setVisible(False)
+            return
+        self.roi_stats_label.setText("   ".join(
+            f"{name}: {low:.1f} / {mean:.1f} / {high:.1f}°C"
+            for name, low, mean, high in zip(stats.roi_names, stats.roi_min, stats.roi_mean, stats.roi_max)
+        ))
+        self.roi_stats_label.setToolTip("Mínima / media / máxima de cada región de interés")
+        self.roi_stats_label.setVisible(True)
+
+    def update_alarms(self, active_rules, event_texts):
+        """Alarmas activas en rojo; los últimos eventos quedan en el tooltip."""
+        if not active_rules and not event_texts:
+            self.alarm_label.setVisible(False)
+            self.alarm_history = []
+            return
+        self.alarm_history = (self.alarm_history + event_texts)[-10:]
+        if active_rules:
+            self.alarm_label.setText(f"ALARMA: {', '.join(active_rules)}")
+            self.alarm_label.setStyleSheet("color: white; background-color: #c62828; font-weight: bold;")
+        else:
+            self.alarm_label.setText("Sin alarmas activas")
+            self.alarm_label.setStyleSheet("")
+        self.alarm_label.setToolTip("\n".join(self.alarm_history))
+        self.alarm_label.setVisible(True)
+
     def show_message(self, title, message):
         QMessageBox.information(self, title, message)
 
@@ -213,7 +390,7 @@ class AppGUI(QMainWindow):
         QMessageBox.critical(self, title, message)
 
     def _on_connect_button_click(self):
-        selected_port = self.port_combobox.currentText()
+        selected_port = self.port_combobox.currentText().strip()
         if not selected_port or selected_port == "No se encontraron puertos":
             self.show_error("Error de Conexión", "Por favor, selecciona un puerto COM válido.")
             return
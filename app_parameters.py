@@ -3,21 +3,194 @@ BAUD_RATE = 115200
 START_DATA_MARKER = "START DATA"
 END_DATA_MARKER = "END DATA"
 
+# Protocolo de fotogramas: "ascii" (START DATA / END DATA), "binary" o "auto" (se negocia al conectar)
+SERIAL_PROTOCOL = "auto"
+ASCII_FRAME_COMMAND = b'T\n'
+BINARY_FRAME_COMMAND = b'B\n'
+# Modo continuo: el dispositivo envía fotogramas con número de secuencia en el formato
+# del último comando de fotograma ('T' o 'B') hasta recibir la orden de parada
+STREAM_START_COMMAND = b'S\n'
+STREAM_STOP_COMMAND = b'P\n'
+BINARY_FRAME_MAGIC = b'\xa5\x5a'
+PROTOCOL_NEGOTIATION_TIMEOUT_S = 1.0
+# Al abrir el puerto el ESP32 se reinicia: se le piden fotogramas cada DEVICE_READY_POLL_S
+# segundos de silencio hasta que responde (como máximo DEVICE_READY_TIMEOUT_S). Con un
+# fotograma ASCII se espera DEVICE_READY_QUIET_S de silencio por si llega también el binario
+DEVICE_READY_TIMEOUT_S = 5.0
+DEVICE_READY_POLL_S = 0.25
+DEVICE_READY_QUIET_S = 0.2
+
+SERIAL_READ_TIMEOUT_S = 0.1
+MAX_PARSER_BUFFER_BYTES = 64 * 1024
+
+# La aplicación detecta la forma con el primer fotograma; estos valores son los predeterminados
+# del simulador, el emulador y las herramientas de línea de comandos
 SENSOR_ROWS = 8 #AMG8833
 SENSOR_COLS = 8 #AMG8833
 
 #SENSOR_ROWS = 24 #MLX90640
 #SENSOR_COLS = 32 #MLX90640
 
+# Formas conocidas según el número de píxeles (lectura de registros guardados)
+SENSOR_SHAPES = {64: (8, 8), 768: (24, 32)}
+
 APP_TITLE = "Visualizador de Mapa de Calor MLX90640 / AMG8833"
 
-GUI_UPDATE_INTERVAL_MS = 200
+GUI_UPDATE_INTERVAL_MS = 50
+
+# "stream", "request" o "auto" (continuo si el firmware lo soporta)
+ACQUISITION_MODE = "auto"
+ACQUISITION_PIPELINE_DEPTH = 2
+ACQUISITION_READ_TIMEOUT_S = 1.0
+FRAME_QUEUE_SIZE = 8
+
+# Varias cámaras (multi_camera.py): fotogramas recientes que se guardan por cámara para
+# emparejar por marca de tiempo los de distintos dispositivos
+MULTI_CAMERA_HISTORY_FRAMES = 16
+
+# Orígenes sin hardware: simulador (puerto "Simulador") y reproducción de registros (--replay)
+SIMULATOR_PORT_NAME = "Simulador"
+SYNTHETIC_FPS = 20  # 0 o None: tan rápido como sea posible
+REPLAY_SPEED = 1.0  # 2.0 = doble de velocidad; 0 o None: tan rápido como sea posible
+REPLAY_FALLBACK_FPS = 10  # registros sin marcas de tiempo
+# Emulador del firmware (device_emulator.py): intervalo del modo continuo, como el simulador
+EMULATOR_STREAM_INTERVAL_S = 0.05
+
+# "qimage": el mapa y los valores de la colorbar se pintan con Qt (QImage con una tabla de
+# colores precalculada), sin volver a dibujar la figura; "matplotlib": canvas.draw() completo
+# en cada fotograma
+HEATMAP_RENDERER = "qimage"
+HEATMAP_COLORMAP = "jet"
+# Interpolación del mapa de calor en el PC: "none", "bilinear", "bicubic" o "lanczos",
+# a UPSAMPLING_FACTOR veces la resolución del sensor
+UPSAMPLING_METHOD = "none"
+UPSAMPLING_FACTOR = 8
 
 DEFAULT_MIN_TEMP_C = 10.0
 DEFAULT_MAX_TEMP_C = 60.0
 
+# Escala de color: "fixed", "minmax", "percentile" o "smoothed" (percentiles suavizados entre fotogramas)
+COLOR_SCALE_MODE = "smoothed"
+COLOR_SCALE_PERCENTILES = (1, 99)
+COLOR_SCALE_SMOOTHING = 0.2
+COLOR_SCALE_MIN_SPAN_C = 0.1
+# Cambios de escala menores que este valor no se aplican: la colorbar no cambia (sin parpadeo)
+COLORBAR_REDRAW_THRESHOLD_C = 0.2
+
+# Filtrado temporal en el hilo de adquisición: "none", "ema" (media exponencial) o "median"
+# (mediana de los últimos FRAME_FILTER_MEDIAN_WINDOW fotogramas). FRAME_CALIBRATION_PATH: archivo
+# .npz de offset/ganancia por píxel generado con `python frame_filter.py captura.csv`
+FRAME_FILTER_MODE = "none"
+FRAME_FILTER_EMA_ALPHA = 0.3
+FRAME_FILTER_MEDIAN_WINDOW = 5
+FRAME_FILTER_NOISE_ALPHA = 0.05
+FRAME_CALIBRATION_PATH = None
+
+# Regiones de interés para las estadísticas: rectángulos (fila0, fila1, col0, col1) con
+# límites finales exclusivos, p. ej. {"name": "centro", "rect": (2, 6, 2, 6)}
+STATS_ROIS = []
+# Al grabar, guarda también las estadísticas de cada fotograma (globales y por ROI) en
+# <registro>.stats.csv, calculadas sobre todos los fotogramas grabados y no solo los dibujados
+RECORD_FRAME_STATS = True
+
+# Alarmas evaluadas con cada fotograma en el hilo de adquisición (alarm_engine.py). Tipos:
+#   {"type": "threshold", "name": "maxima", "threshold": 60.0, "target": "frame", "statistic": "max"}
+#   {"type": "rate", "name": "subida", "rate": 0.5, "target": "centro", "statistic": "mean"}  (°C/s;
+#       target "pixel" vigila cada píxel)
+#   {"type": "hotspot", "name": "puntos", "threshold": 45.0, "min_pixels": 2}
+# "target" es "frame" o el nombre de una ROI de STATS_ROIS; "direction": "below" vigila temperaturas
+# bajas. Cada regla admite "hysteresis" (°C) y "debounce" (fotogramas seguidos para cambiar de estado)
+ALARM_RULES = []
+ALARM_DEFAULT_HYSTERESIS_C = 1.0
+ALARM_DEFAULT_DEBOUNCE_FRAMES = 3
+# Histéresis mínima en múltiplos del ruido temporal medido por FrameFilter (0: solo "hysteresis").
+# Cada regla threshold o hotspot admite su propio "noise_sigma", p. ej. 3.0
+ALARM_DEFAULT_NOISE_SIGMA = 0.0
+# Constante de tiempo (s) de la estimación de la velocidad de subida: más alta, menos ruido y más retardo
+ALARM_RATE_TIME_CONSTANT_S = 2.0
+# Registro CSV de eventos (None: solo en la interfaz)
+ALARM_LOG_PATH = None
+
 DEFAULT_SAVE_DIR = None
 
 CSV_FILENAME_PREFIX = "temperatura_log_"
 
+# headless_logger.py: segundos entre líneas de estado en la consola (0: solo al terminar)
+HEADLESS_STATUS_INTERVAL_S = 60
+
+RECORDER_FLUSH_INTERVAL_S = 0.5
+RECORDER_BUFFER_FRAMES = 1024
+
+# Grabación binaria (.npy): "float32" conserva las centésimas; "float16" ocupa la mitad
+# con una resolución de ~0.03 °C entre 32 y 64 °C
+NPY_RECORDING_DTYPE = "float32"
+NPY_INITIAL_CAPACITY_FRAMES = 1024
+# Segundos entre actualizaciones del número de fotogramas en la cabecera y en el .json: ante un
+# corte de corriente o un cierre inesperado se pierden como mucho los últimos NPY_SYNC_INTERVAL_S s
+NPY_SYNC_INTERVAL_S = 1.0
+
+# Archivo comprimido sin pérdidas (.thz, thermal_archive.py): compresión ("zlib" o "lzma", más
+# lenta y algo más pequeña) y su nivel, fotogramas y segundos máximos por bloque (lo que se
+# pierde como mucho si se corta la grabación) y bloques pendientes de comprimir. Con todos
+# pendientes (disco lento) se espera como mucho ARCHIVE_SUBMIT_TIMEOUT_S y después el bloque se
+# descarta y se cuenta en frames_dropped: la interfaz no se congela esperando al disco
+ARCHIVE_CODEC = "zlib"
+ARCHIVE_COMPRESSION_LEVEL = 6
+ARCHIVE_BLOCK_FRAMES = 256
+ARCHIVE_BLOCK_MAX_S = 30.0
+ARCHIVE_PENDING_BLOCKS = 8
+ARCHIVE_SUBMIT_TIMEOUT_S = 0.02
+
+# Lectura de registros guardados: fotogramas convertidos por bloque
+LOG_READER_CHUNK_FRAMES = 256
+
+# Gráficas de series largas (mat_plot_data): muestras por bloque del nivel más fino del resumen
+# mínimo/máximo y si el resumen se guarda junto al registro (<registro>.<serie>.summary.npz)
+DECIMATION_BASE_BUCKET = 16
+DECIMATION_CACHE = True
+
 CSV_HEADER = [f"pixel_{i}" for i in range(SENSOR_ROWS * SENSOR_COLS)]
+
+# Exportación de registros a PNG / GIF / MP4 (frame_export.py): escala total de la imagen (con
+# interpolación, lo que falte tras UPSAMPLING_FACTOR se amplía por vecino más próximo), fotogramas
+# leídos por bloque, píxeles de salida como máximo por tarea del grupo de procesos (limita la
+# memoria), procesos (None: uno por núcleo) y compresión PNG (1: rápida; 9: archivos más pequeños)
+EXPORT_ZOOM = 10
+EXPORT_CHUNK_FRAMES = 256
+EXPORT_CHUNK_PIXELS = 16 * 1024 * 1024
+EXPORT_WORKERS = None
+EXPORT_PNG_COMPRESS_LEVEL = 1
+
+# Servidor de fotogramas en la red local (frame_server.py): dirección ("0.0.0.0" para aceptar
+# otros equipos), puerto HTTP/WebSocket, máximo de clientes, bytes pendientes por cliente a
+# partir de los cuales se descartan fotogramas (en lugar de acumularlos), mensajes enviados a
+# cada visor sin confirmar (más de 1 solo compensa redes con mucha latencia; un visor lento
+# recibe entonces fotogramas más retrasados) y JPEG opcional (calidad y escala total de la
+# imagen, incluida la interpolación de UPSAMPLING_METHOD)
+FRAME_SERVER_HOST = "127.0.0.1"
+FRAME_SERVER_PORT = 8765
+FRAME_SERVER_MAX_CLIENTS = 64
+FRAME_SERVER_WRITE_BUFFER_BYTES = 16 * 1024
+FRAME_SERVER_VIEWER_CREDITS = 1
+FRAME_SERVER_JPEG_QUALITY = 80
+FRAME_SERVER_JPEG_ZOOM = 10
+
+# Telemetría del pipeline (tiempos por etapa, fps, bytes/s, profundidad de la cola): barra de
+# estado y, si se indica un archivo, un registro JSON Lines cada TELEMETRY_REPORT_INTERVAL_MS
+TELEMETRY_ENABLED = False
+TELEMETRY_WINDOW = 256
+TELEMETRY_REPORT_INTERVAL_MS = 1000
+TELEMETRY_LOG_PATH = None
+
+# benchmark.py: fotogramas por etapa, repeticiones (se conserva la de menor mediana) y
+# empeoramiento de la mediana tolerado frente a la referencia
+BENCHMARK_FRAMES = 500
+BENCHMARK_REPEATS = 3
+BENCHMARK_REGRESSION_TOLERANCE = 0.25
+# p99 máximo (µs) por etapa, con cualquier tamaño de sensor: por encima, benchmark.py termina con error
+BENCHMARK_P99_TARGETS_US = {"render": 5000}
+# Arranque (benchmark.py --startup): segundos que el emulador tarda en atender comandos al conectar
+BENCHMARK_STARTUP_BOOT_DELAY_S = 0.5
+# Difusión (benchmark.py --broadcast): latencia mediana máxima del visor lento, que tarda 0,25 s
+# en procesar cada mensaje; por encima, el control de flujo del servidor no funciona
+BENCHMARK_BROADCAST_MAX_SLOW_LATENCY_S = 0.25
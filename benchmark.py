@@ -0,0 +1,366 @@
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from app_parameters import (
+    BENCHMARK_FRAMES, BENCHMARK_REPEATS, BENCHMARK_REGRESSION_TOLERANCE, BENCHMARK_STARTUP_BOOT_DELAY_S,
+    BENCHMARK_BROADCAST_MAX_SLOW_LATENCY_S, BENCHMARK_P99_TARGETS_US
+)
+from frame_parser import Frame, encode_ascii_frame, encode_binary_frame
+from frame_sources import SyntheticFrameSource
+
+SENSOR_SIZES = {"8x8": (8, 8), "24x32": (24, 32)}
+
+
+def _timed(function, items):
+    """Ejecuta `function` con cada elemento y devuelve las duraciones en segundos."""
+    durations = np.empty(len(items))
+    clock = time.perf_counter
+    # Sin pausas del recolector de basura dentro de las mediciones
+    gc.disable()
+    try:
+        for position, item in enumerate(items):
+            started = clock()
+            function(item)
+            durations[position] = clock() - started
+    finally:
+        gc.enable()
+    return durations
+
+
+class _MemoryPort:
+    """
+    Puerto en memoria con la interfaz que usa SerialHandler.read_data. A diferencia de
+    loop:// de pyserial (que entrega los bytes de uno en uno), no añade coste propio
+    a la medición del decodificador.
+    """
+
+    def __init__(self):
+        self.is_open = True
+        self._buffer = bytearray()
+
+    @property
+    def in_waiting(self):
+        return len(self._buffer)
+
+    def write(self, data):
+        self._buffer += data
+
+    def read(self, size=1):
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def reset_input_buffer(self):
+        self._buffer.clear()
+
+    def close(self):
+        self.is_open = False
+
+
+def _memory_handler(rows, cols, protocol):
+    from serial_handler import SerialHandler
+
+    handler = SerialHandler(rows, cols)
+    handler.ser = _MemoryPort()
+    handler.is_reading = True
+    handler._set_protocol(protocol)
+    return handler
+
+
+def bench_parse(frames, protocol):
+    rows, cols = frames[0].shape
+    handler = _memory_handler(rows, cols, protocol)
+    if protocol == "binary":
+        captures = [encode_binary_frame(frame, i) for i, frame in enumerate(frames)]
+    else:
+        captures = [encode_ascii_frame(frame) for frame in frames]
+
+    def parse(capture):
+        handler.ser.write(capture)
+        if handler.read_data(timeout=1.0) is None:
+            raise RuntimeError("El decodificador no devolvió el fotograma")
+
+    durations = _timed(parse, captures)
+    handler.ser.close()
+    return durations
+
+
+def bench_stats(frames):
+    from frame_stats import FrameStatsEngine
+
+    engine = FrameStatsEngine()
+    return _timed(engine.compute, frames)
+
+
+def bench_render(frames, app):
+    from app_gui import AppGUI
+
+    gui = AppGUI()
+    gui.resize(900, 700)
+    gui.show()
+    app.processEvents()
+    gui.update_heatmap(frames[0])
+    app.processEvents()
+
+    def render(frame):
+        gui.update_heatmap(frame)
+        # Pintado síncrono: el tiempo incluye el paintEvent del lienzo
+        gui.canvas.repaint()
+
+    durations = _timed(render, frames)
+    gui.close()
+    return durations
+
+
+def bench_record(frames, recorder_class, suffix):
+    """
+    Coste de grabar cada fotograma hasta que está en el archivo. Con grabadores que
+    escriben en un hilo de fondo (CsvRecorder) se llama a `flush` tras cada `write`, de modo
+    que el tiempo incluye el formateo y la escritura y no solo la copia al buffer; sin
+    lotes, es una cota superior. Falla si el grabador descarta fotogramas.
+    """
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    recorder = recorder_class(path)
+    recorder.start()
+    wrapped = [Frame(frame, time.time(), i) for i, frame in enumerate(frames)]
+    flush = getattr(recorder, "flush", None)
+
+    def record(frame):
+        recorder.write(frame)
+        if flush:
+            flush()
+
+    durations = _timed(record, wrapped)
+    recorder.close()
+    if recorder.error:
+        raise RuntimeError(recorder.error)
+    if recorder.frames_dropped or recorder.frames_written != len(frames):
+        raise RuntimeError(f"{recorder_class.__name__} grabó {recorder.frames_written} de {len(frames)} "
+                           f"fotogramas ({recorder.frames_dropped} descartados)")
+    for leftover in (path, path[:-4] + ".index.npy", path[:-4] + ".json"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    return durations
+
+
+def bench_startup(runs, boot_delay=BENCHMARK_STARTUP_BOOT_DELAY_S, rows=24, cols=32):
+    """
+    Arranca main_app.py `runs` veces contra el emulador (socket, con el reinicio del ESP32
+    al abrir el puerto) y devuelve {fase: segundos por ejecución}: imports, window_shown,
+    connected y first_frame, medidos desde el inicio del proceso de Python.
+    """
+    from device_emulator import DeviceEmulator, EmulatedDevice
+
+    emulator = DeviceEmulator(EmulatedDevice(rows, cols, seed=0), transport="socket", boot_delay=boot_delay)
+    emulator.start()
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main_app.py")
+    phases = {}
+    try:
+        for _ in range(runs):
+            completed = subprocess.run([sys.executable, script, "--port", emulator.url, "--startup-report"],
+                                       capture_output=True, text=True, env=env, timeout=60)
+            reports = [line for line in completed.stdout.splitlines() if line.startswith("{")]
+            if completed.returncode != 0 or not reports:
+                raise RuntimeError(f"main_app.py no dibujó ningún fotograma:\n{completed.stderr}")
+            for phase, value in json.loads(reports[-1]).items():
+                phases.setdefault(phase, []).append(value)
+    finally:
+        emulator.stop()
+    return {phase: np.array(values) for phase, values in phases.items()}
+
+
+def bench_broadcast(clients, seconds=5.0, fps=32, slow_clients=1, rows=24, cols=32,
+                    max_slow_latency=BENCHMARK_BROADCAST_MAX_SLOW_LATENCY_S):
+    """
+    frame_server.FrameServer con el simulador a `fps` y `clients` visores WebSocket en el
+    mismo equipo, más `slow_clients` que solo procesan 4 mensajes por segundo. Devuelve la
+    latencia (s) de cada mensaje recibido por los visores rápidos y por los lentos y el
+    estado final del servidor. Falla si la latencia mediana de los lentos supera
+    `max_slow_latency`: el servidor les estaría enviando fotogramas viejos.
+    """
+    import asyncio
+
+    from frame_server import FrameServer, open_viewer, read_websocket_message, decode_message, send_ack
+
+    async def viewer(port, delay, latencies, deadline):
+        reader, writer = await open_viewer("127.0.0.1", port)
+        try:
+            while time.monotonic() < deadline:
+                _, message = await read_websocket_message(reader, 1 << 24)
+                latencies.append(time.time() - decode_message(message)[2])
+                if delay:
+                    await asyncio.sleep(delay)
+                send_ack(writer)
+        finally:
+            writer.close()
+
+    async def run():
+        server = FrameServer(SyntheticFrameSource(rows, cols, fps=fps, seed=0), port=0)
+        await server.start()
+        latencies, slow_latencies = [], []
+        deadline = time.monotonic() + seconds
+        try:
+            await asyncio.gather(*[viewer(server.port, 0, latencies, deadline) for _ in range(clients)],
+                                 *[viewer(server.port, 0.25, slow_latencies, deadline) for _ in range(slow_clients)])
+            status = server.status()
+        finally:
+            await server.close()
+        return np.array(latencies), np.array(slow_latencies), status
+
+    latencies, slow_latencies, status = asyncio.run(run())
+    if len(slow_latencies) and np.median(slow_latencies) > max_slow_latency:
+        raise RuntimeError(f"El visor lento recibe fotogramas con {np.median(slow_latencies) * 1e3:.0f} ms de "
+                           f"latencia mediana (máximo {max_slow_latency * 1e3:.0f} ms)")
+    return latencies, slow_latencies, status
+
+
+def summarize(durations):
+    return {
+        "p50_us": float(np.percentile(durations, 50) * 1e6),
+        "p99_us": float(np.percentile(durations, 99) * 1e6),
+        "fps": float(len(durations) / durations.sum()),
+        "samples": int(len(durations)),
+    }
+
+
+def run_benchmarks(frame_count=BENCHMARK_FRAMES, stages=None, render=True, repeats=BENCHMARK_REPEATS):
+    """
+    Mide cada etapa del pipeline con fotogramas 8x8 y 24x32 del simulador.
+    Cada etapa se repite `repeats` veces y se conserva la repetición con menor mediana,
+    la menos afectada por el resto de procesos de la máquina.
+    Devuelve {"etapa_tamaño": {"p50_us", "p99_us", "fps", "samples"}}.
+    """
+    from csv_recorder import CsvRecorder
+    from npy_recorder import NpyRecorder
+
+    app = None
+    if render:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PyQt5.QtWidgets import QApplication
+
+        app = QApplication.instance() or QApplication([])
+
+    results = {}
+    for size, (rows, cols) in SENSOR_SIZES.items():
+        frames = list(SyntheticFrameSource(rows, cols, seed=0).generate(frame_count).astype(np.float32))
+        benchmarks = {
+            "parse_ascii": lambda: bench_parse(frames, "ascii"),
+            "parse_binary": lambda: bench_parse(frames, "binary"),
+            "stats": lambda: bench_stats(frames),
+            "record_csv": lambda: bench_record(frames, CsvRecorder, ".csv"),
+            "record_npy": lambda: bench_record(frames, NpyRecorder, ".npy"),
+        }
+        if render:
+            benchmarks["render"] = lambda: bench_render(frames, app)
+        for stage, benchmark in benchmarks.items():
+            if stages and stage not in stages:
+                continue
+            runs = [summarize(benchmark()) for _ in range(max(1, repeats))]
+            results[f"{stage}_{size}"] = min(runs, key=lambda run: run["p50_us"])
+    return results
+
+
+def compare(results, baseline, tolerance=BENCHMARK_REGRESSION_TOLERANCE):
+    """Devuelve las etapas cuya mediana empeora más de `tolerance` respecto a la referencia."""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference and result["p50_us"] > reference["p50_us"] * (1 + tolerance):
+            regressions.append((name, reference["p50_us"], result["p50_us"]))
+    return regressions
+
+
+def missed_targets(results, targets=BENCHMARK_P99_TARGETS_US):
+    """Devuelve las etapas cuyo p99 supera el objetivo de BENCHMARK_P99_TARGETS_US."""
+    missed = []
+    for name, result in results.items():
+        target = targets.get(name.rsplit("_", 1)[0])
+        if target and result["p99_us"] > target:
+            missed.append((name, target, result["p99_us"]))
+    return missed
+
+
+def print_report(results, baseline=None):
+    print(f"{'Etapa':<22}{'p50 (µs)':>12}{'p99 (µs)':>12}{'fps':>12}{'ref. p50':>12}")
+    for name, result in results.items():
+        reference = baseline.get(name) if baseline else None
+        reference_text = f"{reference['p50_us']:12.1f}" if reference else f"{'-':>12}"
+        print(f"{name:<22}{result['p50_us']:12.1f}{result['p99_us']:12.1f}{result['fps']:12.0f}{reference_text}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark de las etapas del pipeline (parseo, estadísticas, "
+                                                 "renderizado y grabación)")
+    parser.add_argument("--frames", type=int, default=BENCHMARK_FRAMES)
+    parser.add_argument("--repeats", type=int, default=BENCHMARK_REPEATS)
+    parser.add_argument("--stage", action="append", dest="stages",
+                        choices=["parse_ascii", "parse_binary", "stats", "render", "record_csv", "record_npy"],
+                        help="Etapa a medir (se puede repetir; por defecto todas)")
+    parser.add_argument("--no-render", action="store_true", help="Omite la etapa de Qt")
+    parser.add_argument("--startup", type=int, default=0, metavar="N",
+                        help="Mide también el arranque de main_app.py hasta el primer fotograma (N ejecuciones)")
+    parser.add_argument("--broadcast", type=int, default=0, metavar="N",
+                        help="Mide también frame_server.py con N visores WebSocket (y uno lento)")
+    parser.add_argument("--output", help="Guarda los resultados en este archivo JSON")
+    parser.add_argument("--baseline", help="JSON de referencia: termina con error si alguna etapa empeora")
+    parser.add_argument("--tolerance", type=float, default=BENCHMARK_REGRESSION_TOLERANCE,
+                        help="Empeoramiento de la mediana permitido (0.25 = 25 %%)")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.frames, args.stages, render=not args.no_render, repeats=args.repeats)
+    if args.startup:
+        startup = bench_startup(args.startup)
+        for phase in ("imports", "window_shown", "connected", "first_frame"):
+            print(f"Arranque, {phase}: mediana {np.median(startup[phase]) * 1e3:.0f} ms")
+        results["startup_first_frame"] = summarize(startup["first_frame"])
+    if args.broadcast:
+        latencies, slow_latencies, status = bench_broadcast(args.broadcast)
+        print(f"Difusión a {args.broadcast} visores: {status['fps']:.1f} fps adquiridos, "
+              f"{len(latencies) / args.broadcast:.0f} de {status['frames']} fotogramas por visor, latencia p50 "
+              f"{np.median(latencies) * 1e3:.1f} ms y p99 {np.percentile(latencies, 99) * 1e3:.1f} ms; "
+              f"el visor lento recibió {len(slow_latencies)} (latencia p50 {np.median(slow_latencies) * 1e3:.0f} ms)")
+        results["broadcast_latency"] = summarize(latencies)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    print_report(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "platform": platform.platform(),
+                "frames": args.frames,
+                "repeats": args.repeats,
+                "results": results,
+            }, f, indent=2)
+        print(f"Resultados guardados en {args.output}")
+
+    missed = missed_targets(results)
+    for name, target, current in missed:
+        print(f"OBJETIVO NO CUMPLIDO en {name}: p99 {current:.1f} µs (máximo {target:.0f} µs)")
+    if baseline:
+        regressions = compare(results, baseline, args.tolerance)
+        for name, reference, current in regressions:
+            print(f"REGRESIÓN en {name}: p50 {reference:.1f} µs -> {current:.1f} µs")
+        if regressions:
+            sys.exit(1)
+        print("Sin regresiones respecto a la referencia.")
+    if missed:
+        sys.exit(1)
@@ -0,0 +1,100 @@
+import numpy as np
+
+from app_parameters import (
+    DEFAULT_MIN_TEMP_C, DEFAULT_MAX_TEMP_C, COLOR_SCALE_MODE, COLOR_SCALE_PERCENTILES,
+    COLOR_SCALE_SMOOTHING, COLOR_SCALE_MIN_SPAN_C, COLORBAR_REDRAW_THRESHOLD_C
+)
+
+COLOR_SCALE_MODES = ("fixed", "minmax", "percentile", "smoothed")
+
+
+class ColorScale:
+    """
+    Estimación de los límites de la escala de color de cada fotograma.
+      fixed:      DEFAULT_MIN_TEMP_C / DEFAULT_MAX_TEMP_C
+      minmax:     mínimo y máximo del fotograma
+      percentile: percentiles con una sola llamada a np.partition (O(n), sin ordenar)
+      smoothed:   percentiles suavizados exponencialmente entre fotogramas
+    """
+
+    def __init__(self, mode=COLOR_SCALE_MODE, percentiles=COLOR_SCALE_PERCENTILES,
+                 smoothing=COLOR_SCALE_SMOOTHING, min_span=COLOR_SCALE_MIN_SPAN_C):
+        self.percentiles = percentiles
+        self.smoothing = smoothing
+        self.min_span = min_span
+        self.set_mode(mode)
+
+    def set_mode(self, mode):
+        if mode not in COLOR_SCALE_MODES:
+            raise ValueError(f"Modo de escala desconocido: {mode}. Opciones: {', '.join(COLOR_SCALE_MODES)}")
+        self.mode = mode
+        self.reset()
+
+    def reset(self):
+        self.vmin = None
+        self.vmax = None
+
+    def update(self, data):
+        if self.mode == "fixed":
+            low, high = DEFAULT_MIN_TEMP_C, DEFAULT_MAX_TEMP_C
+        elif self.mode == "minmax":
+            low, high = float(data.min()), float(data.max())
+        else:
+            low, high = percentile_range(data, *self.percentiles)
+
+        if high - low < self.min_span:
+            low -= 0.5
+            high += 0.5
+
+        if self.mode == "smoothed" and self.vmin is not None:
+            alpha = self.smoothing
+            low = self.vmin + alpha * (low - self.vmin)
+            high = self.vmax + alpha * (high - self.vmax)
+
+        self.vmin, self.vmax = low, high
+        return low, high
+
+
+def limits_changed(shown, limits, threshold=COLORBAR_REDRAW_THRESHOLD_C):
+    """
+    Si la vista debe pasar de los límites `shown` a `limits`: los cambios menores que
+    `threshold` se ignoran (evita el parpadeo de la colorbar). Sin límites previos, siempre.
+    """
+    if shown is None:
+        return True
+    return max(abs(limits[0] - shown[0]), abs(limits[1] - shown[1])) >= threshold
+
+
+def percentile_range(data, low_percentile, high_percentile):
+    """
+    Equivalente a np.percentile(data, [low, high]) (interpolación lineal),
+    con una única selección parcial en lugar de dos.
+    """
+    flat = np.ravel(data)
+    last = flat.size - 1
+    low_pos = last * low_percentile / 100.0
+    high_pos = last * high_percentile / 100.0
+    low_k, high_k = int(low_pos), int(high_pos)
+    kth = sorted({low_k, min(low_k + 1, last), high_k, min(high_k + 1, last)})
+    part = np.partition(flat, kth)
+
+    low = part[low_k] + (part[min(low_k + 1, last)] - part[low_k]) * (low_pos - low_k)
+    high = part[high_k] + (part[min(high_k + 1, last)] - part[high_k]) * (high_pos - high_k)
+    return float(low), float(high)
+
+
+if __name__ == "__main__":
+    import timeit
+
+    rng = np.random.default_rng(0)
+    for shape in ((8, 8), (24, 32)):
+        frame = rng.normal(25, 2, shape).astype(np.float32)
+        assert np.allclose(percentile_range(frame, 1, 99), np.percentile(frame, [1, 99]), atol=1e-4)
+
+        number = 20000
+        reference = timeit.timeit(lambda: (np.percentile(frame, 1), np.percentile(frame, 99)), number=number)
+        print(f"{shape[0]}x{shape[1]}  np.percentile x2: {reference / number * 1e6:7.2f} µs")
+        for mode in COLOR_SCALE_MODES:
+            scale = ColorScale(mode)
+            elapsed = timeit.timeit(lambda: scale.update(frame), number=number)
+            print(f"{shape[0]}x{shape[1]}  {mode:<16} {elapsed / number * 1e6:7.2f} µs")
@@ -0,0 +1,27 @@
+import numpy as np
+
+from app_parameters import HEATMAP_COLORMAP
+
+
+def build_lut(cmap_name=HEATMAP_COLORMAP):
+    """
+    Tabla RGBA (N, 4) uint8 del colormap de matplotlib, calculada una sola vez.
+    """
+    from matplotlib import colormaps
+
+    cmap = colormaps[cmap_name]
+    return cmap(np.arange(cmap.N), bytes=True)
+
+
+def apply_lut(data, vmin, vmax, lut, out=None):
+    """
+    Colorea `data` con la misma cuantización que Normalize + Colormap de matplotlib:
+    índice = floor((valor - vmin) / (vmax - vmin) * N), limitado a [0, N - 1].
+    Devuelve un array (filas, columnas, 4) uint8; `out` permite reutilizar el buffer.
+    """
+    size = len(lut)
+    scale = size / (vmax - vmin) if vmax > vmin else 0.0
+    index = np.subtract(data, vmin, dtype=np.float32)
+    index *= scale
+    np.clip(index, 0, size - 1, out=index)
+    return np.take(lut, index.astype(np.intp), axis=0, out=out)
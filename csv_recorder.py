@@ -0,0 +1,148 @@
+import threading
+import time
+
+import numpy as np
+
+from app_parameters import RECORDER_FLUSH_INTERVAL_S, RECORDER_BUFFER_FRAMES
+
+CSV_METADATA_COLUMNS = ["timestamp", "sequence"]
+
+
+def csv_header(pixel_count):
+    return CSV_METADATA_COLUMNS + [f"pixel_{i}" for i in range(pixel_count)]
+
+
+class CsvRecorder:
+    """
+    Grabación CSV en un hilo de fondo. `write` solo copia el fotograma a un buffer
+    circular preasignado; el hilo escritor vacía el buffer cada `flush_interval`
+    segundos en lotes formateados con una plantilla '%.2f' por píxel. `flush` hace lo
+    mismo en el hilo llamante.
+    """
+
+    def __init__(self, file_path, flush_interval=RECORDER_FLUSH_INTERVAL_S, capacity=RECORDER_BUFFER_FRAMES):
+        self.file_path = file_path
+        self.flush_interval = flush_interval
+        self.capacity = capacity
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.error = None
+        self._file = None
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._header_written = False
+        self._pixels = None
+        self._timestamps = None
+        self._sequences = None
+        self._row_format = None
+        self._head = 0
+        self._count = 0
+
+    def start(self):
+        self._file = open(self.file_path, 'w', newline='')
+        self._thread = threading.Thread(target=self._run, name="CsvRecorder", daemon=True)
+        self._thread.start()
+
+    def write(self, frame):
+        data = frame.data
+        with self._lock:
+            if self._pixels is None:
+                self._allocate(data.size)
+            elif data.size != self._pixels.shape[1]:
+                print(f"Aviso: fotograma de {data.size} píxeles descartado; la grabación usa {self._pixels.shape[1]}.")
+                self.frames_dropped += 1
+                return
+            if self._count == self.capacity:
+                # El escritor no da abasto: se pierde el fotograma más antiguo
+                self._head = (self._head + 1) % self.capacity
+                self._count -= 1
+                self.frames_dropped += 1
+            slot = (self._head + self._count) % self.capacity
+            self._pixels[slot] = data.ravel()
+            self._timestamps[slot] = frame.timestamp
+            self._sequences[slot] = -1 if frame.sequence is None else frame.sequence
+            self._count += 1
+
+    def close(self):
+        if self._thread:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def _allocate(self, pixel_count):
+        self._pixels = np.empty((self.capacity, pixel_count), dtype=np.float32)
+        self._timestamps = np.empty(self.capacity, dtype=np.float64)
+        self._sequences = np.empty(self.capacity, dtype=np.int64)
+        self._row_format = ",".join(["%.3f", "%d"] + ["%.2f"] * pixel_count) + "\n"
+
+    def flush(self):
+        """Formatea y escribe los fotogramas pendientes sin esperar al hilo escritor."""
+        with self._write_lock:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            if not self._header_written:
+                self._file.write(",".join(csv_header(batch[2].shape[1])) + "\n")
+                self._header_written = True
+            self._write_batch(*batch)
+
+    def _run(self):
+        while True:
+            stopping = self._stop_event.wait(self.flush_interval)
+            try:
+                self.flush()
+            except (IOError, OSError) as e:
+                self.error = f"Error al escribir el archivo de registro: {e}"
+                print(self.error)
+                return
+            if stopping:
+                return
+
+    def _take_batch(self):
+        with self._lock:
+            if not self._count:
+                return None
+            order = (self._head + np.arange(self._count)) % self.capacity
+            batch = self._timestamps[order], self._sequences[order], self._pixels[order]
+            self._head = (self._head + self._count) % self.capacity
+            self._count = 0
+        return batch
+
+    def _write_batch(self, timestamps, sequences, pixels):
+        row_format = self._row_format
+        lines = [
+            row_format % (timestamp, sequence, *values)
+            for timestamp, sequence, values in zip(timestamps.tolist(), sequences.tolist(), pixels.tolist())
+        ]
+        self._file.write("".join(lines))
+        self._file.flush()
+        self.frames_written += len(lines)
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+
+    from frame_parser import Frame
+
+    rng = np.random.default_rng(0)
+    frames = [Frame(np.round(rng.uniform(20, 35, (24, 32)), 2).astype(np.float32), time.time(), i)
+              for i in range(500)]
+    path = os.path.join(tempfile.gettempdir(), "csv_recorder_demo.csv")
+    recorder = CsvRecorder(path)
+    recorder.start()
+    started = time.perf_counter()
+    for frame in frames:
+        recorder.write(frame)
+    per_frame = (time.perf_counter() - started) / len(frames)
+    recorder.close()
+
+    old_size = sum(len(",".join(map(str, f.data.flatten().tolist()))) + 1 for f in frames)
+    print(f"write(): {per_frame * 1e6:.1f} µs por fotograma en el hilo llamante")
+    print(f"Tamaño: {os.path.getsize(path) / 1024:.0f} KiB (formato anterior: {old_size / 1024:.0f} KiB)")
+    os.remove(path)
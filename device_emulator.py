@@ -0,0 +1,355 @@
+import os
+import select
+import socket
+import threading
+import time
+
+import numpy as np
+
+from app_parameters import (
+    SENSOR_ROWS, SENSOR_COLS, BAUD_RATE, EMULATOR_STREAM_INTERVAL_S
+)
+from frame_parser import encode_ascii_frame, encode_binary_frame
+from frame_sources import SyntheticFrameSource
+
+UNKNOWN_COMMAND_REPLY = b"Comando desconocido. Esperando 'T'.\r\n"
+# Lo que imprime la ROM del ESP32 al reiniciarse cuando se abre el puerto (DTR/RTS)
+BOOT_MESSAGE = (b"ets Jun  8 2016 00:22:57\r\n\r\nrst:0x1 (POWERON_RESET),boot:0x13 (SPI_FAST_FLASH_BOOT)\r\n"
+                b"load:0x3fff0030,len:1344\r\nentry 0x400805f0\r\n")
+
+
+class EmulatedDevice:
+    """
+    Protocolo del firmware (comandos T, B, S y P) sin hardware: responde con los mismos
+    bytes que test_without_sensor.ino / esp32_config.ino, con datos del simulador.
+    Defectos configurables para probar la recuperación del parser:
+      latency:       segundos entre la captura del fotograma y el inicio del envío
+      noise_rate:    probabilidad de que cada byte enviado llegue alterado
+      truncate_rate: probabilidad de que un fotograma se corte a mitad
+    `terminate_end_marker=False` reproduce el "END DATA" sin salto de línea del MLX90640.
+    """
+
+    def __init__(self, rows=SENSOR_ROWS, cols=SENSOR_COLS, latency=0.0, noise_rate=0.0, truncate_rate=0.0,
+                 stream_interval=EMULATOR_STREAM_INTERVAL_S, terminate_end_marker=True,
+                 binary_supported=True, streaming_supported=True, seed=None):
+        self.rows = rows
+        self.cols = cols
+        self.latency = latency
+        self.noise_rate = noise_rate
+        self.truncate_rate = truncate_rate
+        self.stream_interval = stream_interval
+        self.terminate_end_marker = terminate_end_marker
+        self.binary_supported = binary_supported
+        self.streaming_supported = streaming_supported
+        self.binary_mode = False
+        self.streaming = False
+        self.frame_sequence = 0
+        self.frames_sent = 0
+        self.frames_truncated = 0
+        self.bytes_corrupted = 0
+        # Instante de captura (perf_counter) por número de secuencia, para medir la latencia
+        self.captured_at = {}
+        self._generator = SyntheticFrameSource(rows, cols, seed=seed)
+        self._rng = np.random.default_rng(seed)
+
+    def handle_command(self, command):
+        """Devuelve los bytes a enviar en respuesta a una línea de comando."""
+        if command in (b"T", b"B"):
+            if command == b"B" and not self.binary_supported:
+                return UNKNOWN_COMMAND_REPLY
+            self.binary_mode = command == b"B"
+            return self.next_frame(with_sequence=False)
+        if command == b"S" and self.streaming_supported:
+            self.streaming = True
+            return b""
+        if command == b"P" and self.streaming_supported:
+            self.streaming = False
+            return b""
+        return UNKNOWN_COMMAND_REPLY
+
+    def next_frame(self, with_sequence=True):
+        data = self._generator.generate(1)[0]
+        captured = time.perf_counter()
+        if self.binary_mode:
+            sequence = self.frame_sequence
+            frame = encode_binary_frame(data, sequence)
+        else:
+            sequence = self.frame_sequence if with_sequence else None
+            frame = encode_ascii_frame(data, sequence, self.terminate_end_marker)
+        if sequence is not None:
+            self.frame_sequence = (self.frame_sequence + 1) & 0xFFFFFFFF
+            self.captured_at[sequence] = captured
+            if len(self.captured_at) > 4096:
+                del self.captured_at[next(iter(self.captured_at))]
+        self.frames_sent += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self._damage(frame)
+
+    def _damage(self, frame):
+        if self.truncate_rate and self._rng.random() < self.truncate_rate:
+            frame = frame[:int(self._rng.integers(1, len(frame)))]
+            self.frames_truncated += 1
+        if self.noise_rate:
+            hits = np.flatnonzero(self._rng.random(len(frame)) < self.noise_rate)
+            if hits.size:
+                damaged = bytearray(frame)
+                for position in hits.tolist():
+                    damaged[position] = int(self._rng.integers(0, 256))
+                self.bytes_corrupted += hits.size
+                frame = bytes(damaged)
+        return frame
+
+
+class _PtyConnection:
+    def __init__(self):
+        import tty
+
+        self._master, self._slave = os.openpty()
+        # Modo crudo: sin eco ni traducción de saltos de línea, como un puerto USB-serie
+        tty.setraw(self._slave)
+        os.set_blocking(self._master, False)
+        self.url = os.ttyname(self._slave)
+
+    def recv(self, timeout):
+        readable, _, _ = select.select([self._master], [], [], timeout)
+        if not readable:
+            return b""
+        try:
+            return os.read(self._master, 4096)
+        except BlockingIOError:
+            return b""
+        except OSError:
+            return None
+
+    def send(self, data, timeout=0.5):
+        # Si nadie lee el puerto, el resto se pierde como en una línea serie real
+        view = memoryview(data)
+        while view:
+            _, writable, _ = select.select([], [self._master], [], timeout)
+            if not writable:
+                return
+            try:
+                view = view[os.write(self._master, view):]
+            except BlockingIOError:
+                continue
+
+    def close(self):
+        os.close(self._master)
+        os.close(self._slave)
+
+
+class _SocketConnection:
+    def __init__(self, sock):
+        self._sock = sock
+
+    def recv(self, timeout):
+        readable, _, _ = select.select([self._sock], [], [], timeout)
+        if not readable:
+            return b""
+        try:
+            return self._sock.recv(4096) or None
+        except OSError:
+            return None
+
+    def send(self, data):
+        try:
+            self._sock.sendall(data)
+        except OSError:
+            pass
+
+    def close(self):
+        self._sock.close()
+
+
+class DeviceEmulator(threading.Thread):
+    """
+    Sirve un EmulatedDevice en un pseudo-terminal (transport="pty", Linux/macOS) o en
+    un socket TCP local (transport="socket", una conexión a la vez). `url` se pasa
+    directamente a SerialHandler.connect. `baud_rate` limita la velocidad de envío a la
+    de una línea 8N1 real (None: sin límite).
+
+    `boot_delay` imita el reinicio del ESP32 al abrir el puerto: cada conexión (o el
+    arranque, con pty) empieza con el mensaje de la ROM y los comandos que llegan durante
+    esos segundos se pierden, como antes de que el firmware llame a Serial.begin.
+    """
+
+    def __init__(self, device=None, transport="pty", baud_rate=BAUD_RATE, port=0, boot_delay=0.0):
+        super().__init__(name="DeviceEmulator", daemon=True)
+        self.device = device or EmulatedDevice()
+        self.baud_rate = baud_rate
+        self.boot_delay = boot_delay
+        self._stop_event = threading.Event()
+        self._wire_free_at = 0.0
+        if transport == "pty":
+            self._connection = _PtyConnection()
+            self._server = None
+            self.url = self._connection.url
+        elif transport == "socket":
+            self._connection = None
+            self._server = socket.create_server(("127.0.0.1", port))
+            self.url = "socket://127.0.0.1:%d" % self._server.getsockname()[1]
+        else:
+            raise ValueError(f"Transporte desconocido: {transport}. Opciones: pty, socket")
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(1.0)
+        if self._connection:
+            self._connection.close()
+        if self._server:
+            self._server.close()
+
+    def run(self):
+        if self._server is None:
+            self._serve(self._connection)
+            return
+        while not self._stop_event.is_set():
+            readable, _, _ = select.select([self._server], [], [], 0.1)
+            if readable:
+                connection = _SocketConnection(self._server.accept()[0])
+                self._serve(connection)
+                connection.close()
+
+    def _serve(self, connection):
+        device = self.device
+        pending = b""
+        next_stream_frame = None
+        booted_at = None
+        if self.boot_delay:
+            device.streaming = False
+            device.binary_mode = False
+            booted_at = time.perf_counter() + self.boot_delay
+            self._transmit(connection, BOOT_MESSAGE)
+        while not self._stop_event.is_set():
+            timeout = 0.05
+            if next_stream_frame is not None:
+                timeout = max(0.0, min(timeout, next_stream_frame - time.perf_counter()))
+
+            data = connection.recv(timeout)
+            if data is None:
+                return
+            if booted_at is not None:
+                if time.perf_counter() < booted_at:
+                    continue
+                booted_at = None
+            pending += data
+            while b"\n" in pending:
+                line, pending = pending.split(b"\n", 1)
+                self._transmit(connection, device.handle_command(line.strip()))
+
+            if not device.streaming:
+                next_stream_frame = None
+                continue
+            if next_stream_frame is None:
+                next_stream_frame = time.perf_counter()
+            if time.perf_counter() >= next_stream_frame:
+                self._transmit(connection, device.next_frame())
+                next_stream_frame += device.stream_interval
+                # Sin ancho de banda suficiente no se acumulan fotogramas atrasados
+                next_stream_frame = max(next_stream_frame, time.perf_counter())
+
+    def _transmit(self, connection, data):
+        if not data:
+            return
+        if not self.baud_rate:
+            connection.send(data)
+            return
+        # 8N1: 10 bits por byte. Se envía en trozos de ~2 ms para imitar el ritmo de la línea
+        bytes_per_second = self.baud_rate / 10.0
+        chunk = max(1, int(bytes_per_second * 0.002))
+        self._wire_free_at = max(self._wire_free_at, time.perf_counter())
+        for start in range(0, len(data), chunk):
+            block = data[start:start + chunk]
+            connection.send(block)
+            self._wire_free_at += len(block) / bytes_per_second
+            delay = self._wire_free_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+
+def measure_end_to_end(emulator, duration=5.0, mode="auto", protocol="auto"):
+    """
+    Conecta un SerialHandler al emulador y mide fotogramas por segundo y latencia
+    desde la captura en el dispositivo hasta la entrega del fotograma decodificado.
+    """
+    from acquisition_worker import AcquisitionWorker, LatestFrameQueue
+    from frame_sources import SerialFrameSource
+    from serial_handler import SerialHandler
+
+    handler = SerialHandler(rows=emulator.device.rows, cols=emulator.device.cols)
+    if not handler.connect(emulator.url, protocol=protocol):
+        raise RuntimeError(f"No se pudo conectar al emulador en {emulator.url}")
+
+    latencies = []
+    queue = LatestFrameQueue()
+    worker = AcquisitionWorker(SerialFrameSource(handler, mode=mode), queue)
+    started = time.perf_counter()
+    worker.start()
+    while time.perf_counter() - started < duration:
+        frame = queue.get(timeout=0.1)
+        if frame is None or frame.sequence is None:
+            continue
+        captured = emulator.device.captured_at.get(frame.sequence)
+        if captured is not None:
+            latencies.append(time.perf_counter() - captured)
+    elapsed = time.perf_counter() - started
+    worker.stop()
+    handler.disconnect()
+
+    latencies = np.array(latencies) * 1000.0
+    return {
+        "protocol": handler.protocol,
+        "fps": worker.frames_received / elapsed,
+        "latency_p50_ms": float(np.percentile(latencies, 50)) if latencies.size else None,
+        "latency_p99_ms": float(np.percentile(latencies, 99)) if latencies.size else None,
+        "frames_received": worker.frames_received,
+        "frames_sent": emulator.device.frames_sent,
+        "frames_rejected": handler.decoder.frames_rejected,
+        "sequence_gaps": worker.dropped_frames,
+        "timeouts": worker.timeouts,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Emulador del firmware de la cámara térmica")
+    parser.add_argument("--rows", type=int, default=SENSOR_ROWS)
+    parser.add_argument("--cols", type=int, default=SENSOR_COLS)
+    parser.add_argument("--transport", choices=["pty", "socket"], default="pty")
+    parser.add_argument("--port", type=int, default=0, help="Puerto TCP para --transport socket")
+    parser.add_argument("--baud", type=int, default=BAUD_RATE, help="0: sin límite de velocidad")
+    parser.add_argument("--latency", type=float, default=0.0, help="Segundos entre captura y envío")
+    parser.add_argument("--noise", type=float, default=0.0, help="Probabilidad de alterar cada byte")
+    parser.add_argument("--truncate", type=float, default=0.0, help="Probabilidad de cortar un fotograma")
+    parser.add_argument("--interval", type=float, default=EMULATOR_STREAM_INTERVAL_S,
+                        help="Segundos entre fotogramas en modo continuo")
+    parser.add_argument("--mlx-end-marker", action="store_true", help="END DATA sin salto de línea (MLX90640)")
+    parser.add_argument("--ascii-only", action="store_true", help="Firmware sin modo binario")
+    parser.add_argument("--boot-delay", type=float, default=0.0,
+                        help="Segundos de reinicio del ESP32 al abrir el puerto (se pierden los comandos)")
+    parser.add_argument("--measure", type=float, metavar="SEGUNDOS",
+                        help="Mide fps y latencia extremo a extremo y termina")
+    args = parser.parse_args()
+
+    device = EmulatedDevice(args.rows, args.cols, latency=args.latency, noise_rate=args.noise,
+                            truncate_rate=args.truncate, stream_interval=args.interval,
+                            terminate_end_marker=not args.mlx_end_marker, binary_supported=not args.ascii_only)
+    emulator = DeviceEmulator(device, args.transport, baud_rate=args.baud or None, port=args.port,
+                              boot_delay=args.boot_delay)
+    emulator.start()
+    print(f"Emulador {args.rows}x{args.cols} escuchando en {emulator.url}")
+
+    try:
+        if args.measure:
+            for name, value in measure_end_to_end(emulator, args.measure).items():
+                print(f"  {name}: {value:.2f}" if isinstance(value, float) else f"  {name}: {value}")
+        else:
+            while True:
+                time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emulator.stop()
@@ -0,0 +1,337 @@
+import argparse
+import itertools
+import os
+import shutil
+import subprocess
+import sys
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from app_parameters import (
+    HEATMAP_COLORMAP, COLOR_SCALE_MODE, UPSAMPLING_METHOD, UPSAMPLING_FACTOR, REPLAY_FALLBACK_FPS,
+    EXPORT_ZOOM, EXPORT_CHUNK_FRAMES, EXPORT_CHUNK_PIXELS, EXPORT_WORKERS, EXPORT_PNG_COMPRESS_LEVEL
+)
+from color_scale import ColorScale, COLOR_SCALE_MODES, limits_changed
+from upsampling import interpolation_matrix, UPSAMPLING_METHODS
+
+EXPORT_FORMATS = ("png", "gif", "mp4")
+
+ExportOptions = namedtuple("ExportOptions", ["output_format", "output", "lut", "method", "factor", "zoom",
+                                             "compress_level"])
+
+
+def iter_log_chunks(path, chunk_frames=EXPORT_CHUNK_FRAMES):
+    """
+    Bloques (datos float32 (n, filas, columnas), marcas de tiempo) de un registro CSV de
+    píxeles, de una grabación .npy o de un archivo .thz. Las marcas son None si el registro
+    no las guarda.
+    """
+    if path.lower().endswith(".npy"):
+        from npy_recorder import load_recording
+
+        frames, index, _ = load_recording(path)
+        for start in range(0, len(frames), chunk_frames):
+            yield (np.array(frames[start:start + chunk_frames], dtype=np.float32),
+                   np.array(index["timestamp"][start:start + chunk_frames]))
+        return
+    if path.lower().endswith(".thz"):
+        from thermal_archive import ThermalArchive
+
+        with ThermalArchive(path) as archive:
+            for start in range(0, len(archive), chunk_frames):
+                data, timestamps, _ = archive.read(start, start + chunk_frames)
+                yield data, timestamps
+        return
+
+    from log_reader import read_log_info, iter_frames
+
+    has_metadata = read_log_info(path).has_metadata
+    for chunk in iter_frames(path, chunk_frames):
+        yield chunk.data, chunk.timestamps if has_metadata else None
+
+
+def live_color_limits(data, color_scale, shown=None):
+    """
+    Límites de color de cada fotograma tal como los muestra AppGUI.update_heatmap: ColorScale
+    fotograma a fotograma y cambios menores que COLORBAR_REDRAW_THRESHOLD_C ignorados. Es
+    secuencial (el modo "smoothed" depende de los fotogramas anteriores), así que se calcula
+    en el proceso principal. Devuelve (límites (n, 2), últimos límites mostrados).
+    """
+    limits = np.empty((len(data), 2))
+    for position, frame in enumerate(data):
+        candidate = color_scale.update(frame)
+        if limits_changed(shown, candidate):
+            shown = candidate
+        limits[position] = shown
+    return limits, shown
+
+
+def _repeat_factor(method, factor, zoom):
+    """Ampliación por vecino más próximo que falta tras la interpolación para llegar a `zoom`."""
+    if method != "none" and factor > 1:
+        return max(1, int(zoom) // factor)
+    return max(1, int(zoom))
+
+
+def output_scale(method, factor, zoom):
+    """
+    Escala real de la imagen respecto al sensor: `zoom`, o el factor de la interpolación si
+    es mayor (bicúbica x8 con zoom 10 -> 8; con zoom 16 -> x8 y después x2 por vecino).
+    """
+    interpolation = factor if method != "none" and factor > 1 else 1
+    return interpolation * _repeat_factor(method, factor, zoom)
+
+
+def color_indices(data, limits, size, method="none", factor=1, zoom=1):
+    """
+    Índices de la tabla de colores de un bloque de fotogramas (n, filas, columnas), con la
+    misma cuantización que apply_lut aplicada a todo el bloque a la vez. La interpolación se
+    hace antes de colorear, como en la interfaz; `zoom` es la ampliación total (ver output_scale).
+    """
+    data = np.asarray(data, dtype=np.float32)
+    zoom = _repeat_factor(method, factor, zoom)
+    if method != "none" and factor > 1:
+        rows, cols = data.shape[1:]
+        data = interpolation_matrix(rows, factor, method) @ data @ interpolation_matrix(cols, factor, method).T
+    span = limits[:, 1] - limits[:, 0]
+    scale = np.divide(size, span, out=np.zeros_like(span), where=span > 0)
+    index = np.subtract(data, limits[:, 0].astype(np.float32)[:, None, None], dtype=np.float32)
+    index *= scale.astype(np.float32)[:, None, None]
+    np.clip(index, 0, size - 1, out=index)
+    index = index.astype(np.uint8 if size <= 256 else np.uint16)
+    if zoom > 1:
+        index = index.repeat(zoom, axis=1).repeat(zoom, axis=2)
+    return index
+
+
+def _image(indices, lut):
+    from PIL import Image
+
+    # Con 256 colores o menos la tabla es la paleta: sin cuantizar ni convertir a RGB
+    if len(lut) <= 256:
+        image = Image.fromarray(indices)
+        image.putpalette(lut[:, :3].tobytes())
+        return image
+    return Image.fromarray(lut[indices, :3])
+
+
+_options = None
+
+
+def _init_worker(options):
+    global _options
+    _options = options
+
+
+def _render_chunk(task):
+    """Tarea de un proceso: PNG escritos directamente, RGB para el vídeo o índices para el GIF."""
+    start, data, limits = task
+    options = _options
+    indices = color_indices(data, limits, len(options.lut), options.method, options.factor, options.zoom)
+    if options.output_format == "png":
+        for offset, frame_indices in enumerate(indices):
+            path = os.path.join(options.output, f"frame_{start + offset:06d}.png")
+            _image(frame_indices, options.lut).save(path, compress_level=options.compress_level)
+        return len(indices)
+    if options.output_format == "mp4":
+        return options.lut[indices, :3]
+    return indices
+
+
+def _ordered_results(tasks, options, workers):
+    """
+    Resultados de _render_chunk en el orden de `tasks`. Con varios procesos se mantienen
+    como mucho dos bloques por proceso en curso: la memoria no depende de la duración.
+    """
+    if workers <= 1:
+        _init_worker(options)
+        for task in tasks:
+            yield _render_chunk(task)
+        return
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(options,)) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(_render_chunk, task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class _VideoWriter:
+    """MP4 con ffmpeg por tubería (rgb24) o, si no está en el PATH, con imageio."""
+
+    def __init__(self, path, fps):
+        self.path = path
+        self.fps = fps
+        self._process = None
+        self._writer = None
+
+    def _open(self, height, width):
+        ffmpeg = shutil.which("ffmpeg")
+        if ffmpeg:
+            # yuv420p exige dimensiones pares: se rellena una fila o columna si hace falta
+            self._process = subprocess.Popen(
+                [ffmpeg, "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgb24",
+                 "-s", f"{width}x{height}", "-r", f"{self.fps:g}", "-i", "-", "-an",
+                 "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-c:v", "libx264", "-pix_fmt", "yuv420p", self.path],
+                stdin=subprocess.PIPE)
+            return
+        try:
+            import imageio.v2 as imageio
+        except ImportError:
+            raise RuntimeError("Para exportar MP4 hace falta ffmpeg en el PATH o el paquete imageio[ffmpeg].")
+        self._writer = imageio.get_writer(self.path, fps=self.fps, macro_block_size=1)
+
+    def write(self, rgb):
+        if self._process is None and self._writer is None:
+            self._open(*rgb.shape[1:3])
+        if self._process:
+            self._process.stdin.write(np.ascontiguousarray(rgb).data)
+        else:
+            for frame in rgb:
+                self._writer.append_data(frame)
+
+    def close(self):
+        if self._process:
+            self._process.stdin.close()
+            if self._process.wait() != 0:
+                raise RuntimeError(f"ffmpeg terminó con error al escribir '{self.path}'.")
+        elif self._writer:
+            self._writer.close()
+
+
+class _GifWriter:
+    """GIF animado con Pillow. Pillow conserva todos los fotogramas hasta guardar: para clips cortos."""
+
+    def __init__(self, path, fps, lut):
+        if len(lut) > 256:
+            raise ValueError("El GIF admite como mucho 256 colores: elige un colormap con N <= 256.")
+        self.path = path
+        self.duration_ms = max(20, int(round(1000.0 / fps)))
+        self.lut = lut
+        self._images = []
+
+    def write(self, indices):
+        self._images.extend(_image(frame_indices, self.lut) for frame_indices in indices)
+
+    def close(self):
+        if self._images:
+            self._images[0].save(self.path, save_all=True, append_images=self._images[1:],
+                                 duration=self.duration_ms, loop=0)
+        self._images = []
+
+
+def estimate_fps(timestamps):
+    if timestamps is not None and len(timestamps) > 1:
+        interval = float(np.median(np.diff(timestamps)))
+        if interval > 0:
+            return 1.0 / interval
+    return REPLAY_FALLBACK_FPS
+
+
+def export_log(path, output, output_format=None, fps=None, color_scale_mode=COLOR_SCALE_MODE, limits=None,
+               method=UPSAMPLING_METHOD, factor=UPSAMPLING_FACTOR, zoom=EXPORT_ZOOM, colormap=HEATMAP_COLORMAP,
+               workers=EXPORT_WORKERS, chunk_frames=EXPORT_CHUNK_FRAMES):
+    """
+    Exporta un registro a PNG (un archivo por fotograma en el directorio `output`), GIF o MP4
+    con el colormap, la escala de color y la interpolación de la interfaz. `limits`
+    (vmin, vmax) fija la escala en lugar de `color_scale_mode`. `zoom` es la escala total de
+    la imagen, incluida la interpolación. El dibujo se reparte por bloques de como mucho
+    EXPORT_CHUNK_PIXELS píxeles de salida entre `workers` procesos (None: uno por núcleo)
+    y se escribe en orden.
+    Devuelve el número de fotogramas exportados.
+    """
+    from colormap_lut import build_lut
+
+    if output_format is None:
+        extension = os.path.splitext(output)[1].lower().lstrip(".")
+        output_format = extension if extension in EXPORT_FORMATS else "png"
+    if output_format not in EXPORT_FORMATS:
+        raise ValueError(f"Formato desconocido: {output_format}. Opciones: {', '.join(EXPORT_FORMATS)}")
+    if method not in UPSAMPLING_METHODS:
+        raise ValueError(f"Interpolación desconocida: {method}. Opciones: {', '.join(UPSAMPLING_METHODS)}")
+    workers = workers or os.cpu_count() or 1
+    lut = build_lut(colormap)
+    options = ExportOptions(output_format, output, lut, method, factor, max(1, int(zoom)),
+                            EXPORT_PNG_COMPRESS_LEVEL)
+    if output_format == "png":
+        os.makedirs(output, exist_ok=True)
+
+    chunks = iter_log_chunks(path, chunk_frames)
+    first = next(chunks, None)
+    if first is None:
+        return 0
+    fps = fps or estimate_fps(first[1])
+    writer = None
+    if output_format == "mp4":
+        writer = _VideoWriter(output, fps)
+    elif output_format == "gif":
+        writer = _GifWriter(output, fps, lut)
+
+    color_scale = ColorScale(color_scale_mode)
+    # La memoria de cada tarea depende de los píxeles de salida, no de los fotogramas: con
+    # interpolación un bloque de fotogramas fijo puede ocupar gigabytes
+    frame_pixels = int(np.prod(first[0].shape[1:])) * output_scale(method, factor, zoom) ** 2
+    task_frames = max(1, min(chunk_frames, EXPORT_CHUNK_PIXELS // frame_pixels))
+
+    def tasks():
+        shown = None
+        start = 0
+        for data, _ in itertools.chain([first], chunks):
+            if limits is None:
+                chunk_limits, shown = live_color_limits(data, color_scale, shown)
+            else:
+                chunk_limits = np.tile(np.asarray(limits, dtype=np.float64), (len(data), 1))
+            for offset in range(0, len(data), task_frames):
+                window = slice(offset, offset + task_frames)
+                yield start + offset, data[window], chunk_limits[window]
+            start += len(data)
+
+    exported = 0
+    try:
+        for result in _ordered_results(tasks(), options, workers):
+            if writer is None:
+                exported += result
+            else:
+                writer.write(result)
+                exported += len(result)
+    finally:
+        if writer is not None:
+            writer.close()
+    return exported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta un registro (CSV de píxeles, .npy o .thz) a imágenes PNG, "
+                                                 "GIF o vídeo MP4 con los colores de la interfaz")
+    parser.add_argument("log", help="Registro temperatura_log_*.csv, grabación .npy o archivo .thz")
+    parser.add_argument("-o", "--output", required=True,
+                        help="Directorio de los PNG, o archivo .gif / .mp4")
+    parser.add_argument("-f", "--format", choices=EXPORT_FORMATS, help="Por defecto, el de la extensión (o png)")
+    parser.add_argument("--fps", type=float, help="Por defecto, el ritmo de las marcas de tiempo del registro")
+    parser.add_argument("--scale", choices=COLOR_SCALE_MODES, default=COLOR_SCALE_MODE,
+                        help="Escala de color (la misma que en la interfaz)")
+    parser.add_argument("--limits", type=float, nargs=2, metavar=("VMIN", "VMAX"),
+                        help="Escala fija en °C para todo el registro")
+    parser.add_argument("--interpolation", choices=UPSAMPLING_METHODS, default=UPSAMPLING_METHOD)
+    parser.add_argument("--factor", type=int, default=UPSAMPLING_FACTOR, help="Factor de la interpolación")
+    parser.add_argument("--zoom", type=int, default=EXPORT_ZOOM, help="Escala total de la imagen; con interpolación, lo que falte tras --factor se amplía "
+                             "por vecino más próximo")
+    parser.add_argument("--colormap", default=HEATMAP_COLORMAP)
+    parser.add_argument("-j", "--workers", type=int, default=EXPORT_WORKERS,
+                        help="Procesos de dibujo (por defecto, uno por núcleo)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        count = export_log(args.log, args.output, args.format, args.fps, args.scale, args.limits,
+                           args.interpolation, args.factor, args.zoom, args.colormap, args.workers)
+    except (IOError, OSError, ValueError, RuntimeError) as e:
+        print(f"Error al exportar: {e}", file=sys.stderr)
+        sys.exit(1)
+    elapsed = time.perf_counter() - started
+    print(f"{count} fotogramas exportados a {args.output} en {elapsed:.1f} s ({count / elapsed:.0f} fotogramas/s)")
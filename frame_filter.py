@@ -0,0 +1,224 @@
+import threading
+
+import numpy as np
+
+from app_parameters import (
+    FRAME_FILTER_MODE, FRAME_FILTER_EMA_ALPHA, FRAME_FILTER_MEDIAN_WINDOW, FRAME_FILTER_NOISE_ALPHA
+)
+
+FRAME_FILTER_MODES = ("none", "ema", "median")
+
+
+class FrameFilter:
+    """
+    Etapa de filtrado entre el origen de fotogramas y los consumidores (se ejecuta en el
+    hilo de adquisición). En este orden, sobre el propio array del fotograma:
+      1. calibración por píxel: dato * ganancia + offset (mapa de campo plano)
+      2. estimación del ruido temporal de cada píxel (varianza exponencial)
+      3. "ema": media exponencial; "median": mediana de los últimos `median_window`
+         fotogramas en un buffer circular preasignado
+    Todos los buffers se reservan una vez por forma de fotograma: sin asignaciones por fotograma.
+    """
+
+    def __init__(self, mode=FRAME_FILTER_MODE, ema_alpha=FRAME_FILTER_EMA_ALPHA,
+                 median_window=FRAME_FILTER_MEDIAN_WINDOW, noise_alpha=FRAME_FILTER_NOISE_ALPHA, calibration=None):
+        self.ema_alpha = ema_alpha
+        self.median_window = max(1, median_window)
+        self.noise_alpha = noise_alpha
+        self.offset = None
+        self.gain = None
+        self._lock = threading.Lock()
+        self._shape = None
+        if calibration is not None:
+            self.set_calibration(*calibration)
+        self.set_mode(mode)
+
+    def set_mode(self, mode):
+        if mode not in FRAME_FILTER_MODES:
+            raise ValueError(f"Filtro desconocido: {mode}. Opciones: {', '.join(FRAME_FILTER_MODES)}")
+        with self._lock:
+            self.mode = mode
+            self._shape = None
+
+    def set_calibration(self, offset, gain=None):
+        with self._lock:
+            self.offset = None if offset is None else np.asarray(offset, dtype=np.float32)
+            self.gain = None if gain is None else np.asarray(gain, dtype=np.float32)
+            self._shape = None
+
+    def reset(self):
+        with self._lock:
+            self._shape = None
+
+    def _allocate(self, shape):
+        self._state = np.empty(shape, dtype=np.float32)
+        self._residual = np.empty(shape, dtype=np.float32)
+        self._squared = np.empty(shape, dtype=np.float32)
+        self._noise_mean = np.empty(shape, dtype=np.float32)
+        self._noise_var = np.zeros(shape, dtype=np.float32)
+        if self.mode == "median":
+            self._ring = np.empty((self.median_window,) + shape, dtype=np.float32)
+            self._sorted = np.empty_like(self._ring)
+        self._frames_seen = 0
+        self._ring_next = 0
+        self._shape = shape
+
+    def apply(self, data):
+        """Filtra `data` en su sitio y lo devuelve."""
+        with self._lock:
+            if data.shape != self._shape:
+                self._allocate(data.shape)
+            first = self._frames_seen == 0
+            self._frames_seen += 1
+
+            if self.offset is not None and self.offset.shape == data.shape:
+                if self.gain is not None:
+                    data *= self.gain
+                data += self.offset
+
+            self._update_noise(data, first)
+
+            if self.mode == "ema":
+                if first:
+                    np.copyto(self._state, data)
+                else:
+                    np.subtract(data, self._state, out=self._residual)
+                    self._residual *= self.ema_alpha
+                    self._state += self._residual
+                np.copyto(data, self._state)
+            elif self.mode == "median":
+                self._median(data)
+            return data
+
+    def _update_noise(self, data, first):
+        if first:
+            np.copyto(self._noise_mean, data)
+            return
+        alpha = self.noise_alpha
+        residual = self._residual
+        np.subtract(data, self._noise_mean, out=residual)
+        np.multiply(residual, residual, out=self._squared)
+        self._squared *= alpha
+        self._noise_var += self._squared
+        self._noise_var *= 1.0 - alpha
+        residual *= alpha
+        self._noise_mean += residual
+
+    def _median(self, data):
+        np.copyto(self._ring[self._ring_next], data)
+        self._ring_next = (self._ring_next + 1) % self.median_window
+        count = min(self._frames_seen, self.median_window)
+        window = self._sorted[:count]
+        np.copyto(window, self._ring[:count])
+        middle = count // 2
+        if count % 2:
+            window.partition(middle, axis=0)
+            np.copyto(data, window[middle])
+        else:
+            window.partition((middle - 1, middle), axis=0)
+            np.add(window[middle - 1], window[middle], out=data)
+            data *= 0.5
+
+    def noise_std(self):
+        """Desviación típica temporal de cada píxel (°C), o None antes del primer fotograma."""
+        with self._lock:
+            if self._shape is None or not self._frames_seen:
+                return None
+            return np.sqrt(self._noise_var)
+
+
+def calibration_from_flat_field(frames, reference_temp=None):
+    """
+    Offset por píxel a partir de una captura de una superficie uniforme. Sin temperatura
+    de referencia se corrige solo la falta de uniformidad (la media del sensor no cambia).
+    """
+    mean_frame = np.mean(np.asarray(frames, dtype=np.float64), axis=0)
+    target = mean_frame.mean() if reference_temp is None else reference_temp
+    return (target - mean_frame).astype(np.float32), None
+
+
+def calibration_from_two_points(cold_frames, hot_frames, cold_temp, hot_temp):
+    """Ganancia y offset por píxel a partir de dos capturas de campo plano a temperaturas conocidas."""
+    cold = np.mean(np.asarray(cold_frames, dtype=np.float64), axis=0)
+    hot = np.mean(np.asarray(hot_frames, dtype=np.float64), axis=0)
+    span = hot - cold
+    if np.any(np.abs(span) < 1e-6):
+        raise ValueError("Las dos capturas de campo plano deben tener temperaturas distintas en todos los píxeles.")
+    gain = (hot_temp - cold_temp) / span
+    offset = cold_temp - gain * cold
+    return offset.astype(np.float32), gain.astype(np.float32)
+
+
+def save_calibration(path, offset, gain=None):
+    arrays = {"offset": offset}
+    if gain is not None:
+        arrays["gain"] = gain
+    np.savez(path, **arrays)
+
+
+def load_calibration(path):
+    with np.load(path) as calibration:
+        return calibration["offset"], calibration["gain"] if "gain" in calibration else None
+
+
+def load_capture(path):
+    """Fotogramas de una captura guardada (.npy de npy_recorder, .thz o CSV de píxeles)."""
+    if path.lower().endswith(".npy"):
+        from npy_recorder import load_recording
+
+        return np.asarray(load_recording(path)[0], dtype=np.float32)
+    if path.lower().endswith(".thz"):
+        from thermal_archive import ThermalArchive
+
+        with ThermalArchive(path) as archive:
+            return archive.read()[0]
+    from log_reader import read_frames
+
+    return read_frames(path)[0]
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    import timeit
+
+    parser = argparse.ArgumentParser(description="Calibración por campo plano y prueba del filtro temporal")
+    parser.add_argument("capture", nargs="?", help="Captura de campo plano (CSV, .npy o .thz)")
+    parser.add_argument("--reference", type=float, help="Temperatura de la superficie de la captura (°C)")
+    parser.add_argument("--hot", help="Segunda captura, más caliente, para calibrar también la ganancia")
+    parser.add_argument("--hot-reference", type=float, help="Temperatura de la segunda captura (°C)")
+    parser.add_argument("-o", "--output", default="calibracion.npz")
+    args = parser.parse_args()
+
+    if args.capture:
+        if args.hot:
+            if args.reference is None or args.hot_reference is None:
+                sys.exit("La calibración de dos puntos necesita --reference y --hot-reference.")
+            offset, gain = calibration_from_two_points(load_capture(args.capture), load_capture(args.hot),
+                                                       args.reference, args.hot_reference)
+        else:
+            offset, gain = calibration_from_flat_field(load_capture(args.capture), args.reference)
+        save_calibration(args.output, offset, gain)
+        print(f"Calibración {offset.shape[0]}x{offset.shape[1]} guardada en {args.output}")
+        sys.exit(0)
+
+    from frame_sources import SyntheticFrameSource
+
+    # Escena estática con el ruido del simulador: el filtro debe reducir la dispersión
+    rng = np.random.default_rng(0)
+    scene = SyntheticFrameSource(8, 8, seed=0).generate(1)[0]
+    noisy = scene + rng.uniform(-0.6, 0.6, (400, 8, 8)).astype(np.float32)
+    for mode in FRAME_FILTER_MODES:
+        frame_filter = FrameFilter(mode)
+        filtered = np.array([frame_filter.apply(frame.copy()) for frame in noisy])
+        error = np.abs(filtered[50:] - scene).mean()
+        print(f"{mode:<7} error medio {error:.3f} °C, ruido estimado {frame_filter.noise_std().mean():.3f} °C "
+              f"(real {noisy.std(axis=0).mean():.3f})")
+
+    for shape in ((8, 8), (24, 32)):
+        frame = np.full(shape, 25.0, dtype=np.float32)
+        for mode in FRAME_FILTER_MODES:
+            frame_filter = FrameFilter(mode, calibration=(np.zeros(shape), np.ones(shape)))
+            number = 20000
+            elapsed = timeit.timeit(lambda: frame_filter.apply(frame), number=number)
+            print(f"{shape[0]}x{shape[1]} {mode:<7} {elapsed / number * 1e6:6.1f} µs por fotograma")
@@ -0,0 +1,257 @@
+import struct
+import zlib
+from collections import namedtuple
+
+import numpy as np
+
+from app_parameters import (
+    SENSOR_ROWS, SENSOR_COLS, START_DATA_MARKER, END_DATA_MARKER, MAX_PARSER_BUFFER_BYTES,
+    BINARY_FRAME_MAGIC
+)
+
+# magic(2) filas(1) columnas(1) secuencia(4) CRC32(4), little-endian.
+# El CRC cubre filas, columnas, secuencia y la carga útil de int16 en centésimas de grado.
+BINARY_HEADER = struct.Struct('<2sBBII')
+
+Frame = namedtuple("Frame", ["data", "timestamp", "sequence"])
+
+
+class AsciiFrameDecoder:
+    """
+    Decodificador incremental del formato START DATA / filas CSV / END DATA.
+    No depende del puerto serial: recibe bloques de bytes arbitrarios con `feed`
+    y devuelve los fotogramas completos como tuplas (datos, secuencia),
+    conservando los datos parciales entre llamadas.
+    Con rows/cols a None la forma se toma del primer fotograma válido y se fija.
+    """
+
+    def __init__(self, rows=SENSOR_ROWS, cols=SENSOR_COLS,
+                 start_marker=START_DATA_MARKER, end_marker=END_DATA_MARKER,
+                 max_buffer_size=MAX_PARSER_BUFFER_BYTES):
+        self.rows = rows
+        self.cols = cols
+        self.start_marker = start_marker.encode('ascii')
+        self.end_marker = end_marker.encode('ascii')
+        self.max_buffer_size = max_buffer_size
+        self.frames_decoded = 0
+        self.frames_rejected = 0
+        self._buffer = bytearray()
+
+    def reset(self):
+        self._buffer.clear()
+
+    def feed(self, chunk):
+        if chunk:
+            self._buffer += chunk
+
+        frames = []
+        while True:
+            frame, complete = self._next_frame()
+            if not complete:
+                break
+            if frame is not None:
+                frames.append(frame)
+        return frames
+
+    def _next_frame(self):
+        buffer = self._buffer
+        start = buffer.find(self.start_marker)
+        if start < 0:
+            # Se conserva solo lo que podría ser el comienzo de un marcador partido
+            keep = len(self.start_marker) - 1
+            if len(buffer) > keep:
+                del buffer[:len(buffer) - keep]
+            return None, False
+        if start:
+            del buffer[:start]
+
+        body_start = len(self.start_marker)
+        end = buffer.find(self.end_marker, body_start)
+        if end >= 0:
+            consumed = end + len(self.end_marker)
+        else:
+            # El firmware del MLX90640 no termina "END DATA" con salto de línea: el fotograma
+            # se da por completo en cuanto llegan todas sus filas, sin esperar al marcador
+            end = self._rows_end(body_start)
+            consumed = end + 1
+
+        # Un START intermedio indica que el fotograma actual llegó truncado
+        restart = buffer.find(self.start_marker, body_start, end if end >= 0 else len(buffer))
+        if restart >= 0:
+            print("Error: Fotograma truncado. Sincronizando con el siguiente.")
+            self.frames_rejected += 1
+            del buffer[:restart]
+            return None, True
+
+        if end < 0:
+            if len(buffer) > self.max_buffer_size:
+                print("Error: Fotograma sin marcador de fin. Descartando datos recibidos.")
+                self.frames_rejected += 1
+                del buffer[:body_start]
+                # Se sigue buscando en lo que queda: sin otro START se descarta en esta misma llamada
+                return None, True
+            return None, False
+
+        # En modo continuo el firmware añade el número de secuencia: "START DATA 42"
+        header_end = buffer.find(b'\n', body_start, end)
+        header = bytes(buffer[body_start:max(header_end, body_start)]).strip()
+        sequence = int(header) if header.isdigit() else None
+
+        body = bytes(buffer[max(header_end, body_start):end])
+        del buffer[:consumed]
+
+        frame = self.parse_body(body)
+        if frame is None:
+            self.frames_rejected += 1
+            return None, True
+        self.frames_decoded += 1
+        return (frame, sequence), True
+
+    def _rows_end(self, body_start):
+        if not self.rows:
+            return -1
+        buffer = self._buffer
+        # Fin de la línea del marcador y, a continuación, fin de cada fila
+        position = buffer.find(b'\n', body_start)
+        for _ in range(self.rows):
+            if position < 0:
+                return -1
+            position = buffer.find(b'\n', position + 1)
+        return position
+
+    def parse_body(self, body):
+        lines = body.split()
+        rows = self.rows or len(lines)
+        cols = self.cols or (lines[0].count(b',') + 1 if lines else 0)
+        if not lines or len(lines) != rows:
+            print(f"Error: Número de filas incorrecto. Esperado {rows}, Recibido {len(lines)}.")
+            return None
+        if any(line.count(b',') != cols - 1 for line in lines):
+            print(f"Error: Fila con número incorrecto de columnas. Esperado {cols}.")
+            return None
+        try:
+            values = np.array(b','.join(lines).split(b','), dtype=np.float32)
+        except ValueError as ve:
+            print(f"Error al convertir datos a flotante: {ve}")
+            return None
+        if not self.rows:
+            self.rows, self.cols = rows, cols
+        return values.reshape(rows, cols)
+
+
+class BinaryFrameDecoder:
+    """
+    Decodificador incremental del formato binario (comando 'B').
+    La carga útil se interpreta sin copias con np.frombuffer y se escala en una sola operación.
+    Con rows/cols a None se acepta la forma de la cabecera del primer fotograma con CRC válido.
+    """
+
+    def __init__(self, rows=SENSOR_ROWS, cols=SENSOR_COLS, magic=BINARY_FRAME_MAGIC,
+                 max_buffer_size=MAX_PARSER_BUFFER_BYTES):
+        self.rows = rows
+        self.cols = cols
+        self.magic = magic
+        self.max_buffer_size = max_buffer_size
+        self.frames_decoded = 0
+        self.frames_rejected = 0
+        self._buffer = bytearray()
+
+    def reset(self):
+        self._buffer.clear()
+
+    def feed(self, chunk):
+        if chunk:
+            self._buffer += chunk
+
+        frames = []
+        while True:
+            frame, complete = self._next_frame()
+            if not complete:
+                break
+            if frame is not None:
+                frames.append(frame)
+        return frames
+
+    def _next_frame(self):
+        buffer = self._buffer
+        start = buffer.find(self.magic)
+        if start < 0:
+            keep = len(self.magic) - 1
+            if len(buffer) > keep:
+                del buffer[:len(buffer) - keep]
+            return None, False
+        if start:
+            del buffer[:start]
+        if len(buffer) < BINARY_HEADER.size:
+            return None, False
+
+        _, rows, cols, sequence, crc = BINARY_HEADER.unpack_from(buffer)
+        payload_size = rows * cols * 2
+        if not rows or not cols or (self.rows and (rows, cols) != (self.rows, self.cols)) \
+                or BINARY_HEADER.size + payload_size > self.max_buffer_size:
+            # Cabecera inválida: el "magic" era parte de otros datos
+            del buffer[:len(self.magic)]
+            return None, True
+
+        frame_size = BINARY_HEADER.size + payload_size
+        if len(buffer) < frame_size:
+            return None, False
+
+        header = bytes(buffer[:BINARY_HEADER.size])
+        payload = bytes(buffer[BINARY_HEADER.size:frame_size])
+        if zlib.crc32(payload, zlib.crc32(header[2:8])) != crc:
+            print(f"Error: CRC incorrecto en el fotograma binario {sequence}. Descartando.")
+            self.frames_rejected += 1
+            del buffer[:len(self.magic)]
+            return None, True
+
+        del buffer[:frame_size]
+        self.frames_decoded += 1
+        if not self.rows:
+            self.rows, self.cols = rows, cols
+        raw = np.frombuffer(payload, dtype='<i2').reshape(rows, cols)
+        return (np.divide(raw, np.float32(100), dtype=np.float32), sequence), True
+
+
+def encode_binary_frame(data, sequence):
+    """Fotograma en el formato binario del firmware (comando 'B'), con la cabecera y el CRC."""
+    raw = np.clip(np.rint(np.asarray(data, dtype=np.float64) * 100), -32768, 32767).astype('<i2')
+    rows, cols = raw.shape
+    payload = raw.tobytes()
+    fields = struct.pack('<BBI', rows, cols, sequence & 0xFFFFFFFF)
+    crc = zlib.crc32(payload, zlib.crc32(fields))
+    return BINARY_FRAME_MAGIC + fields + struct.pack('<I', crc) + payload
+
+
+def encode_ascii_frame(data, sequence=None, terminate_end_marker=True):
+    """
+    Fotograma en el formato ASCII del firmware (comando 'T'), con dos decimales. Con
+    `sequence` la cabecera lleva el número de secuencia del modo continuo ("START DATA 42");
+    terminate_end_marker=False imita al firmware del MLX90640, sin salto de línea tras END DATA.
+    """
+    start = START_DATA_MARKER if sequence is None else f"{START_DATA_MARKER} {sequence}"
+    end = f"{END_DATA_MARKER}\r\n" if terminate_end_marker else END_DATA_MARKER
+    body = "".join(",".join(f"{value:.2f}" for value in row) + "\r\n" for row in np.asarray(data).tolist())
+    return f"{start}\r\n{body}{end}".encode('ascii')
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+
+    # Los casos límite del decodificador ASCII (bloques al azar, datos parciales, basura inicial,
+    # END DATA sin salto de línea...) están en tests/test_frame_parser.py
+    mlx_frames = [np.round(rng.uniform(20, 35, (24, 32)), 2).astype(np.float32) for _ in range(5)]
+
+    # Formato binario: mismos valores que el ASCII con dos decimales, en un tercio de bytes
+    binary_stream = b"".join(encode_binary_frame(frame, i) for i, frame in enumerate(mlx_frames))
+    decoder = BinaryFrameDecoder(rows=24, cols=32)
+    decoded = decoder.feed(binary_stream[:1000]) + decoder.feed(binary_stream[1000:])
+    # Forma desconocida (varios sensores distintos): se detecta con el primer fotograma
+    inferred = [AsciiFrameDecoder(rows=None, cols=None), BinaryFrameDecoder(rows=None, cols=None)]
+    streams = [b"".join(map(encode_ascii_frame, mlx_frames)), binary_stream]
+    print("Forma detectada:", [decoder.feed(stream) and (decoder.rows, decoder.cols)
+                               for decoder, stream in zip(inferred, streams)])
+
+    print("Binario idéntico al ASCII:", all(np.array_equal(a, b) for (a, _), b in zip(decoded, mlx_frames)),
+          f"({len(binary_stream) // len(mlx_frames)} frente a "
+          f"{sum(len(encode_ascii_frame(frame)) for frame in mlx_frames) // len(mlx_frames)} bytes por fotograma)")
@@ -0,0 +1,648 @@
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+from app_parameters import (
+    FRAME_SERVER_HOST, FRAME_SERVER_PORT, FRAME_SERVER_MAX_CLIENTS, FRAME_SERVER_WRITE_BUFFER_BYTES,
+    FRAME_SERVER_VIEWER_CREDITS,
+    FRAME_SERVER_JPEG_QUALITY, FRAME_SERVER_JPEG_ZOOM, HEATMAP_COLORMAP, COLOR_SCALE_MODE, UPSAMPLING_METHOD,
+    UPSAMPLING_FACTOR, SERIAL_PROTOCOL, ACQUISITION_MODE, SIMULATOR_PORT_NAME, HEADLESS_STATUS_INTERVAL_S,
+    REPLAY_SPEED
+)
+from acquisition_worker import AcquisitionWorker
+from color_scale import ColorScale, limits_changed
+
+# Mensajes binarios: tipo, filas, columnas, secuencia, marca de tiempo y límites de la escala
+# de color; después los píxeles float32 (b"TFRM") o la imagen JPEG ya coloreada (b"TJPG").
+# Todo en little-endian; los 28 bytes de cabecera dejan los píxeles alineados para Float32Array
+MESSAGE_HEADER = struct.Struct("<4sHHIdff")
+RAW_MESSAGE = b"TFRM"
+JPEG_MESSAGE = b"TJPG"
+NO_SEQUENCE = 0xFFFFFFFF
+VIEWER_FORMATS = ("raw", "jpeg", "both")
+
+WEBSOCKET_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OPCODE_TEXT, OPCODE_BINARY, OPCODE_CLOSE, OPCODE_PING, OPCODE_PONG = 0x1, 0x2, 0x8, 0x9, 0xA
+# Los visores solo envían confirmaciones (un mensaje de texto o binario por cada mensaje
+# recibido, ver Viewer) y mensajes de control: cualquier cosa mayor se considera un error
+MAX_CLIENT_MESSAGE_BYTES = 64 * 1024
+ACK_PAYLOAD = b"ok"
+REQUEST_TIMEOUT_S = 10.0
+
+
+def encode_message(kind, frame, limits, payload):
+    sequence = NO_SEQUENCE if frame.sequence is None else frame.sequence & 0xFFFFFFFF
+    rows, cols = frame.data.shape
+    return MESSAGE_HEADER.pack(kind, rows, cols, sequence, frame.timestamp, limits[0], limits[1]) + payload
+
+
+def decode_message(message):
+    """Mensaje del servidor -> (tipo, secuencia, marca de tiempo, límites, datos (filas, columnas) o bytes JPEG)."""
+    kind, rows, cols, sequence, timestamp, vmin, vmax = MESSAGE_HEADER.unpack_from(message)
+    payload = message[MESSAGE_HEADER.size:]
+    if kind == RAW_MESSAGE:
+        payload = np.frombuffer(payload, dtype="<f4").reshape(rows, cols)
+    return kind, None if sequence == NO_SEQUENCE else sequence, timestamp, (vmin, vmax), payload
+
+
+def _apply_mask(data, key):
+    data = np.frombuffer(data, dtype=np.uint8)
+    return (data ^ np.resize(np.frombuffer(key, dtype=np.uint8), len(data))).tobytes()
+
+
+def websocket_frame(payload, opcode=OPCODE_BINARY, mask=False):
+    """Trama WebSocket completa (RFC 6455) en un solo bloque de bytes. Los clientes deben enmascarar."""
+    length = len(payload)
+    mask_bit = 0x80 if mask else 0
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, mask_bit | length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, mask_bit | 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, mask_bit | 127, length)
+    if mask:
+        key = os.urandom(4)
+        return header + key + _apply_mask(payload, key)
+    return header + payload
+
+
+async def read_websocket_message(reader, max_bytes=MAX_CLIENT_MESSAGE_BYTES):
+    """Siguiente mensaje: (opcode, bytes). Junta los fragmentos y quita la máscara."""
+    opcode = None
+    parts = []
+    received = 0
+    while True:
+        first, second = await reader.readexactly(2)
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", await reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", await reader.readexactly(8))[0]
+        received += length
+        if received > max_bytes:
+            raise ValueError(f"mensaje de más de {max_bytes} bytes")
+        key = await reader.readexactly(4) if second & 0x80 else None
+        payload = await reader.readexactly(length)
+        if key:
+            payload = _apply_mask(payload, key)
+        frame_opcode = first & 0x0F
+        if frame_opcode >= OPCODE_CLOSE:
+            # Los mensajes de control pueden llegar entre fragmentos: se entregan aparte
+            return frame_opcode, payload
+        if frame_opcode:
+            opcode = frame_opcode
+        parts.append(payload)
+        if first & 0x80:
+            return opcode, b"".join(parts)
+
+
+async def open_viewer(host=FRAME_SERVER_HOST, port=FRAME_SERVER_PORT, viewer_format="raw"):
+    """
+    Cliente mínimo del servidor (pruebas y benchmark): conecta a /ws y devuelve
+    (reader, writer) listos para read_websocket_message / decode_message.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    key = base64.b64encode(os.urandom(16)).decode("ascii")
+    writer.write((f"GET /ws?format={viewer_format} HTTP/1.1\r\nHost: {host}:{port}\r\nUpgrade: websocket\r\n"
+                  f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n")
+                 .encode("ascii"))
+    status = await reader.readline()
+    while (await reader.readline()) not in (b"\r\n", b""):
+        pass
+    if b" 101 " not in status:
+        writer.close()
+        raise ConnectionError(f"El servidor rechazó la conexión: {status.decode('latin-1').strip()}")
+    return reader, writer
+
+
+def send_ack(writer):
+    """Confirma al servidor el último mensaje recibido (clientes de open_viewer)."""
+    writer.write(websocket_frame(ACK_PAYLOAD, OPCODE_TEXT, mask=True))
+
+
+class Viewer:
+    """
+    Un cliente WebSocket con control de flujo por créditos: se le envían como mucho `credits`
+    mensajes sin confirmar y el cliente confirma cada uno al terminar de procesarlo (cualquier
+    mensaje de texto o binario). Mientras tanto solo se guarda el último mensaje de cada tipo:
+    el nuevo sustituye al pendiente y el viejo cuenta como descartado. Los fotogramas no se
+    acumulan en los buffers del sistema ni del cliente, así que un visor lento ve menos
+    fotogramas, pero nunca retrasados, y no frena la adquisición ni a los demás visores.
+    """
+
+    def __init__(self, writer, peer, viewer_format, credits=FRAME_SERVER_VIEWER_CREDITS):
+        self.writer = writer
+        self.peer = peer
+        self.format = viewer_format
+        self.wants_raw = viewer_format in ("raw", "both")
+        self.wants_jpeg = viewer_format in ("jpeg", "both")
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.connected_at = time.time()
+        self.max_credits = max(1, credits)
+        self._credits = self.max_credits
+        self._pending = {}
+        self._ready = asyncio.Event()
+
+    def offer(self, kind, message):
+        if kind in self._pending:
+            self.frames_dropped += 1
+        self._pending[kind] = message
+        self._ready.set()
+
+    def acknowledge(self):
+        # Un cliente que confirma de más no acumula créditos para después
+        self._credits = min(self._credits + 1, self.max_credits)
+        if self._pending:
+            self._ready.set()
+
+    async def send_loop(self):
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            while self._pending and self._credits > 0:
+                kind = next(iter(self._pending))
+                self.writer.write(self._pending.pop(kind))
+                self.frames_sent += 1
+                self._credits -= 1
+            # Espera solo si el cliente acumula más de FRAME_SERVER_WRITE_BUFFER_BYTES sin leer
+            await self.writer.drain()
+
+
+class _LatestFrameSlot:
+    """
+    Adaptador de cola para AcquisitionWorker: guarda solo el último fotograma y avisa al
+    bucle de asyncio una vez, sin acumular llamadas si el bucle va por detrás. El hilo de
+    adquisición nunca espera.
+    """
+
+    def __init__(self, loop, callback):
+        self._loop = loop
+        self._callback = callback
+        self._lock = threading.Lock()
+        self._frame = None
+        self._scheduled = False
+        self.dropped_frames = 0
+
+    def put(self, frame):
+        with self._lock:
+            if self._frame is not None:
+                self.dropped_frames += 1
+            self._frame = frame
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._loop.call_soon_threadsafe(self._deliver)
+
+    def _deliver(self):
+        with self._lock:
+            frame, self._frame = self._frame, None
+            self._scheduled = False
+        if frame is not None:
+            self._callback(frame)
+
+
+class FrameServer:
+    """
+    Difunde los fotogramas de un FrameSource a muchos visores (navegador o scripts) con
+    asyncio y la biblioteca estándar. La adquisición corre en su propio AcquisitionWorker;
+    cada fotograma se codifica una sola vez y se ofrece a todos los visores, cada uno con
+    su propia tarea de envío (ver Viewer).
+      GET /           visor HTML
+      GET /ws         WebSocket; ?format=raw (float32), jpeg o both
+      GET /frame.jpg  último fotograma coloreado
+      GET /status     estado en JSON
+    El JPEG usa la escala de color y la interpolación de la interfaz y se codifica en un hilo
+    aparte, solo si algún visor lo pide y descartando fotogramas si no da abasto.
+    """
+
+    def __init__(self, source, host=FRAME_SERVER_HOST, port=FRAME_SERVER_PORT,
+                 max_clients=FRAME_SERVER_MAX_CLIENTS, color_scale_mode=COLOR_SCALE_MODE,
+                 method=UPSAMPLING_METHOD, factor=UPSAMPLING_FACTOR, zoom=FRAME_SERVER_JPEG_ZOOM,
+                 quality=FRAME_SERVER_JPEG_QUALITY, colormap=HEATMAP_COLORMAP):
+        self.source = source
+        self.host = host
+        self.port = port
+        self.max_clients = max_clients
+        self.method = method
+        self.factor = factor
+        self.zoom = zoom
+        self.quality = quality
+        self.colormap = colormap
+        self.viewers = set()
+        self.frames_received = 0
+        self.started_at = None
+        self.error = None
+        self._color_scale = ColorScale(color_scale_mode)
+        self._limits = None
+        self._latest = None
+        self._latest_jpeg = None
+        self._lut = None
+        self._image = None
+        self._jpeg_error = None
+        self._jpeg_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="FrameServerJpeg")
+        self._jpeg_busy = False
+        self._jpeg_next = None
+        self._slot = None
+        self._worker = None
+        self._server = None
+        self._stopped = None
+        self._connections = set()
+
+    @property
+    def dropped_frames(self):
+        """Fotogramas que el bucle no llegó a difundir (además de los perdidos en el puerto)."""
+        return self._slot.dropped_frames if self._slot else 0
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._slot = _LatestFrameSlot(loop, self._publish)
+        self._worker = AcquisitionWorker(self.source, self._slot)
+        self._worker.start()
+        self.started_at = time.time()
+
+    def stop(self):
+        if self._stopped is not None:
+            self._stopped.set()
+
+    async def close(self):
+        if self._worker is not None:
+            # El worker espera hasta ACQUISITION_READ_TIMEOUT_S al puerto: fuera del bucle
+            await asyncio.get_running_loop().run_in_executor(None, self._worker.stop)
+            self.error = self._worker.error
+            self._worker = None
+        self.source.close()
+        if self._server is not None:
+            self._server.close()
+            # Al cerrar las conexiones de los visores, sus tareas terminan por sí solas
+            for viewer in list(self.viewers):
+                viewer.writer.close()
+            if self._connections:
+                await asyncio.wait(self._connections, timeout=REQUEST_TIMEOUT_S)
+            await self._server.wait_closed()
+            self._server = None
+        self._jpeg_executor.shutdown(wait=False)
+
+    async def run(self, duration=0, status_interval=HEADLESS_STATUS_INTERVAL_S):
+        """Sirve hasta `stop()`, agotar `duration` o terminar la adquisición. Devuelve el código de salida."""
+        await self.start()
+        print(f"Servidor de fotogramas en http://{self.host}:{self.port}/ (origen: {self.source.name})", flush=True)
+        deadline = time.monotonic() + duration if duration else None
+        next_status = time.monotonic() + status_interval if status_interval else None
+        try:
+            while not self._stopped.is_set():
+                try:
+                    await asyncio.wait_for(self._stopped.wait(), 0.5)
+                except asyncio.TimeoutError:
+                    pass
+                now = time.monotonic()
+                if not self._worker.is_alive():
+                    break
+                if deadline and now >= deadline:
+                    break
+                if next_status and now >= next_status:
+                    self.print_status()
+                    next_status = now + status_interval
+        finally:
+            await self.close()
+        self.print_status()
+        if self.error:
+            print(self.error, flush=True)
+            return 1
+        return 0
+
+    def status(self):
+        elapsed = time.time() - self.started_at if self.started_at else 0.0
+        return {
+            "source": self.source.name,
+            "frames": self.frames_received,
+            "fps": self.frames_received / elapsed if elapsed > 0 else 0.0,
+            "dropped_source": self.source.dropped_frames,
+            "dropped_server": self.dropped_frames,
+            "jpeg": self._jpeg_error or "disponible",
+            "viewers": [{"peer": viewer.peer, "format": viewer.format, "sent": viewer.frames_sent,
+                         "dropped": viewer.frames_dropped} for viewer in self.viewers],
+        }
+
+    def print_status(self):
+        status = self.status()
+        dropped = sum(viewer["dropped"] for viewer in status["viewers"])
+        print(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {status['frames']} fotogramas ({status['fps']:.1f} fps), "
+              f"{len(status['viewers'])} visores, {dropped} envíos descartados por visores lentos, "
+              f"{status['dropped_source']} perdidos en el origen", flush=True)
+
+    def _publish(self, frame):
+        """Bucle de asyncio: un fotograma nuevo del hilo de adquisición."""
+        self.frames_received += 1
+        limits = self._color_scale.update(frame.data)
+        if limits_changed(self._limits, limits):
+            self._limits = limits
+        self._latest = frame, self._limits
+        raw = None
+        wants_jpeg = False
+        for viewer in self.viewers:
+            if viewer.wants_raw:
+                if raw is None:
+                    payload = np.asarray(frame.data, dtype="<f4").tobytes()
+                    raw = websocket_frame(encode_message(RAW_MESSAGE, frame, self._limits, payload))
+                viewer.offer(RAW_MESSAGE, raw)
+            wants_jpeg = wants_jpeg or viewer.wants_jpeg
+        if wants_jpeg:
+            self._request_jpeg(frame, self._limits)
+
+    def _request_jpeg(self, frame, limits):
+        if self._jpeg_busy:
+            # El codificador va por detrás: solo se guarda el último fotograma
+            self._jpeg_next = frame, limits
+            return
+        self._jpeg_busy = True
+        future = asyncio.get_running_loop().run_in_executor(self._jpeg_executor, self.encode_jpeg, frame.data, limits)
+        future.add_done_callback(lambda done: self._jpeg_done(done, frame, limits))
+
+    def _jpeg_done(self, future, frame, limits):
+        self._jpeg_busy = False
+        jpeg = None if future.cancelled() or future.exception() else future.result()
+        if jpeg is not None:
+            self._latest_jpeg = frame.sequence, jpeg
+            message = websocket_frame(encode_message(JPEG_MESSAGE, frame, limits, jpeg))
+            for viewer in self.viewers:
+                if viewer.wants_jpeg:
+                    viewer.offer(JPEG_MESSAGE, message)
+        if self._jpeg_next is not None:
+            next_frame, self._jpeg_next = self._jpeg_next, None
+            self._request_jpeg(*next_frame)
+
+    def jpeg_available(self):
+        if self._lut is None and self._jpeg_error is None:
+            try:
+                from PIL import Image
+                from colormap_lut import build_lut
+
+                self._lut = build_lut(self.colormap)
+                # Se guarda el módulo para encode_jpeg
+                self._image = Image
+            except ImportError as e:
+                self._jpeg_error = f"JPEG no disponible (falta {e.name}: pip install Pillow matplotlib)"
+        return self._lut is not None
+
+    def encode_jpeg(self, data, limits):
+        """Fotograma coloreado como en la interfaz -> bytes JPEG. Devuelve None si falta Pillow."""
+        if not self.jpeg_available():
+            return None
+        from frame_export import color_indices
+
+        indices = color_indices(data[None], np.array([limits], dtype=np.float64), len(self._lut), self.method,
+                                self.factor, self.zoom)[0]
+        buffer = io.BytesIO()
+        self._image.fromarray(self._lut[indices, :3]).save(buffer, "JPEG", quality=self.quality)
+        return buffer.getvalue()
+
+    async def _handle_connection(self, reader, writer):
+        peer = "%s:%s" % writer.get_extra_info("peername")[:2]
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            request = await asyncio.wait_for(self._read_request(reader), REQUEST_TIMEOUT_S)
+            if request is None:
+                return
+            method, target, headers = request
+            url = urlsplit(target)
+            query = parse_qs(url.query)
+            if method != "GET":
+                await self._respond(writer, "405 Method Not Allowed", "text/plain", b"Solo GET")
+            elif url.path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                await self._serve_viewer(reader, writer, headers, peer, query.get("format", ["raw"])[0])
+            elif url.path == "/":
+                await self._respond(writer, "200 OK", "text/html; charset=utf-8", self._viewer_page())
+            elif url.path == "/frame.jpg":
+                await self._serve_snapshot(writer)
+            elif url.path == "/status":
+                await self._respond(writer, "200 OK", "application/json", json.dumps(self.status()).encode("utf-8"))
+            else:
+                await self._respond(writer, "404 Not Found", "text/plain", b"No encontrado")
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return method, target, headers
+
+    @staticmethod
+    async def _respond(writer, status, content_type, body, extra_headers=""):
+        writer.write((f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+                      f"Cache-Control: no-store\r\nConnection: close\r\n{extra_headers}\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def _serve_snapshot(self, writer):
+        if self._latest is None:
+            await self._respond(writer, "503 Service Unavailable", "text/plain", b"Sin fotogramas todavia")
+            return
+        frame, limits = self._latest
+        if self._latest_jpeg is not None and self._latest_jpeg[0] == frame.sequence:
+            jpeg = self._latest_jpeg[1]
+        else:
+            jpeg = await asyncio.get_running_loop().run_in_executor(self._jpeg_executor, self.encode_jpeg,
+                                                                    frame.data, limits)
+        if jpeg is None:
+            await self._respond(writer, "501 Not Implemented", "text/plain", self._jpeg_error.encode("utf-8"))
+        else:
+            await self._respond(writer, "200 OK", "image/jpeg", jpeg)
+
+    async def _serve_viewer(self, reader, writer, headers, peer, viewer_format):
+        if viewer_format not in VIEWER_FORMATS:
+            await self._respond(writer, "400 Bad Request", "text/plain", b"format: raw, jpeg o both")
+            return
+        if viewer_format != "raw" and not self.jpeg_available():
+            await self._respond(writer, "501 Not Implemented", "text/plain", self._jpeg_error.encode("utf-8"))
+            return
+        if len(self.viewers) >= self.max_clients:
+            await self._respond(writer, "503 Service Unavailable", "text/plain", b"Demasiados visores")
+            return
+        key = headers.get("sec-websocket-key")
+        if not key:
+            await self._respond(writer, "400 Bad Request", "text/plain", b"Falta Sec-WebSocket-Key")
+            return
+        accept = base64.b64encode(hashlib.sha1(key.encode("ascii") + WEBSOCKET_GUID).digest()).decode("ascii")
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode("ascii"))
+        # Pocos fotogramas en vuelo por visor: lo que no cabe se descarta en Viewer.offer. El
+        # buffer de envío del sistema se limita también; si no, guarda segundos de fotogramas
+        writer.transport.set_write_buffer_limits(high=FRAME_SERVER_WRITE_BUFFER_BYTES)
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, FRAME_SERVER_WRITE_BUFFER_BYTES)
+        viewer = Viewer(writer, peer, viewer_format)
+        self.viewers.add(viewer)
+        sender = asyncio.ensure_future(viewer.send_loop())
+        try:
+            if self._latest is not None and viewer.wants_raw:
+                frame, limits = self._latest
+                viewer.offer(RAW_MESSAGE, websocket_frame(encode_message(
+                    RAW_MESSAGE, frame, limits, np.asarray(frame.data, dtype="<f4").tobytes())))
+            await self._receive_loop(reader, writer, viewer, sender)
+        finally:
+            self.viewers.discard(viewer)
+            sender.cancel()
+
+    @staticmethod
+    async def _receive_loop(reader, writer, viewer, sender):
+        """Atiende confirmaciones, ping y cierre del visor; termina también si falla el envío."""
+        receiver = asyncio.ensure_future(read_websocket_message(reader))
+        try:
+            while True:
+                done, _ = await asyncio.wait({receiver, sender}, return_when=asyncio.FIRST_COMPLETED)
+                if sender in done or receiver.exception() is not None:
+                    return
+                opcode, payload = receiver.result()
+                if opcode == OPCODE_CLOSE:
+                    writer.write(websocket_frame(payload[:2], OPCODE_CLOSE))
+                    return
+                if opcode == OPCODE_PING:
+                    writer.write(websocket_frame(payload, OPCODE_PONG))
+                elif opcode in (OPCODE_TEXT, OPCODE_BINARY):
+                    viewer.acknowledge()
+                receiver = asyncio.ensure_future(read_websocket_message(reader))
+        finally:
+            receiver.cancel()
+
+    def _viewer_page(self):
+        jpeg = self.jpeg_available()
+        lut = self._lut[:, :3].tolist() if jpeg else [[value] * 3 for value in range(256)]
+        return (VIEWER_PAGE
+                .replace("%LUT%", json.dumps(lut, separators=(",", ":")))
+                .replace("%FORMAT%", "jpeg" if jpeg and self.method != "none" else "raw")).encode("utf-8")
+
+
+VIEWER_PAGE = """<!DOCTYPE html>
+<html lang="es"><head><meta charset="utf-8"><title>Cámara térmica</title>
+<style>body{font-family:sans-serif;background:#222;color:#ddd;text-align:center}
+canvas,img{width:min(90vw,800px);image-rendering:pixelated;background:#000}</style></head>
+<body><h3 id="info">Conectando...</h3><canvas id="raw"></canvas><img id="jpeg" hidden>
+<script>
+const LUT = %LUT%;
+const canvas = document.getElementById("raw"), image = document.getElementById("jpeg");
+const info = document.getElementById("info"), context = canvas.getContext("2d");
+const format = new URLSearchParams(location.search).get("format") || "%FORMAT%";
+let frames = 0, started = performance.now();
+function connect() {
+  const socket = new WebSocket(`ws://${location.host}/ws?format=${format}`);
+  socket.binaryType = "arraybuffer";
+  socket.onmessage = (event) => {
+    const view = new DataView(event.data);
+    const kind = String.fromCharCode(...new Uint8Array(event.data, 0, 4));
+    const rows = view.getUint16(4, true), cols = view.getUint16(6, true), sequence = view.getUint32(8, true);
+    const vmin = view.getFloat32(20, true), vmax = view.getFloat32(24, true);
+    if (kind === "TJPG") {
+      canvas.hidden = true; image.hidden = false;
+      const url = URL.createObjectURL(new Blob([new Uint8Array(event.data, 28)], {type: "image/jpeg"}));
+      image.onload = () => URL.revokeObjectURL(url);
+      image.src = url;
+    } else {
+      const pixels = new Float32Array(event.data, 28, rows * cols);
+      canvas.width = cols; canvas.height = rows;
+      const output = context.createImageData(cols, rows), scale = LUT.length / Math.max(vmax - vmin, 1e-6);
+      let max = -Infinity;
+      for (let i = 0; i < pixels.length; i++) {
+        const color = LUT[Math.min(LUT.length - 1, Math.max(0, Math.floor((pixels[i] - vmin) * scale)))];
+        output.data.set(color, i * 4); output.data[i * 4 + 3] = 255;
+        max = Math.max(max, pixels[i]);
+      }
+      context.putImageData(output, 0, 0);
+      info.dataset.max = max.toFixed(2);
+    }
+    frames++;
+    const seconds = (performance.now() - started) / 1000;
+    info.textContent = `${rows}x${cols} · fotograma ${sequence} · ${vmin.toFixed(1)}-${vmax.toFixed(1)} °C` +
+      (info.dataset.max ? ` · máx. ${info.dataset.max} °C` : "") + ` · ${(frames / seconds).toFixed(1)} fps`;
+    // Confirmación: el servidor no envía el siguiente fotograma hasta recibirla
+    socket.send("ok");
+  };
+  socket.onclose = () => { info.textContent = "Desconectado. Reintentando..."; setTimeout(connect, 1000); };
+}
+connect();
+</script></body></html>
+"""
+
+
+def open_frame_source(port=None, replay=None, speed=REPLAY_SPEED, protocol=SERIAL_PROTOCOL, mode=ACQUISITION_MODE):
+    if replay:
+        from frame_sources import ReplayFrameSource
+
+        return ReplayFrameSource(replay, speed, loop=True)
+    from multi_camera import open_source
+
+    return open_source(port, protocol, mode)
+
+
+if __name__ == "__main__":
+    import argparse
+    import signal
+    import sys
+
+    from upsampling import UPSAMPLING_METHODS
+
+    parser = argparse.ArgumentParser(description="Difunde los fotogramas de un sensor a muchos visores "
+                                                 "(navegador o WebSocket) desde un único puerto")
+    parser.add_argument("port", nargs="?", default=SIMULATOR_PORT_NAME,
+                        help=f"Puerto, URL de pyserial o '{SIMULATOR_PORT_NAME}' / '{SIMULATOR_PORT_NAME} 24x32'")
+    parser.add_argument("--replay", metavar="REGISTRO", help="Difunde un registro guardado (en bucle)")
+    parser.add_argument("--speed", type=float, default=REPLAY_SPEED)
+    parser.add_argument("--host", default=FRAME_SERVER_HOST)
+    parser.add_argument("--http-port", type=int, default=FRAME_SERVER_PORT)
+    parser.add_argument("--max-clients", type=int, default=FRAME_SERVER_MAX_CLIENTS)
+    parser.add_argument("--interpolation", choices=UPSAMPLING_METHODS, default=UPSAMPLING_METHOD,
+                        help="Interpolación del JPEG")
+    parser.add_argument("--zoom", type=int, default=FRAME_SERVER_JPEG_ZOOM)
+    parser.add_argument("--quality", type=int, default=FRAME_SERVER_JPEG_QUALITY)
+    parser.add_argument("--protocol", choices=("auto", "ascii", "binary"), default=SERIAL_PROTOCOL)
+    parser.add_argument("--mode", choices=("auto", "stream", "request"), default=ACQUISITION_MODE)
+    parser.add_argument("-d", "--duration", type=float, default=0, help="Segundos (0: hasta Ctrl+C)")
+    parser.add_argument("--status-interval", type=float, default=HEADLESS_STATUS_INTERVAL_S)
+    args = parser.parse_args()
+
+    source = open_frame_source(args.port, args.replay, args.speed, args.protocol, args.mode)
+    if source is None:
+        print(f"No se pudo conectar a {args.port}.")
+        sys.exit(1)
+    server = FrameServer(source, args.host, args.http_port, args.max_clients, method=args.interpolation,
+                         zoom=args.zoom, quality=args.quality)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, server.stop)
+            except NotImplementedError:
+                # Windows: Ctrl+C llega como KeyboardInterrupt
+                pass
+        return await server.run(args.duration, args.status_interval)
+
+    sys.exit(asyncio.run(main()))
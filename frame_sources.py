@@ -0,0 +1,285 @@
+import os
+import time
+
+import numpy as np
+
+from app_parameters import (
+    SENSOR_ROWS, SENSOR_COLS, ACQUISITION_MODE, ACQUISITION_PIPELINE_DEPTH, ACQUISITION_READ_TIMEOUT_S,
+    SYNTHETIC_FPS, REPLAY_SPEED, REPLAY_FALLBACK_FPS
+)
+from frame_parser import Frame
+
+
+class FrameSource:
+    """
+    Origen de fotogramas para AcquisitionWorker. `frames(stop_event)` es un generador
+    de Frame que termina al activarse `stop_event`, al agotarse el origen o ante un
+    error, que queda en `error` para que la interfaz lo muestre.
+    """
+
+    name = "origen"
+
+    def __init__(self):
+        self.error = None
+        self.timeouts = 0
+
+    @property
+    def dropped_frames(self):
+        return 0
+
+    def frames(self, stop_event):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SerialFrameSource(FrameSource):
+    """
+    Fotogramas del sensor a través de SerialHandler. En modo "request" mantiene
+    `pipeline_depth` peticiones en vuelo; en modo "stream" el dispositivo envía
+    fotogramas sin esperar peticiones. "auto" intenta el modo continuo y vuelve a
+    peticiones si el firmware no lo soporta.
+    """
+
+    def __init__(self, serial_handler, mode=ACQUISITION_MODE,
+                 pipeline_depth=ACQUISITION_PIPELINE_DEPTH, read_timeout=ACQUISITION_READ_TIMEOUT_S):
+        super().__init__()
+        self.serial_handler = serial_handler
+        self.name = serial_handler.connected_port or "serial"
+        self.mode = mode
+        self.pipeline_depth = max(1, pipeline_depth)
+        self.read_timeout = read_timeout
+        self._frames_received = 0
+
+    @property
+    def dropped_frames(self):
+        return self.serial_handler.dropped_frames
+
+    def frames(self, stop_event):
+        import serial
+
+        try:
+            if self.mode != "request":
+                fallback = yield from self._stream_frames(stop_event)
+                if not fallback:
+                    return
+            yield from self._requested_frames(stop_event)
+        except serial.SerialException as e:
+            self.error = f"Error al enviar comandos al sensor: {e}"
+
+    def close(self):
+        self.serial_handler.disconnect()
+
+    def _stream_frames(self, stop_event):
+        handler = self.serial_handler
+        handler.start_stream()
+        try:
+            while not stop_event.is_set():
+                for frame in handler.iter_frames(timeout=self.read_timeout):
+                    self._frames_received += 1
+                    yield frame
+                    if stop_event.is_set():
+                        break
+                else:
+                    if not handler.is_reading:
+                        self.error = "Se perdió la conexión serial con el sensor."
+                        return False
+                    self.timeouts += 1
+                    if self.mode == "auto" and self._frames_received <= 1:
+                        print("El firmware no soporta el modo continuo. Usando peticiones por fotograma.")
+                        return True
+                    # El dispositivo pudo reiniciarse: se vuelve a pedir el flujo
+                    handler.start_stream()
+        finally:
+            if handler.is_reading:
+                handler.stop_stream()
+        return False
+
+    def _requested_frames(self, stop_event):
+        handler = self.serial_handler
+        in_flight = 0
+        while not stop_event.is_set():
+            while in_flight < self.pipeline_depth:
+                handler.request_frame()
+                in_flight += 1
+
+            data = handler.read_data(timeout=self.read_timeout)
+
+            if data is None:
+                if not handler.is_reading:
+                    self.error = "Se perdió la conexión serial con el sensor."
+                    return
+                # Las peticiones pendientes se dan por perdidas y se vuelven a enviar
+                self.timeouts += 1
+                in_flight = 0
+                continue
+
+            in_flight = max(0, in_flight - 1)
+            self._frames_received += 1
+            sequence = handler.last_sequence
+            if sequence is None:
+                sequence = self._frames_received
+            yield Frame(data, time.time(), sequence)
+
+
+class ReplayFrameSource(FrameSource):
+    """
+    Reproduce un registro guardado (CSV de píxeles, CSV Tiempo,Temperatura, grabación
+    .npy o archivo .thz) como si llegara del sensor. `speed` multiplica la velocidad original;
+    0 o None reproduce tan rápido como sea posible. Los CSV se leen por bloques, así
+    que la memoria no depende del tamaño del registro.
+    """
+
+    def __init__(self, path, speed=REPLAY_SPEED, loop=False):
+        super().__init__()
+        self.path = path
+        self.name = os.path.basename(path)
+        self.speed = speed
+        self.loop = loop
+
+    def frames(self, stop_event):
+        try:
+            while True:
+                yield from self._paced(self._recorded_frames(), stop_event)
+                if not self.loop or stop_event.is_set():
+                    return
+        except (IOError, OSError, ValueError) as e:
+            self.error = f"Error al reproducir '{self.name}': {e}"
+
+    def _recorded_frames(self):
+        """Genera (tiempo grabado en segundos, datos, secuencia)."""
+        if self.path.lower().endswith(".npy"):
+            from npy_recorder import load_recording
+
+            frames, index, _ = load_recording(self.path)
+            for position in range(len(frames)):
+                yield float(index["timestamp"][position]), np.array(frames[position], dtype=np.float32), \
+                    int(index["sequence"][position])
+            return
+
+        if self.path.lower().endswith(".thz"):
+            from thermal_archive import ThermalArchive
+
+            with ThermalArchive(self.path) as archive:
+                for data, timestamps, sequences in archive.iter_chunks():
+                    yield from zip(timestamps.tolist(), data, sequences.tolist())
+            return
+
+        from log_reader import read_log_info, iter_frames, iter_series
+
+        info = read_log_info(self.path)
+        if info.kind == "series":
+            # Un único sensor de temperatura: cada muestra es un fotograma de 1x1
+            position = 0
+            for times, temperatures in iter_series(self.path):
+                for elapsed, temperature in zip(times.tolist(), temperatures):
+                    yield elapsed, temperature.reshape(1, 1), position
+                    position += 1
+            return
+
+        for chunk in iter_frames(self.path):
+            if info.has_metadata:
+                timestamps = chunk.timestamps.tolist()
+            else:
+                # Registros sin marcas de tiempo: se reproducen a un ritmo fijo
+                timestamps = (chunk.sequences / REPLAY_FALLBACK_FPS).tolist()
+            for timestamp, data, sequence in zip(timestamps, chunk.data, chunk.sequences.tolist()):
+                yield timestamp, data, sequence
+
+    def _paced(self, recorded, stop_event):
+        first_recorded = None
+        started = time.perf_counter()
+        for recorded_time, data, sequence in recorded:
+            if stop_event.is_set():
+                return
+            if self.speed:
+                if first_recorded is None:
+                    first_recorded = recorded_time
+                delay = started + (recorded_time - first_recorded) / self.speed - time.perf_counter()
+                if delay > 0 and stop_event.wait(delay):
+                    return
+            yield Frame(data, time.time(), sequence)
+
+
+class SyntheticFrameSource(FrameSource):
+    """
+    Versión vectorizada del modelo de test_without_sensor.ino: un punto caliente
+    gaussiano que se desplaza al azar sobre 25 °C, con ruido uniforme y límites de
+    20 a 40 °C. Los fotogramas se generan por lotes de `batch_size`. `fps` fija el
+    ritmo; 0 o None genera tan rápido como sea posible.
+    """
+
+    name = "Simulador"
+
+    def __init__(self, rows=SENSOR_ROWS, cols=SENSOR_COLS, fps=SYNTHETIC_FPS, batch_size=64, seed=None):
+        super().__init__()
+        self.rows = rows
+        self.cols = cols
+        self.fps = fps
+        self.batch_size = batch_size
+        self._rng = np.random.default_rng(seed)
+        self._row_grid = np.arange(rows, dtype=np.float32)[None, :, None]
+        self._col_grid = np.arange(cols, dtype=np.float32)[None, None, :]
+
+    def generate(self, count):
+        rng = self._rng
+        rows, cols = self.rows, self.cols
+        # random(a, b) de Arduino devuelve enteros en [a, b)
+        center_x = cols // 2 + rng.integers(-(cols // 3), cols // 3, count).astype(np.float32)
+        center_y = rows // 2 + rng.integers(-(rows // 3), rows // 3, count).astype(np.float32)
+        hotspot_peak = 5.0 + rng.integers(0, 100, count).astype(np.float32) / 100.0 * 3.0
+        noise_level = 0.3 + rng.integers(0, 100, count).astype(np.float32) / 100.0 * 0.3
+
+        distance_sq = np.square(self._col_grid - center_x[:, None, None])
+        distance_sq = distance_sq + np.square(self._row_grid - center_y[:, None, None])
+        frames = np.exp(-distance_sq / np.float32(0.5 * (rows + cols)))
+        frames *= hotspot_peak[:, None, None]
+        frames += 25.0
+        noise = rng.integers(-100, 100, (count, rows, cols)).astype(np.float32)
+        noise *= (noise_level / 100.0)[:, None, None]
+        frames += noise
+        np.clip(frames, 20.0, 40.0, out=frames)
+        # El firmware imprime dos decimales
+        return np.round(frames, 2)
+
+    def frames(self, stop_event):
+        interval = 1.0 / self.fps if self.fps else 0.0
+        next_time = time.perf_counter()
+        sequence = 0
+        while not stop_event.is_set():
+            for data in self.generate(self.batch_size):
+                if interval:
+                    next_time += interval
+                    delay = next_time - time.perf_counter()
+                    if delay > 0:
+                        if stop_event.wait(delay):
+                            return
+                    else:
+                        # Sin margen: no se acumula retraso a recuperar
+                        next_time = time.perf_counter()
+                elif stop_event.is_set():
+                    return
+                yield Frame(data, time.time(), sequence)
+                sequence += 1
+
+
+if __name__ == "__main__":
+    import sys
+    import threading
+
+    never = threading.Event()
+    for source in (SyntheticFrameSource(8, 8, fps=None), SyntheticFrameSource(24, 32, fps=None)):
+        count = 5000
+        started = time.perf_counter()
+        for _, frame in zip(range(count), source.frames(never)):
+            pass
+        elapsed = time.perf_counter() - started
+        print(f"Simulador {source.rows}x{source.cols}: {count / elapsed:.0f} fotogramas/s")
+
+    if len(sys.argv) > 1:
+        replay = ReplayFrameSource(sys.argv[1], speed=None)
+        started = time.perf_counter()
+        count = sum(1 for _ in replay.frames(never))
+        elapsed = time.perf_counter() - started
+        print(replay.error or f"Reproducción de {replay.name}: {count} fotogramas, {count / elapsed:.0f} fotogramas/s")
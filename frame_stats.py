@@ -0,0 +1,169 @@
+import csv
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from app_parameters import STATS_ROIS
+
+FrameStatistics = namedtuple("FrameStatistics", [
+    "min", "max", "mean", "std", "argmax", "center",
+    "roi_names", "roi_min", "roi_max", "roi_mean", "roi_std"
+])
+
+
+class FrameStatsEngine:
+    """
+    Estadísticas globales y por región de interés (ROI) de cada fotograma.
+    Las ROI se definen como rectángulos (fila0, fila1, col0, col1), con límites finales
+    exclusivos, o como máscaras booleanas. Sus índices se precalculan una vez por forma
+    de fotograma y todas las ROI se reducen juntas con ufunc.reduceat, sin bucles por ROI.
+    """
+
+    def __init__(self, rois=STATS_ROIS):
+        self._rois = []
+        self._shape = None
+        self._index = None
+        self._starts = None
+        self._counts = None
+        self._names = ()
+        for roi in rois:
+            self.add_roi(**roi)
+
+    @property
+    def roi_names(self):
+        return [name for name, _, _ in self._rois]
+
+    def add_roi(self, name, rect=None, mask=None):
+        if (rect is None) == (mask is None):
+            raise ValueError(f"La ROI '{name}' debe definirse con un rectángulo o con una máscara.")
+        if name in self.roi_names:
+            raise ValueError(f"Ya existe una ROI llamada '{name}'.")
+        self._rois.append((name, rect, None if mask is None else np.asarray(mask, dtype=bool)))
+        self._shape = None
+
+    def remove_roi(self, name):
+        self._rois = [roi for roi in self._rois if roi[0] != name]
+        self._shape = None
+
+    def clear_rois(self):
+        self._rois = []
+        self._shape = None
+
+    def _build_index(self, shape):
+        indices = []
+        names = []
+        flat_positions = np.arange(shape[0] * shape[1]).reshape(shape)
+        for name, rect, mask in self._rois:
+            if rect is not None:
+                row0, row1, col0, col1 = rect
+                selected = flat_positions[row0:row1, col0:col1].ravel()
+            elif mask.shape == shape:
+                selected = flat_positions[mask]
+            else:
+                print(f"Aviso: la máscara de la ROI '{name}' no coincide con el fotograma {shape}. Se ignora.")
+                continue
+            if selected.size == 0:
+                print(f"Aviso: la ROI '{name}' no contiene píxeles en un fotograma {shape}. Se ignora.")
+                continue
+            indices.append(selected)
+            names.append(name)
+
+        counts = np.array([len(index) for index in indices], dtype=np.intp)
+        self._index = np.concatenate(indices) if indices else np.empty(0, dtype=np.intp)
+        self._counts = counts
+        self._starts = np.concatenate(([0], np.cumsum(counts)[:-1])) if indices else counts
+        self._names = tuple(names)
+        self._shape = shape
+
+    def compute(self, data):
+        if data.shape != self._shape:
+            self._build_index(data.shape)
+
+        flat = data.ravel()
+        peak = int(np.argmax(flat))
+        mean = float(flat.mean(dtype=np.float64))
+        std = float(flat.std(dtype=np.float64))
+
+        if self._names:
+            values = flat[self._index]
+            roi_min = np.minimum.reduceat(values, self._starts)
+            roi_max = np.maximum.reduceat(values, self._starts)
+            roi_sum = np.add.reduceat(values, self._starts, dtype=np.float64)
+            roi_sq_sum = np.add.reduceat(np.square(values, dtype=np.float64), self._starts)
+            roi_mean = roi_sum / self._counts
+            roi_std = np.sqrt(np.maximum(roi_sq_sum / self._counts - roi_mean * roi_mean, 0.0))
+        else:
+            roi_min = roi_max = roi_mean = roi_std = np.empty(0)
+
+        return FrameStatistics(
+            min=float(flat.min()),
+            max=float(flat[peak]),
+            mean=mean,
+            std=std,
+            argmax=divmod(peak, data.shape[1]),
+            center=float(data[data.shape[0] // 2, data.shape[1] // 2]),
+            roi_names=self._names,
+            roi_min=roi_min,
+            roi_max=roi_max,
+            roi_mean=roi_mean,
+            roi_std=roi_std,
+        )
+
+
+def stats_log_path(recording_path):
+    """Ruta del CSV de estadísticas que acompaña a una grabación."""
+    return os.path.splitext(recording_path)[0] + ".stats.csv"
+
+
+class StatsLog:
+    """
+    Registro CSV de las estadísticas de cada fotograma grabado: una fila por fotograma con
+    los valores globales y, por cada ROI, sus columnas <roi>_min/_max/_mean/_std. La cabecera
+    se escribe con la primera fila, cuando ya se conocen las ROI válidas para la forma del sensor.
+    """
+
+    HEADER = ["timestamp", "sequence", "min", "max", "mean", "std", "argmax_row", "argmax_col", "center"]
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "w", newline="")
+        self._writer = csv.writer(self._file)
+        self._roi_names = None
+
+    def write(self, frame, stats):
+        if self._roi_names is None:
+            self._roi_names = stats.roi_names
+            self._writer.writerow(self.HEADER + [f"{name}_{statistic}" for name in self._roi_names
+                                                 for statistic in ("min", "max", "mean", "std")])
+        elif stats.roi_names != self._roi_names:
+            # Cambió la forma del sensor a mitad de grabación: las columnas ya no corresponden
+            return
+        row = [f"{frame.timestamp:.3f}", -1 if frame.sequence is None else frame.sequence,
+               f"{stats.min:.2f}", f"{stats.max:.2f}", f"{stats.mean:.3f}", f"{stats.std:.3f}",
+               stats.argmax[0], stats.argmax[1], f"{stats.center:.2f}"]
+        for position in range(len(self._roi_names)):
+            row += [f"{stats.roi_min[position]:.2f}", f"{stats.roi_max[position]:.2f}",
+                    f"{stats.roi_mean[position]:.3f}", f"{stats.roi_std[position]:.3f}"]
+        self._writer.writerow(row)
+
+    def close(self):
+        self._file.close()
+
+
+if __name__ == "__main__":
+    import timeit
+
+    rng = np.random.default_rng(0)
+    frame = rng.normal(25, 2, (24, 32)).astype(np.float32)
+    engine = FrameStatsEngine([
+        {"name": f"zona_{i}", "rect": (r, r + 6, c, c + 8)}
+        for i, (r, c) in enumerate((r, c) for r in range(0, 24, 6) for c in range(0, 32, 8))
+    ])
+    stats = engine.compute(frame)
+    expected_max = [frame[r:r + 6, c:c + 8].max() for r in range(0, 24, 6) for c in range(0, 32, 8)]
+    print("Máximos por ROI correctos:", np.allclose(stats.roi_max, expected_max))
+
+    number = 10000
+    elapsed = timeit.timeit(lambda: engine.compute(frame), number=number)
+    print(f"24x32 con {len(stats.roi_names)} ROI: {elapsed / number * 1e6:.1f} µs por fotograma")
@@ -0,0 +1,212 @@
+import argparse
+import os
+import signal
+import sys
+import threading
+import time
+
+from app_parameters import (
+    SENSOR_ROWS, SENSOR_COLS, SERIAL_PROTOCOL, ACQUISITION_MODE, SIMULATOR_PORT_NAME,
+    CSV_FILENAME_PREFIX, DEFAULT_SAVE_DIR, HEADLESS_STATUS_INTERVAL_S
+)
+
+OUTPUT_FORMATS = ("csv", "npy", "thz")
+
+
+def open_recorder(path, output_format):
+    if output_format == "npy":
+        from npy_recorder import NpyRecorder
+
+        recorder = NpyRecorder(path)
+    elif output_format == "thz":
+        from thermal_archive import ArchiveRecorder
+
+        recorder = ArchiveRecorder(path)
+    else:
+        from csv_recorder import CsvRecorder
+
+        recorder = CsvRecorder(path)
+    recorder.start()
+    return recorder
+
+
+def part_path(output, output_format, split):
+    """
+    Ruta del archivo de salida. Sin `output` se usa el prefijo de la aplicación con la
+    fecha; al dividir la grabación cada parte lleva la hora a la que empieza.
+    """
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+    if not output:
+        return os.path.join(DEFAULT_SAVE_DIR or ".", f"{CSV_FILENAME_PREFIX}{stamp}.{output_format}")
+    if not split:
+        return output
+    base, extension = os.path.splitext(output)
+    return f"{base}_{stamp}{extension or '.' + output_format}"
+
+
+class HeadlessLogger:
+    """
+    Grabación sin interfaz gráfica: SerialHandler + SerialFrameSource + CsvRecorder /
+    NpyRecorder / ArchiveRecorder en el hilo principal. Solo importa pyserial y NumPy. La memoria no crece
+    con la duración: los fotogramas van del buffer acotado del grabador al disco y, con
+    `split_every`, cada parte es un archivo independiente de tamaño acotado.
+    """
+
+    def __init__(self, port, output=None, output_format="csv", duration=0, rate=0, split_every=0,
+                 rows=None, cols=None, protocol=SERIAL_PROTOCOL, mode=ACQUISITION_MODE,
+                 status_interval=HEADLESS_STATUS_INTERVAL_S):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Formato desconocido: {output_format}. Opciones: {', '.join(OUTPUT_FORMATS)}")
+        self.port = port
+        self.output = output
+        self.output_format = output_format
+        self.duration = duration
+        self.min_interval = 1.0 / rate if rate else 0.0
+        self.split_every = split_every
+        self.rows = rows
+        self.cols = cols
+        self.protocol = protocol
+        self.mode = mode
+        self.status_interval = status_interval
+        self.frames_recorded = 0
+        self.frames_skipped = 0
+        self.frames_dropped = 0
+        self._stop_event = threading.Event()
+        self._recorder = None
+        self._source = None
+
+    def stop(self, signum=None, frame=None):
+        if signum is not None:
+            print(f"Señal {signal.Signals(signum).name} recibida: cerrando la grabación...", flush=True)
+        self._stop_event.set()
+
+    def _open_source(self):
+        if self.port == SIMULATOR_PORT_NAME:
+            from frame_sources import SyntheticFrameSource
+
+            return SyntheticFrameSource(self.rows or SENSOR_ROWS, self.cols or SENSOR_COLS)
+        from serial_handler import SerialHandler
+        from frame_sources import SerialFrameSource
+
+        handler = SerialHandler(self.rows, self.cols)
+        if not handler.connect(self.port, self.protocol):
+            return None
+        return SerialFrameSource(handler, self.mode)
+
+    def _rotate(self):
+        if self._recorder:
+            self._close_recorder()
+        path = part_path(self.output, self.output_format, self.split_every)
+        self._recorder = open_recorder(path, self.output_format)
+        print(f"Grabando en {path}", flush=True)
+
+    def _close_recorder(self):
+        self._recorder.close()
+        self.frames_dropped += self._recorder.frames_dropped
+        if self._recorder.frames_dropped:
+            print(f"Aviso: el grabador descartó {self._recorder.frames_dropped} fotogramas.", flush=True)
+        self._recorder = None
+
+    def _print_status(self):
+        source = self._source
+        recorder_dropped = self.frames_dropped + (self._recorder.frames_dropped if self._recorder else 0)
+        print(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {self.frames_recorded} fotogramas grabados, "
+              f"{self.frames_skipped} omitidos por --rate, {source.dropped_frames} perdidos, "
+              f"{recorder_dropped} descartados por el grabador, {source.timeouts} sin respuesta", flush=True)
+
+    def run(self):
+        """Graba hasta agotar la duración o recibir SIGINT/SIGTERM. Devuelve el código de salida."""
+        self._source = self._open_source()
+        if self._source is None:
+            print(f"No se pudo conectar a {self.port}.", file=sys.stderr)
+            return 1
+        try:
+            self._rotate()
+        except IOError as e:
+            print(f"No se pudo abrir el archivo para escritura: {e}", file=sys.stderr)
+            self._source.close()
+            return 1
+
+        # El temporizador detiene la grabación aunque el sensor deje de enviar fotogramas
+        timer = threading.Timer(self.duration, self._stop_event.set) if self.duration else None
+        if timer:
+            timer.daemon = True
+            timer.start()
+
+        clock = time.monotonic
+        next_record = 0.0
+        next_split = clock() + self.split_every if self.split_every else None
+        next_status = clock() + self.status_interval if self.status_interval else None
+        error = None
+        try:
+            for frame in self._source.frames(self._stop_event):
+                now = clock()
+                if next_status is not None and now >= next_status:
+                    self._print_status()
+                    next_status = now + self.status_interval
+                if now < next_record:
+                    self.frames_skipped += 1
+                    continue
+                if self.min_interval:
+                    # Ritmo fijo sin acumular retraso si llegan menos fotogramas de los pedidos
+                    next_record = max(next_record + self.min_interval, now)
+                if next_split is not None and now >= next_split:
+                    self._rotate()
+                    next_split += self.split_every
+                self._recorder.write(frame)
+                self.frames_recorded += 1
+                if self._recorder.error:
+                    error = self._recorder.error
+                    break
+                if self._stop_event.is_set():
+                    break
+            error = error or self._source.error
+        except IOError as e:
+            error = f"No se pudo abrir el archivo para escritura: {e}"
+        finally:
+            if timer:
+                timer.cancel()
+            self._close_recorder()
+            self._source.close()
+
+        self._print_status()
+        if error:
+            print(error, file=sys.stderr)
+            return 1
+        return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Grabación del sensor sin interfaz gráfica")
+    parser.add_argument("port", help=f"Puerto serial, URL de pyserial o '{SIMULATOR_PORT_NAME}'")
+    parser.add_argument("-o", "--output", help="Archivo de salida (por defecto temperatura_log_<fecha>.<formato>)")
+    parser.add_argument("-f", "--format", choices=OUTPUT_FORMATS, help="Formato (por defecto, el de la extensión o csv)")
+    parser.add_argument("-d", "--duration", type=float, default=0, help="Segundos de grabación (0: hasta SIGTERM)")
+    parser.add_argument("-r", "--rate", type=float, default=0,
+                        help="Fotogramas por segundo grabados como máximo (0: todos)")
+    parser.add_argument("--split-every", type=float, default=0, metavar="SEGUNDOS",
+                        help="Empieza un archivo nuevo cada tantos segundos (p. ej. 86400 para uno diario)")
+    parser.add_argument("--rows", type=int, default=None,
+                        help="Filas del sensor (por defecto se detectan con el primer fotograma)")
+    parser.add_argument("--cols", type=int, default=None,
+                        help="Columnas del sensor (por defecto se detectan con el primer fotograma)")
+    parser.add_argument("--protocol", choices=("auto", "ascii", "binary"), default=SERIAL_PROTOCOL)
+    parser.add_argument("--mode", choices=("auto", "stream", "request"), default=ACQUISITION_MODE)
+    parser.add_argument("--status-interval", type=float, default=HEADLESS_STATUS_INTERVAL_S,
+                        help="Segundos entre líneas de estado (0: solo al terminar)")
+    args = parser.parse_args(argv)
+
+    output_format = args.format
+    if output_format is None:
+        extension = os.path.splitext(args.output or "")[1].lower().lstrip(".")
+        output_format = extension if extension in OUTPUT_FORMATS else "csv"
+
+    logger = HeadlessLogger(args.port, args.output, output_format, args.duration, args.rate, args.split_every,
+                            args.rows, args.cols, args.protocol, args.mode, args.status_interval)
+    signal.signal(signal.SIGTERM, logger.stop)
+    signal.signal(signal.SIGINT, logger.stop)
+    return logger.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
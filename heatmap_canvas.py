@@ -0,0 +1,71 @@
+from PyQt5.QtCore import QRectF, Qt
+from PyQt5.QtGui import QFont, QImage, QPainter
+
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+
+from telemetry import telemetry
+
+
+class HeatmapCanvas(FigureCanvas):
+    """
+    Lienzo de matplotlib que pinta el mapa de calor como QImage sobre el área de los ejes,
+    sin pasar por el renderizado de imágenes de Agg. Los valores de la colorbar también se
+    pintan con QPainter sobre las etiquetas transparentes de `colorbar_axes`: al cambiar la
+    escala de color no hay que volver a dibujar nada con Agg.
+    """
+
+    def __init__(self, figure):
+        super().__init__(figure)
+        self.heatmap_axes = None
+        self.heatmap_image = None
+        self.colorbar_axes = None
+        self._heatmap_rgba = None
+        self._colorbar_labels = []
+        self._label_boxes = []
+        self._label_pixel_size = None
+        self.mpl_connect('draw_event', self._on_draw)
+
+    def set_heatmap_rgba(self, rgba):
+        if rgba is not self._heatmap_rgba:
+            rows, cols = rgba.shape[:2]
+            # QImage no copia el buffer: se conserva la referencia al array
+            self._heatmap_rgba = rgba
+            self.heatmap_image = QImage(rgba.data, cols, rows, cols * 4, QImage.Format_RGBA8888)
+        self.update()
+
+    def set_colorbar_labels(self, labels):
+        self._colorbar_labels = labels
+        self.update()
+
+    def _on_draw(self, event):
+        # Posición de las etiquetas de la colorbar tras cada dibujado completo (cambia con
+        # el tamaño de la ventana); calcularla en cada paintEvent costaría milisegundos
+        self._label_boxes = []
+        if self.colorbar_axes is None:
+            return
+        labels = [label for label in self.colorbar_axes.yaxis.get_ticklabels() if label.get_text()]
+        self._label_boxes = [label.get_window_extent(event.renderer).bounds for label in labels]
+        if labels:
+            self._label_pixel_size = labels[0].get_fontsize() * self.figure.dpi / 72
+
+    def paintEvent(self, event):
+        started = telemetry.start()
+        super().paintEvent(event)
+        if self.heatmap_image is None or self.heatmap_axes is None:
+            return
+        x0, y0, width, height = self.heatmap_axes.get_window_extent().bounds
+        top = self.figure.bbox.height - y0 - height
+        ratio = self.device_pixel_ratio
+        painter = QPainter(self)
+        painter.drawImage(QRectF(x0 / ratio, top / ratio, width / ratio, height / ratio), self.heatmap_image)
+        if self._label_boxes and self._colorbar_labels:
+            font = QFont(painter.font())
+            font.setPixelSize(max(1, round(self._label_pixel_size / ratio)))
+            painter.setFont(font)
+            for (x, y, box_width, box_height), text in zip(self._label_boxes, self._colorbar_labels):
+                box_top = self.figure.bbox.height - y - box_height
+                # Más ancho que la etiqueta reservada por si el valor tiene más cifras
+                painter.drawText(QRectF(x / ratio, box_top / ratio, 2 * box_width / ratio, box_height / ratio),
+                                 Qt.AlignLeft | Qt.AlignVCenter, text)
+        painter.end()
+        telemetry.stop("paint", started)
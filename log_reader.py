@@ -0,0 +1,177 @@
+import itertools
+from collections import namedtuple
+
+import numpy as np
+
+from app_parameters import SENSOR_SHAPES, LOG_READER_CHUNK_FRAMES
+
+SERIES_COLUMNS = ["Tiempo", "Temperatura"]
+METADATA_COLUMNS = ["timestamp", "sequence"]
+
+LogInfo = namedtuple("LogInfo", ["kind", "columns", "has_metadata", "shape"])
+FrameChunk = namedtuple("FrameChunk", ["start", "data", "timestamps", "sequences"])
+
+
+def shape_from_pixel_count(pixel_count):
+    if pixel_count in SENSOR_SHAPES:
+        return SENSOR_SHAPES[pixel_count]
+    side = int(round(pixel_count ** 0.5))
+    if side * side == pixel_count:
+        return side, side
+    raise ValueError(f"No se puede deducir la forma del sensor a partir de {pixel_count} píxeles.")
+
+
+def _open(path):
+    # latin-1 acepta cualquier byte: los registros antiguos pueden venir de Excel con acentos
+    return open(path, newline="", encoding="latin-1")
+
+
+def read_log_info(path):
+    """
+    Identifica el formato del registro a partir de su cabecera:
+      "pixels": temperatura_log_* con columnas pixel_N (y opcionalmente timestamp, sequence)
+      "series": Tiempo,Temperatura
+    """
+    with _open(path) as f:
+        columns = f.readline().strip().split(",")
+
+    # Las cabeceras de serie pueden llevar unidades: "Tiempo (s),Temperatura (°C),Estado Servo"
+    if len(columns) >= 2 and all(column.startswith(name) for column, name in zip(columns, SERIES_COLUMNS)):
+        return LogInfo("series", columns, False, None)
+
+    has_metadata = columns[:len(METADATA_COLUMNS)] == METADATA_COLUMNS
+    pixel_columns = columns[len(METADATA_COLUMNS):] if has_metadata else columns
+    if not pixel_columns or not all(name.startswith("pixel_") for name in pixel_columns):
+        raise ValueError(f"Formato de registro desconocido en '{path}'.")
+    return LogInfo("pixels", columns, has_metadata, shape_from_pixel_count(len(pixel_columns)))
+
+
+def iter_frames(path, chunk_frames=LOG_READER_CHUNK_FRAMES, start=0, stop=None, roi=None, pixels=None):
+    """
+    Recorre un registro de píxeles en bloques de `chunk_frames` fotogramas, con memoria
+    constante sea cual sea el tamaño del archivo. Cada bloque es un FrameChunk con
+    `data` float32 de forma (n, filas, columnas).
+      start, stop: rango de fotogramas (las líneas anteriores se saltan sin convertirlas)
+      roi:         rectángulo (fila0, fila1, col0, col1) con límites finales exclusivos
+      pixels:      índices planos de píxeles; `data` pasa a ser (n, len(pixels))
+    Solo se convierten las columnas pedidas (usecols).
+    """
+    info = read_log_info(path)
+    if info.kind != "pixels":
+        raise ValueError(f"'{path}' no es un registro de píxeles.")
+    if roi is not None and pixels is not None:
+        raise ValueError("Usa roi o pixels, no ambos.")
+
+    rows, cols = info.shape
+    positions = np.arange(rows * cols).reshape(rows, cols)
+    if roi is not None:
+        row0, row1, col0, col1 = roi
+        selected = positions[row0:row1, col0:col1]
+        frame_shape = selected.shape
+        selected = selected.ravel()
+    elif pixels is not None:
+        selected = np.asarray(pixels, dtype=np.intp)
+        frame_shape = selected.shape
+    else:
+        selected = positions.ravel()
+        frame_shape = info.shape
+    if selected.size == 0:
+        raise ValueError("La selección de píxeles está vacía.")
+
+    offset = len(METADATA_COLUMNS) if info.has_metadata else 0
+    usecols = [offset + int(i) for i in selected]
+    if info.has_metadata:
+        usecols = [0, 1] + usecols
+        dtype = np.dtype([("timestamp", "f8"), ("sequence", "i8"), ("pixels", "f4", (selected.size,))])
+    else:
+        dtype = np.dtype([("pixels", "f4", (selected.size,))])
+
+    with _open(path) as f:
+        f.readline()
+        lines_iter = itertools.islice(f, start, stop)
+        position = start
+        while True:
+            lines = list(itertools.islice(lines_iter, chunk_frames))
+            if not lines:
+                return
+            table = np.loadtxt(lines, delimiter=",", dtype=dtype, usecols=usecols, ndmin=1)
+            count = len(table)
+            if info.has_metadata:
+                timestamps, sequences = table["timestamp"], table["sequence"]
+            else:
+                # Registros sin metadatos: el índice del fotograma hace de tiempo y secuencia
+                sequences = np.arange(position, position + count, dtype=np.int64)
+                timestamps = sequences.astype(np.float64)
+            data = table["pixels"].reshape((count,) + frame_shape)
+            yield FrameChunk(position, data, timestamps, sequences)
+            position += count
+
+
+def read_frames(path, start=0, stop=None, roi=None, pixels=None):
+    """
+    Carga un rango de fotogramas completo: (data, timestamps, sequences).
+    """
+    chunks = list(iter_frames(path, start=start, stop=stop, roi=roi, pixels=pixels))
+    if not chunks:
+        info = read_log_info(path)
+        return np.empty((0,) + info.shape, dtype=np.float32), np.empty(0), np.empty(0, dtype=np.int64)
+    return (np.concatenate([chunk.data for chunk in chunks]),
+            np.concatenate([chunk.timestamps for chunk in chunks]),
+            np.concatenate([chunk.sequences for chunk in chunks]))
+
+
+def iter_series(path, chunk_rows=LOG_READER_CHUNK_FRAMES * 64):
+    """
+    Recorre un registro Tiempo,Temperatura en bloques (tiempo, temperatura) float32.
+    """
+    info = read_log_info(path)
+    if info.kind != "series":
+        raise ValueError(f"'{path}' no contiene las columnas 'Tiempo' y 'Temperatura'.")
+    with _open(path) as f:
+        f.readline()
+        while True:
+            lines = list(itertools.islice(f, chunk_rows))
+            if not lines:
+                return
+            table = np.loadtxt(lines, delimiter=",", dtype=np.float32, usecols=(0, 1), ndmin=2)
+            yield table[:, 0], table[:, 1]
+
+
+def read_series(path):
+    chunks = list(iter_series(path))
+    if not chunks:
+        return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.float32)
+    return np.concatenate([c[0] for c in chunks]), np.concatenate([c[1] for c in chunks])
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+    import time
+    import tracemalloc
+
+    from csv_recorder import csv_header
+
+    rng = np.random.default_rng(0)
+    path = os.path.join(tempfile.gettempdir(), "log_reader_demo.csv")
+    reference = np.round(rng.uniform(20, 35, (3000, 24, 32)), 2).astype(np.float32)
+    row_format = ",".join(["%.3f", "%d"] + ["%.2f"] * 768) + "\n"
+    with open(path, "w") as f:
+        f.write(",".join(csv_header(768)) + "\n")
+        f.writelines(row_format % (i * 0.05, i, *frame.ravel().tolist()) for i, frame in enumerate(reference))
+
+    info = read_log_info(path)
+    print(f"Formato: {info.kind}, forma {info.shape}, metadatos: {info.has_metadata}")
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    frames = sum(len(chunk.data) for chunk in iter_frames(path))
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{frames} fotogramas en {elapsed:.2f} s ({frames / elapsed:.0f} fps), pico de memoria {peak / 1e6:.1f} MB")
+
+    data, _, sequences = read_frames(path, start=100, stop=200, roi=(4, 8, 10, 20))
+    print("Rango y ROI correctos:", np.array_equal(data, reference[100:200, 4:8, 10:20]),
+          np.array_equal(sequences, np.arange(100, 200)))
+    os.remove(path)
@@ -1,30 +1,80 @@
-import sys
-import csv
 import time
-import numpy as np
+
+# Referencia del informe de arranque (--startup-report): antes de importar Qt y NumPy
+STARTED_AT = time.perf_counter()
+
+import argparse
+import json
+import os
+import sys
+import threading
+from collections import deque
 from PyQt5.QtWidgets import QApplication, QFileDialog, QMessageBox
 from PyQt5.QtCore import QTimer, QDateTime
 
 from app_parameters import (
     BAUD_RATE, SENSOR_ROWS, SENSOR_COLS,
-    GUI_UPDATE_INTERVAL_MS, CSV_FILENAME_PREFIX, CSV_HEADER, DEFAULT_SAVE_DIR,
-    START_DATA_MARKER, END_DATA_MARKER
+    GUI_UPDATE_INTERVAL_MS, CSV_FILENAME_PREFIX, DEFAULT_SAVE_DIR,
+    START_DATA_MARKER, END_DATA_MARKER, SIMULATOR_PORT_NAME, REPLAY_SPEED,
+    TELEMETRY_REPORT_INTERVAL_MS, TELEMETRY_LOG_PATH, FRAME_CALIBRATION_PATH,
+    ALARM_LOG_PATH, ALARM_RULES, FRAME_FILTER_MODE, RECORD_FRAME_STATS
 )
 from serial_handler import SerialHandler
+from acquisition_worker import AcquisitionWorker, LatestFrameQueue
+from frame_stats import FrameStatsEngine, StatsLog, stats_log_path
 from app_gui import AppGUI
+from telemetry import telemetry, format_status, TelemetryLog
 
 class MainApp:
-    def __init__(self):
-        self.app = QApplication(sys.argv)
+    def __init__(self, replay_path=None, replay_speed=REPLAY_SPEED, argv=None,
+                 telemetry_enabled=None, telemetry_log_path=TELEMETRY_LOG_PATH, alarm_log_path=ALARM_LOG_PATH,
+                 port=None, startup_report=False):
+        # Instantes del arranque en segundos desde STARTED_AT; con startup_report se imprimen
+        # en JSON al dibujar el primer fotograma y la aplicación termina
+        self.startup_report = startup_report
+        self.startup_times = {"imports": time.perf_counter() - STARTED_AT}
+        self.autoconnect_port = port
+        self.app = QApplication(sys.argv if argv is None else argv)
         self.gui = AppGUI()
-        self.serial_handler = SerialHandler()
+        # La forma del sensor (AMG8833 o MLX90640) se detecta con el primer fotograma
+        self.serial_handler = SerialHandler(rows=None, cols=None)
+        self.frame_queue = LatestFrameQueue()
+        self.acquisition_worker = None
+        self.frame_source = None
+        self.replay_path = replay_path
+        self.replay_speed = replay_speed
+        self.frame_stats = FrameStatsEngine()
+        # Los subsistemas opcionales (filtro, alarmas, orígenes y grabadores) se importan al
+        # usarse por primera vez: sin configurarlos no retrasan el arranque
+        self.frame_filter = None
+        if FRAME_FILTER_MODE != "none" or FRAME_CALIBRATION_PATH or ALARM_RULES:
+            self._create_frame_filter(FRAME_FILTER_MODE)
+        self.alarm_engine = None
+        self.alarm_log = None
+        # Los eventos llegan desde el hilo de adquisición; la interfaz los recoge en _update_data
+        self.alarm_events = deque()
+        if ALARM_RULES:
+            from alarm_engine import AlarmEngine, AlarmLog
+
+            self.alarm_engine = AlarmEngine(ALARM_RULES, noise_source=self.frame_filter.noise_std)
+            self.alarm_engine.add_listener(self.alarm_events.append)
+            self.alarm_log = AlarmLog(alarm_log_path) if alarm_log_path else None
+            if self.alarm_log:
+                self.alarm_engine.add_listener(self.alarm_log.write)
 
         self.is_connected = False
+        # La conexión (reinicio del ESP32 y sondeo) ocurre en otro hilo; el resultado se
+        # recoge en _update_data para que la ventana siga respondiendo mientras tanto
+        self.is_connecting = False
+        self.connection_results = deque()
         self.is_recording = False
         self.record_start_time = 0
         self.record_duration = 0
-        self.csv_file = None
-        self.csv_writer = None
+        self.recorder = None
+        self.stats_log = None
+        if telemetry_enabled is not None:
+            telemetry.enabled = telemetry_enabled
+        self.telemetry_log = TelemetryLog(telemetry_log_path) if telemetry.enabled and telemetry_log_path else None
 
         self._connect_signals()
         self._setup_timer()
@@ -39,6 +89,22 @@ class MainApp:
         self.gui.start_record_signal.connect(self._start_recording)
         self.gui.stop_record_signal.connect(self._stop_recording)
         self.gui.select_file_signal.connect(self._open_file_dialog)
+        self.gui.filter_mode_signal.connect(self._set_filter_mode)
+
+    def _create_frame_filter(self, mode):
+        from frame_filter import FrameFilter, load_calibration
+
+        self.frame_filter = FrameFilter(
+            mode, calibration=load_calibration(FRAME_CALIBRATION_PATH) if FRAME_CALIBRATION_PATH else None)
+
+    def _set_filter_mode(self, mode):
+        if self.frame_filter is not None:
+            self.frame_filter.set_mode(mode)
+        elif mode != "none":
+            self._create_frame_filter(mode)
+            # El hilo de adquisición consulta frame_filter con cada fotograma
+            if self.acquisition_worker:
+                self.acquisition_worker.frame_filter = self.frame_filter
 
     def _setup_timer(self):
         self.timer = QTimer()
@@ -46,53 +112,185 @@ class MainApp:
         self.timer.timeout.connect(self._update_data)
         self.timer.start()
 
+        if telemetry.enabled:
+            self.gui.show_telemetry(True)
+            self.telemetry_timer = QTimer()
+            self.telemetry_timer.setInterval(TELEMETRY_REPORT_INTERVAL_MS)
+            self.telemetry_timer.timeout.connect(self._report_telemetry)
+            self.telemetry_timer.start()
+
+    def _report_telemetry(self):
+        worker = self.acquisition_worker
+        telemetry.gauge("queue_depth", len(self.frame_queue))
+        telemetry.gauge("queue_dropped", self.frame_queue.dropped_frames)
+        telemetry.gauge("dropped_frames", worker.dropped_frames if worker else 0)
+        snapshot = telemetry.snapshot()
+        self.gui.update_telemetry(format_status(snapshot))
+        if self.telemetry_log:
+            self.telemetry_log.write(snapshot)
+
     def _list_ports(self):
         ports = self.serial_handler.list_available_ports()
+        # Orígenes sin hardware al final de la lista
+        ports.append(SIMULATOR_PORT_NAME)
+        if self.replay_path:
+            ports.insert(0, self._replay_port_name())
         self.gui.update_port_list(ports)
 
-    def _connect_serial(self, port):
+    def _replay_port_name(self):
+        return f"Reproducir: {os.path.basename(self.replay_path)}"
+
+    def _create_frame_source(self, port):
+        # Se ejecuta en el hilo de conexión: la importación no bloquea la ventana
+        from frame_sources import SerialFrameSource, ReplayFrameSource, SyntheticFrameSource
+
+        if port == SIMULATOR_PORT_NAME:
+            return SyntheticFrameSource()
+        if self.replay_path and port == self._replay_port_name():
+            return ReplayFrameSource(self.replay_path, self.replay_speed)
         if self.serial_handler.connect(port):
+            return SerialFrameSource(self.serial_handler)
+        return None
+
+    def _connect_serial(self, port, notify=True):
+        if self.is_connecting or self.is_connected:
+            return
+        self.is_connecting = True
+        self.gui.connect_button.setEnabled(False)
+        threading.Thread(target=self._open_frame_source, args=(port, notify),
+                         name="SerialConnect", daemon=True).start()
+
+    def _open_frame_source(self, port, notify):
+        self.connection_results.append((port, self._create_frame_source(port), notify))
+
+    def _finish_connection(self, port, frame_source, notify):
+        self.is_connecting = False
+        self.frame_source = frame_source
+        if self.frame_source:
             self.is_connected = True
+            self._mark_startup("connected")
+            self._start_acquisition()
             self.gui.set_connection_buttons_state(True)
-            self.gui.show_message("Conexión Exitosa", f"Conectado a {port} correctamente.")
+            if notify:
+                self.gui.show_message("Conexión Exitosa", f"Conectado a {port} correctamente.")
         else:
             self.is_connected = False
             self.gui.set_connection_buttons_state(False)
+            if self.startup_report:
+                print(f"No se pudo conectar a {port}.", file=sys.stderr)
+                self.app.exit(1)
+                return
             self.gui.show_error("Error de Conexión", f"No se pudo conectar a {port}.")
 
-    def _disconnect_serial(self):
+    def _disconnect_serial(self, notify=True):
         if self.is_connected:
-            self.serial_handler.disconnect()
+            self._stop_acquisition()
+            self.frame_source.close()
+            self.frame_source = None
             self.is_connected = False
             self.gui.set_connection_buttons_state(False)
-            self.gui.show_message("Desconexión Exitosa", "Puerto serial desconectado.")
+            if notify:
+                self.gui.show_message("Desconexión Exitosa", "Puerto serial desconectado.")
             if self.is_recording:
                 self._stop_recording()
 
+    def _start_acquisition(self):
+        self.frame_queue.clear()
+        if self.frame_filter:
+            self.frame_filter.reset()
+        if self.alarm_engine:
+            self.alarm_engine.reset()
+        self.alarm_events.clear()
+        self.gui.update_alarms([], [])
+        self.acquisition_worker = AcquisitionWorker(self.frame_source, self.frame_queue, self.frame_filter,
+                                                    self.alarm_engine)
+        self.acquisition_worker.start()
+
+    def _stop_acquisition(self):
+        if self.acquisition_worker:
+            self.acquisition_worker.stop()
+            # Útil en pruebas de carga: indica si la interfaz no da abasto con el origen
+            print(f"Adquisición detenida: {self.acquisition_worker.frames_received} fotogramas recibidos, "
+                  f"{self.frame_queue.dropped_frames} descartados por la cola de la interfaz.")
+            self.acquisition_worker = None
+
     def _update_data(self):
-        if self.is_connected:
-            if isinstance(self.serial_handler, SerialHandler) and \
-               self.serial_handler.ser and self.serial_handler.ser.is_open:
-                try:
-                    self.serial_handler.ser.write(b'T\n')
-                except Exception as e:
-                    print(f"Error al enviar comando 'T': {e}")
-                    self._disconnect_serial()
+        if self.connection_results:
+            self._finish_connection(*self.connection_results.popleft())
+        if not self.is_connected:
+            return
+
+        if self.alarm_events:
+            from alarm_engine import format_event
+
+            events = []
+            while self.alarm_events:
+                events.append(self.alarm_events.popleft())
+            telemetry.count("alarm_events", len(events))
+            self.gui.update_alarms(self.alarm_engine.active_rules, [format_event(event) for event in events])
+
+        worker = self.acquisition_worker
+        # Se esperan a procesar los últimos fotogramas encolados antes de cerrar el origen
+        if worker and not worker.is_alive() and not len(self.frame_queue):
+            error = worker.error
+            from frame_sources import ReplayFrameSource
+
+            replay_finished = error is None and isinstance(self.frame_source, ReplayFrameSource)
+            self._disconnect_serial(notify=False)
+            if replay_finished:
+                self.gui.show_message("Reproducción Finalizada", "Se reprodujo el registro completo.")
+            else:
+                self.gui.show_error("Error de Conexión", error or "La adquisición de datos se detuvo.")
+            return
+
+        # Se graban todos los fotogramas pendientes, pero solo se dibuja el más reciente
+        telemetry.gauge("queue_depth", len(self.frame_queue))
+        frames = self.frame_queue.drain()
+        if not frames:
+            return
+        telemetry.count("frames_received", len(frames))
 
-            data = self.serial_handler.read_data()
+        if self.is_recording:
+            if self.recorder.error:
+                error = self.recorder.error
+                self._stop_recording()
+                self.gui.show_error("Error de Archivo", error)
+            else:
+                started = telemetry.start()
+                for frame in frames:
+                    self._write_to_csv(frame)
+                telemetry.stop("record", started)
 
-            if data is not None:
-                self.gui.update_heatmap(data)
+        # Con el registro de estadísticas activo se calculan para cada fotograma grabado;
+        # las del último se reutilizan para la interfaz
+        stats = None
+        if self.stats_log:
+            started = telemetry.start()
+            for frame in frames:
+                stats = self.frame_stats.compute(frame.data)
+                self.stats_log.write(frame, stats)
+            telemetry.stop("stats", started)
 
-                min_val = np.min(data)
-                max_val = np.max(data)
-                center_val = data[data.shape[0] // 2, data.shape[1] // 2]
-                self.gui.update_stats(min_val, max_val, center_val)
+        data = frames[-1].data
+        started = telemetry.start()
+        self.gui.update_heatmap(data)
+        telemetry.stop("render", started)
+        telemetry.count("frames_rendered")
+        if "first_frame" not in self.startup_times:
+            self._mark_startup("first_frame")
+            if self.startup_report:
+                print(json.dumps({name: round(value, 4) for name, value in self.startup_times.items()}), flush=True)
+                self.app.quit()
 
-                if self.is_recording:
-                    self._write_to_csv(data)
-                    if (time.time() - self.record_start_time) >= self.record_duration:
-                        self._stop_recording()
+        if stats is None:
+            started = telemetry.start()
+            stats = self.frame_stats.compute(data)
+            telemetry.stop("stats", started)
+        self.gui.update_stats(stats.min, stats.max, stats.center)
+        self.gui.update_roi_stats(stats)
+
+        if self.is_recording and (time.time() - self.record_start_time) >= self.record_duration:
+            self._stop_recording()
 
     def _open_file_dialog(self):
         options = QFileDialog.Options()
@@ -103,7 +301,8 @@ class MainApp:
             self.gui,
             "Guardar datos de temperatura como...",
             DEFAULT_SAVE_DIR if DEFAULT_SAVE_DIR else suggested_filename,
-            "Archivos CSV (*.csv);;Todos los archivos (*.*)",
+            "Archivos CSV (*.csv);;Grabación binaria NumPy (*.npy);;Archivo comprimido sin pérdidas (*.thz);;"
+            "Todos los archivos (*.*)",
             options=options
         )
         if file_path:
@@ -117,9 +316,22 @@ class MainApp:
             return
 
         try:
-            self.csv_file = open(file_path, 'w', newline='')
-            self.csv_writer = csv.writer(self.csv_file)
-            self.csv_writer.writerow(CSV_HEADER)
+            # Las capturas largas se graban en binario (.npy) o comprimidas (.thz) según la extensión
+            if file_path.lower().endswith(".npy"):
+                from npy_recorder import NpyRecorder
+
+                self.recorder = NpyRecorder(file_path)
+            elif file_path.lower().endswith(".thz"):
+                from thermal_archive import ArchiveRecorder
+
+                self.recorder = ArchiveRecorder(file_path)
+            else:
+                from csv_recorder import CsvRecorder
+
+                self.recorder = CsvRecorder(file_path)
+            if RECORD_FRAME_STATS:
+                self.stats_log = StatsLog(stats_log_path(file_path))
+            self.recorder.start()
             self.is_recording = True
             self.record_start_time = time.time()
             self.record_duration = duration
@@ -127,35 +339,79 @@ class MainApp:
             self.gui.show_message("Registro Iniciado", f"Grabando datos en: {file_path} por {duration} segundos.")
         except IOError as e:
             self.gui.show_error("Error de Archivo", f"No se pudo abrir el archivo para escritura: {e}")
+            if self.stats_log:
+                self.stats_log.close()
+                self.stats_log = None
+            self.recorder = None
             self.is_recording = False
             self.gui.set_record_buttons_state(False)
 
-    def _write_to_csv(self, data):
-        if self.csv_writer and self.csv_file:
-            flat_data = data.flatten().tolist()
-            self.csv_writer.writerow(flat_data)
+    def _write_to_csv(self, frame):
+        # Solo copia el fotograma al buffer del grabador: la escritura ocurre en su hilo
+        if self.recorder:
+            self.recorder.write(frame)
 
     def _stop_recording(self):
         if self.is_recording:
             self.is_recording = False
-            if self.csv_file:
-                self.csv_file.close()
-                self.csv_file = None
-                self.csv_writer = None
+            dropped = 0
+            if self.recorder:
+                self.recorder.close()
+                dropped = self.recorder.frames_dropped
+                self.recorder = None
+            if self.stats_log:
+                self.stats_log.close()
+                self.stats_log = None
             self.gui.set_record_buttons_state(False)
-            self.gui.show_message("Registro Detenido", "Registro de datos finalizado.")
+            if dropped:
+                self.gui.show_message("Registro Detenido",
+                                      f"Registro de datos finalizado. El grabador descartó {dropped} fotogramas.")
+            else:
+                self.gui.show_message("Registro Detenido", "Registro de datos finalizado.")
 
     def _on_app_quit(self):
         print("Cerrando aplicación...")
+        if self.telemetry_log:
+            self.telemetry_log.close()
+            self.telemetry_log = None
         if self.is_connected:
-            self._disconnect_serial()
+            self._disconnect_serial(notify=not self.startup_report)
         elif self.is_recording:
             self._stop_recording()
+        if self.alarm_log:
+            self.alarm_log.close()
+            self.alarm_log = None
+
+    def _mark_startup(self, name):
+        self.startup_times.setdefault(name, time.perf_counter() - STARTED_AT)
 
     def run(self):
+        if self.autoconnect_port:
+            # El reinicio del ESP32 transcurre mientras se muestra la ventana y se crea la figura
+            self._connect_serial(self.autoconnect_port, notify=False)
         self.gui.show()
+        self._mark_startup("window_shown")
         sys.exit(self.app.exec_())
 
 if __name__ == "__main__":
-    main_app = MainApp()
+    parser = argparse.ArgumentParser(description="Visualizador de mapa de calor MLX90640 / AMG8833")
+    parser.add_argument("--replay", metavar="REGISTRO",
+                        help="Registro CSV, grabación .npy o archivo .thz a reproducir como si fuera el sensor")
+    parser.add_argument("--speed", type=float, default=REPLAY_SPEED,
+                        help="Velocidad de reproducción (2 = doble; 0 = tan rápido como sea posible)")
+    parser.add_argument("--telemetry", action="store_true",
+                        help="Muestra tiempos por etapa, fps y pérdidas en la barra de estado")
+    parser.add_argument("--telemetry-log", metavar="ARCHIVO", default=TELEMETRY_LOG_PATH,
+                        help="Con --telemetry, guarda una instantánea JSON por línea en este archivo")
+    parser.add_argument("--alarm-log", metavar="ARCHIVO", default=ALARM_LOG_PATH,
+                        help="Guarda los eventos de alarma (reglas de ALARM_RULES) en este CSV")
+    parser.add_argument("--port", help="Conecta al arrancar a este puerto, URL de pyserial o "
+                                       f"'{SIMULATOR_PORT_NAME}'")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="Con --port, imprime los tiempos de arranque en JSON al dibujar el primer "
+                             "fotograma y termina")
+    args, qt_args = parser.parse_known_args()
+    main_app = MainApp(args.replay, args.speed, argv=[sys.argv[0]] + qt_args,
+                       telemetry_enabled=args.telemetry or None, telemetry_log_path=args.telemetry_log,
+                       alarm_log_path=args.alarm_log, port=args.port, startup_report=args.startup_report)
     main_app.run()
@@ -0,0 +1,310 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app_parameters import DECIMATION_BASE_BUCKET, DECIMATION_CACHE
+from log_reader import read_log_info, read_series, iter_frames
+
+DECIMATION_METHODS = ("minmax", "lttb")
+SUMMARY_VERSION = 1
+
+
+def _bucket_extrema(y, size):
+    """Índices del mínimo y del máximo de cada bloque de `size` muestras consecutivas."""
+    n = len(y)
+    buckets = -(-n // size)
+    pad = buckets * size - n
+    # El relleno repite el último valor: argmin/argmax devuelven la primera aparición, la real
+    blocks = (np.concatenate((y, np.repeat(y[-1:], pad))) if pad else y).reshape(buckets, size)
+    starts = np.arange(buckets) * size
+    return (np.minimum(blocks.argmin(axis=1) + starts, n - 1),
+            np.minimum(blocks.argmax(axis=1) + starts, n - 1))
+
+
+def _interleave(xmin, ymin, xmax, ymax):
+    """Mínimo y máximo de cada bloque en orden temporal, como una sola polilínea."""
+    min_first = xmin <= xmax
+    x = np.empty(2 * len(xmin), dtype=np.float64)
+    y = np.empty(2 * len(ymin), dtype=np.float64)
+    x[0::2] = np.where(min_first, xmin, xmax)
+    x[1::2] = np.where(min_first, xmax, xmin)
+    y[0::2] = np.where(min_first, ymin, ymax)
+    y[1::2] = np.where(min_first, ymax, ymin)
+    return x, y
+
+
+def minmax_decimate(x, y, buckets):
+    """
+    Reduce la serie a `buckets` bloques de igual número de muestras y conserva el mínimo
+    y el máximo de cada uno: los picos se ven igual que con todos los puntos.
+    """
+    if len(y) <= 2 * buckets:
+        return x, y
+    imin, imax = _bucket_extrema(y, -(-len(y) // buckets))
+    return _interleave(x[imin], y[imin], x[imax], y[imax])
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets: elige en cada bloque el punto que forma el triángulo
+    de mayor área con el punto elegido en el bloque anterior y la media del siguiente.
+    La elección depende del bloque anterior, así que se recorre bloque a bloque; dentro
+    de cada bloque las áreas se calculan vectorizadas.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return x, y
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)
+    # Media de cada bloque (el "tercer vértice" del triángulo), calculada de una vez
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    mean_x = np.append(sums_x / counts, x[-1])
+    mean_y = np.append(sums_y / counts, y[-1])
+
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        ax, ay = x[previous], y[previous]
+        cx, cy = mean_x[bucket + 1], mean_y[bucket + 1]
+        areas = np.abs((ax - cx) * (y[start:stop] - ay) - (ax - x[start:stop]) * (cy - ay))
+        previous = start + int(areas.argmax())
+        selected[bucket + 1] = previous
+    return x[selected], y[selected]
+
+
+class SeriesSummary:
+    """
+    Resumen multirresolución de una serie: mínimo y máximo (con su instante) de bloques de
+    `base_bucket` muestras, y niveles sucesivos que unen los bloques de dos en dos. Una
+    ventana visible se dibuja con el nivel cuyo número de bloques en la ventana se acerca
+    más al ancho en píxeles, sin recorrer las muestras originales. Se guardan también las
+    muestras originales para las ventanas cortas.
+    """
+
+    def __init__(self, x, y, base_bucket=DECIMATION_BASE_BUCKET, levels=None):
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.base_bucket = base_bucket
+        self.levels = levels if levels is not None else self._build_levels()
+
+    def _build_levels(self):
+        if len(self.y) < 2 * self.base_bucket:
+            return []
+        imin, imax = _bucket_extrema(self.y, self.base_bucket)
+        level = (self.x[imin], self.y[imin], self.x[imax], self.y[imax])
+        levels = [level]
+        while len(level[0]) > 2:
+            xmin, ymin, xmax, ymax = (np.append(a, a[-1]) if len(a) % 2 else a for a in level)
+            ymin, ymax = ymin.reshape(-1, 2), ymax.reshape(-1, 2)
+            pick_min = ymin.argmin(axis=1)
+            pick_max = ymax.argmax(axis=1)
+            rows = np.arange(len(pick_min))
+            level = (xmin.reshape(-1, 2)[rows, pick_min], ymin[rows, pick_min],
+                     xmax.reshape(-1, 2)[rows, pick_max], ymax[rows, pick_max])
+            levels.append(level)
+        return levels
+
+    def __len__(self):
+        return len(self.y)
+
+    @property
+    def y_range(self):
+        if self.levels:
+            top = self.levels[-1]
+            return float(top[1].min()), float(top[3].max())
+        return float(self.y.min()), float(self.y.max())
+
+    def window(self, x0, x1, width, method="minmax"):
+        """Puntos a dibujar entre x0 y x1 para un eje de `width` píxeles."""
+        start = max(int(np.searchsorted(self.x, x0, side="left")) - 1, 0)
+        stop = min(int(np.searchsorted(self.x, x1, side="right")) + 1, len(self.x))
+        count = stop - start
+        if count <= 2 * width:
+            return self.x[start:stop], self.y[start:stop]
+        if method == "lttb" and count <= 64 * width:
+            return lttb(self.x[start:stop], self.y[start:stop], 2 * width)
+        if count < width * self.base_bucket or not self.levels:
+            # Ventana demasiado corta para el nivel más fino: se diezman las muestras originales
+            return minmax_decimate(self.x[start:stop], self.y[start:stop], width)
+
+        # Nivel más fino con como mucho `width` bloques dentro de la ventana: entre 1 y 2
+        # puntos por columna de píxeles
+        level_index = int(np.ceil(np.log2(max(count / (width * self.base_bucket), 1.0))))
+        level_index = min(level_index, len(self.levels) - 1)
+        size = self.base_bucket << level_index
+        xmin, ymin, xmax, ymax = self.levels[level_index]
+        first, last = start // size, (stop - 1) // size + 1
+        x, y = _interleave(xmin[first:last], ymin[first:last], xmax[first:last], ymax[first:last])
+        if method == "lttb":
+            return lttb(x, y, 2 * width)
+        return x, y
+
+    def save(self, path, source_stat=None):
+        arrays = {"x": self.x, "y": self.y, "base_bucket": self.base_bucket, "version": SUMMARY_VERSION,
+                  "levels": len(self.levels)}
+        if source_stat is not None:
+            arrays["source"] = np.array([source_stat.st_size, source_stat.st_mtime])
+        for position, level in enumerate(self.levels):
+            arrays[f"level_{position}"] = np.stack(level)
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path, source_stat=None):
+        """Resumen guardado, o None si no existe o el archivo de origen cambió después."""
+        try:
+            with np.load(path) as saved:
+                if int(saved["version"]) != SUMMARY_VERSION:
+                    return None
+                if source_stat is not None and not np.array_equal(
+                        saved["source"], [source_stat.st_size, source_stat.st_mtime]):
+                    return None
+                levels = [tuple(saved[f"level_{i}"]) for i in range(int(saved["levels"]))]
+                return cls(saved["x"], saved["y"], int(saved["base_bucket"]), levels)
+        except (IOError, OSError, KeyError, ValueError):
+            return None
+
+
+def _frame_statistic(data, statistic):
+    flat = data.reshape(len(data), -1)
+    return getattr(flat, statistic)(axis=1)
+
+
+def extract_series(path, pixel=None, roi=None, statistic="max"):
+    """
+    Serie temporal (tiempo en s desde el inicio, temperatura) de un registro:
+      Tiempo,Temperatura: la serie tal cual
+      pixel_N (CSV) o grabación .npy: un píxel (`pixel`, índice plano) o el `statistic`
+      (min, max o mean) de una ROI (fila0, fila1, col0, col1) o del fotograma completo
+    """
+    if path.lower().endswith(".npy"):
+        from npy_recorder import load_recording
+
+        frames, index, _ = load_recording(path)
+        times = np.asarray(index["timestamp"], dtype=np.float64)
+        values = np.empty(len(frames), dtype=np.float64)
+        step = 4096
+        for start in range(0, len(frames), step):
+            block = np.asarray(frames[start:start + step], dtype=np.float32)
+            if pixel is not None:
+                values[start:start + step] = block.reshape(len(block), -1)[:, pixel]
+            else:
+                if roi is not None:
+                    block = block[:, roi[0]:roi[1], roi[2]:roi[3]]
+                values[start:start + step] = _frame_statistic(block, statistic)
+        return times - (times[0] if len(times) else 0.0), values
+
+    if read_log_info(path).kind == "series":
+        times, temperatures = read_series(path)
+        return times.astype(np.float64), temperatures.astype(np.float64)
+
+    times, values = [], []
+    for chunk in iter_frames(path, roi=roi, pixels=None if pixel is None else [pixel]):
+        times.append(chunk.timestamps)
+        values.append(_frame_statistic(chunk.data, statistic))
+    if not times:
+        raise ValueError(f"El archivo '{path}' no contiene fotogramas.")
+    times = np.concatenate(times)
+    return times - times[0], np.concatenate(values).astype(np.float64)
+
+
+def series_key(pixel=None, roi=None, statistic="max"):
+    if pixel is not None:
+        return f"pixel_{pixel}"
+    if roi is not None:
+        return f"roi_{'_'.join(map(str, roi))}_{statistic}"
+    return f"frame_{statistic}"
+
+
+def load_summary(path, pixel=None, roi=None, statistic="max", use_cache=DECIMATION_CACHE):
+    """
+    Resumen multirresolución de una serie del registro. Se guarda junto al archivo de
+    origen (<registro>.<serie>.summary.npz) y se reutiliza mientras este no cambie, así
+    que el registro solo se lee y convierte la primera vez.
+    """
+    cache_path = f"{path}.{series_key(pixel, roi, statistic)}.summary.npz"
+    source_stat = os.stat(path)
+    if use_cache:
+        summary = SeriesSummary.load(cache_path, source_stat)
+        if summary is not None:
+            return summary
+    summary = SeriesSummary(*extract_series(path, pixel, roi, statistic))
+    if use_cache:
+        try:
+            summary.save(cache_path, source_stat)
+        except (IOError, OSError) as e:
+            print(f"Aviso: no se pudo guardar el resumen en '{cache_path}': {e}")
+    return summary
+
+
+class DecimatedLine:
+    """
+    Línea de matplotlib que solo contiene los puntos visibles: al hacer zoom o desplazar
+    el eje (xlim_changed) o cambiar el tamaño de la ventana, se vuelve a diezmar la
+    ventana visible al ancho del eje en píxeles.
+    """
+
+    def __init__(self, ax, summary, method="minmax", **plot_kwargs):
+        if method not in DECIMATION_METHODS:
+            raise ValueError(f"Método desconocido: {method}. Opciones: {', '.join(DECIMATION_METHODS)}")
+        self.ax = ax
+        self.summary = summary
+        self.method = method
+        self.line, = ax.plot([], [], **plot_kwargs)
+        if len(summary):
+            low, high = summary.y_range
+            margin = (high - low) * 0.05 or 0.5
+            ax.set_xlim(summary.x[0], summary.x[-1])
+            ax.set_ylim(low - margin, high + margin)
+        # matplotlib solo guarda referencias débiles a métodos: las funciones mantienen viva la línea
+        ax.callbacks.connect("xlim_changed", lambda _: self._on_limits_changed())
+        ax.figure.canvas.mpl_connect("resize_event", lambda _: self._on_limits_changed())
+        self.refresh()
+
+    def refresh(self):
+        if not len(self.summary):
+            return
+        x0, x1 = self.ax.get_xlim()
+        width = max(int(self.ax.bbox.width), 100)
+        self.line.set_data(*self.summary.window(x0, x1, width, self.method))
+
+    def _on_limits_changed(self):
+        self.refresh()
+        self.ax.figure.canvas.draw_idle()
+
+
+if __name__ == "__main__":
+    import tempfile
+    import timeit
+
+    rng = np.random.default_rng(0)
+    n = 1_000_000
+    x = np.arange(n) * 0.2
+    y = 20 + 60 * (1 - np.exp(-x / 50000)) + rng.normal(0, 0.2, n)
+    y[rng.integers(0, n, 20)] += 15
+
+    started = timeit.default_timer()
+    summary = SeriesSummary(x, y)
+    print(f"Resumen de {n} muestras: {(timeit.default_timer() - started) * 1e3:.0f} ms, {len(summary.levels)} niveles")
+
+    for label, (x0, x1) in (("completa", (x[0], x[-1])), ("zoom 10 %", (x[n // 2], x[n // 2 + n // 10])),
+                            ("zoom 0,1 %", (x[n // 2], x[n // 2 + n // 1000]))):
+        for method in DECIMATION_METHODS:
+            number = 20
+            elapsed = timeit.timeit(lambda: summary.window(x0, x1, 1500, method), number=number) / number
+            wx, wy = summary.window(x0, x1, 1500, method)
+            mask = (x >= x0) & (x <= x1)
+            print(f"Ventana {label:<10} {method:<6} {len(wx):6d} puntos en {elapsed * 1e3:6.2f} ms, "
+                  f"pico conservado: {wy.max() >= y[mask].max() - 1e-9}")
+
+    path = os.path.join(tempfile.gettempdir(), "decimation_demo.npz")
+    summary.save(path)
+    started = timeit.default_timer()
+    SeriesSummary.load(path)
+    print(f"Carga del resumen guardado: {(timeit.default_timer() - started) * 1e3:.0f} ms")
+    os.remove(path)
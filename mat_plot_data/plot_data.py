@@ -1,36 +1,66 @@
-import pandas as pd
+import argparse
+import os
+import sys
+
 import matplotlib.pyplot as plt
 
-def plot_temperature_data(file_path):
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from log_reader import read_log_info
+from decimation import load_summary, DecimatedLine, DECIMATION_METHODS
+
+def plot_temperature_data(file_path, pixel=None, roi=None, statistic=None, method="minmax", use_cache=True):
     try:
-        df = pd.read_csv(file_path)
+        is_series = not file_path.lower().endswith(".npy") and read_log_info(file_path).kind == "series"
 
-        # Ensure the required columns exist
-        if 'Tiempo' not in df.columns or 'Temperatura' not in df.columns:
-            print("Error: The CSV file must contain 'Tiempo' and 'Temperatura' columns.")
+        fig, ax = plt.subplots(figsize=(10, 6)) # Adjust figure size as needed
+        # Solo se dibujan los puntos visibles, diezmados al ancho del eje; al hacer zoom
+        # se vuelve a diezmar la ventana a partir del resumen guardado junto al registro
+        lines = []
+        if is_series or pixel is not None or roi is not None or statistic:
+            summary = load_summary(file_path, pixel, roi, statistic or "max", use_cache)
+            lines.append(DecimatedLine(ax, summary, method, linestyle='-'))
+        else:
+            # Pixel logs (temperatura_log_*): per-frame max and mean
+            for name, label in (("max", 'Máxima'), ("mean", 'Media')):
+                summary = load_summary(file_path, statistic=name, use_cache=use_cache)
+                lines.append(DecimatedLine(ax, summary, method, linestyle='-', label=label))
+            low = min(line.summary.y_range[0] for line in lines)
+            high = max(line.summary.y_range[1] for line in lines)
+            ax.set_ylim(low - 0.5, high + 0.5)
+            ax.legend()
+        if not len(lines[0].summary):
+            print(f"Error: The file '{file_path}' contains no frames.")
             return
 
-
-        # Create the plot
-        plt.figure(figsize=(10, 6)) # Adjust figure size as needed
-        plt.plot(df['Tiempo'], df['Temperatura'], linestyle='-')
-
         # Add labels and title
-        plt.xlabel('Tiempo (s)')
-        plt.ylabel('Temperatura (°C)')
-        plt.title('Gráfico de Tiempo vs. Temperatura')
-        plt.grid(True) 
+        ax.set_xlabel('Tiempo (s)')
+        ax.set_ylabel('Temperatura (°C)')
+        ax.set_title('Gráfico de Tiempo vs. Temperatura')
+        ax.grid(True)
           # Adjust y-axis limits as needed
-        plt.tight_layout() 
+        fig.tight_layout()
 
         plt.show()
 
     except FileNotFoundError:
         print(f"Error: The file '{file_path}' was not found.")
+    except ValueError as e:
+        print(f"Error: {e}")
     except Exception as e:
         print(f"An error occurred: {e}")
 
 
 if __name__ == "__main__":
-    csv_file_path = 'data_water_21_07.csv'
-    plot_temperature_data(csv_file_path)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Gráfica de temperatura de un registro (series largas diezmadas)")
+    parser.add_argument("file", nargs="?", default='data_water_21_07.csv',
+                        help="Registro Tiempo,Temperatura, CSV de píxeles o grabación .npy")
+    selection = parser.add_mutually_exclusive_group()
+    selection.add_argument("--pixel", type=int, help="Índice plano del píxel a dibujar")
+    selection.add_argument("--roi", type=int, nargs=4, metavar=("FILA0", "FILA1", "COL0", "COL1"),
+                           help="Región de interés con límites finales exclusivos")
+    parser.add_argument("--stat", choices=["min", "max", "mean"], help="Estadístico por fotograma de la ROI")
+    parser.add_argument("--method", choices=DECIMATION_METHODS, default="minmax")
+    parser.add_argument("--no-cache", action="store_true", help="No lee ni guarda el resumen junto al registro")
+    args = parser.parse_args()
+    plot_temperature_data(args.file, args.pixel, tuple(args.roi) if args.roi else None, args.stat,
+                          args.method, not args.no_cache)
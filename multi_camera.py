@@ -0,0 +1,240 @@
+import os
+import re
+import threading
+import time
+from collections import deque
+
+from app_parameters import (
+    SERIAL_PROTOCOL, ACQUISITION_MODE, SIMULATOR_PORT_NAME, MULTI_CAMERA_HISTORY_FRAMES
+)
+from acquisition_worker import AcquisitionWorker, LatestFrameQueue
+
+
+class Camera:
+    """Un dispositivo del gestor: su origen, su hilo de adquisición, su cola y su grabador."""
+
+    def __init__(self, name, source):
+        self.name = name
+        self.source = source
+        self.frame_queue = LatestFrameQueue()
+        self.worker = None
+        self.recorder = None
+        self.history = deque(maxlen=MULTI_CAMERA_HISTORY_FRAMES)
+        self.frames_received = 0
+        self.error = None
+
+    @property
+    def shape(self):
+        return self.history[-1].data.shape if self.history else None
+
+    @property
+    def latest(self):
+        return self.history[-1] if self.history else None
+
+    @property
+    def running(self):
+        return self.worker is not None and self.worker.is_alive()
+
+
+def open_source(port, protocol=SERIAL_PROTOCOL, mode=ACQUISITION_MODE):
+    """
+    FrameSource de un puerto, una URL de pyserial o del simulador ("Simulador 24x32" simula
+    un MLX90640). La forma del sensor se detecta con el primer fotograma. None si no conecta.
+    """
+    from frame_sources import SerialFrameSource, SyntheticFrameSource
+
+    if port == SIMULATOR_PORT_NAME or port.startswith(SIMULATOR_PORT_NAME + " "):
+        size = port[len(SIMULATOR_PORT_NAME):].strip()
+        rows, cols = (int(value) for value in size.split("x")) if size else (8, 8)
+        return SyntheticFrameSource(rows, cols)
+    from serial_handler import SerialHandler
+
+    handler = SerialHandler(rows=None, cols=None)
+    return SerialFrameSource(handler, mode) if handler.connect(port, protocol) else None
+
+
+def _safe_name(name):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name).strip("_") or "camara"
+
+
+class CameraManager:
+    """
+    Varias cámaras a la vez: cada una con su propio AcquisitionWorker (hilo), de modo que
+    un puerto lento no frena a los demás. La forma de cada sensor (AMG8833 8x8 o MLX90640
+    24x32) se detecta con su primer fotograma. Todos los hilos marcan los fotogramas con el
+    mismo reloj del PC (time.time() al recibirlos), así que `aligned()` puede emparejar los
+    fotogramas más próximos en el tiempo de todas las cámaras.
+
+    `poll()` se llama periódicamente (temporizador de la interfaz o bucle sin GUI): vacía
+    las colas, pasa todos los fotogramas a los grabadores y guarda los últimos en el historial.
+    """
+
+    def __init__(self, protocol=SERIAL_PROTOCOL, mode=ACQUISITION_MODE):
+        self.protocol = protocol
+        self.mode = mode
+        self.cameras = {}
+        self._record_base = None
+
+    def add_source(self, name, source):
+        if name in self.cameras:
+            raise ValueError(f"Ya existe una cámara llamada '{name}'.")
+        camera = Camera(name, source)
+        self.cameras[name] = camera
+        return camera
+
+    def open_ports(self, ports):
+        """
+        Abre los puertos en paralelo (cada conexión espera el reinicio del ESP32 y la
+        negociación del protocolo) y devuelve los nombres de los que no se pudieron abrir.
+        """
+        sources = {}
+        threads = [threading.Thread(target=self._open_port, args=(port, sources), daemon=True) for port in ports]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        failed = []
+        for port in ports:
+            if sources.get(port) is None:
+                failed.append(port)
+            else:
+                self.add_source(port, sources[port])
+        return failed
+
+    def _open_port(self, port, sources):
+        sources[port] = open_source(port, self.protocol, self.mode)
+
+    def start(self):
+        for camera in self.cameras.values():
+            if camera.worker is None:
+                camera.worker = AcquisitionWorker(camera.source, camera.frame_queue)
+                camera.worker.start()
+
+    def stop(self):
+        for camera in self.cameras.values():
+            if camera.worker is not None:
+                camera.worker.request_stop()
+        # Se señalan todas antes de esperar a ninguna: el cierre no suma los tiempos de espera
+        for camera in self.cameras.values():
+            if camera.worker is not None:
+                camera.worker.stop()
+                camera.error = camera.worker.error
+                camera.worker = None
+        self.poll()
+
+    def close(self):
+        self.stop()
+        self.stop_recording()
+        for camera in self.cameras.values():
+            camera.source.close()
+        self.cameras.clear()
+
+    def start_recording(self, base_path):
+        """Un archivo por cámara: <base>_<cámara>.<ext>, en CSV, .npy o .thz según la extensión."""
+        from headless_logger import open_recorder
+
+        base, extension = os.path.splitext(base_path)
+        output_format = extension.lower().lstrip(".")
+        if output_format not in ("npy", "thz"):
+            output_format = "csv"
+        self.stop_recording()
+        paths = []
+        try:
+            for camera in self.cameras.values():
+                path = f"{base}_{_safe_name(camera.name)}.{output_format}"
+                camera.recorder = open_recorder(path, output_format)
+                paths.append(path)
+        except IOError:
+            self.stop_recording()
+            raise
+        self._record_base = base_path
+        return paths
+
+    def stop_recording(self):
+        for camera in self.cameras.values():
+            if camera.recorder is not None:
+                camera.recorder.close()
+                camera.recorder = None
+        self._record_base = None
+
+    @property
+    def is_recording(self):
+        return self._record_base is not None
+
+    def poll(self):
+        """Vacía las colas de todas las cámaras. Devuelve {cámara: fotogramas nuevos}."""
+        new_frames = {}
+        for name, camera in self.cameras.items():
+            frames = camera.frame_queue.drain()
+            if not frames:
+                continue
+            camera.frames_received += len(frames)
+            if camera.recorder is not None:
+                for frame in frames:
+                    camera.recorder.write(frame)
+            camera.history.extend(frames)
+            new_frames[name] = frames
+        return new_frames
+
+    def recording_errors(self):
+        return {name: camera.recorder.error for name, camera in self.cameras.items()
+                if camera.recorder is not None and camera.recorder.error}
+
+    def aligned(self, reference=None):
+        """
+        Fotograma de cada cámara más próximo a `reference` (por defecto, el instante más
+        reciente en que todas las cámaras tienen datos: el mínimo de sus últimas marcas).
+        Devuelve (referencia, {cámara: Frame}, desfase máximo en segundos).
+        """
+        cameras = [camera for camera in self.cameras.values() if camera.history]
+        if not cameras:
+            return None, {}, 0.0
+        if reference is None:
+            reference = min(camera.history[-1].timestamp for camera in cameras)
+        frames = {}
+        skew = 0.0
+        for camera in cameras:
+            frame = min(camera.history, key=lambda candidate: abs(candidate.timestamp - reference))
+            frames[camera.name] = frame
+            skew = max(skew, abs(frame.timestamp - reference))
+        return reference, frames, skew
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Adquisición simultánea de varias cámaras sin interfaz")
+    parser.add_argument("ports", nargs="+",
+                        help=f"Puertos, URL de pyserial o '{SIMULATOR_PORT_NAME}' / '{SIMULATOR_PORT_NAME} 24x32'")
+    parser.add_argument("-d", "--duration", type=float, default=5.0)
+    parser.add_argument("-o", "--output", help="Graba cada cámara en <base>_<cámara>.csv / .npy / .thz")
+    args = parser.parse_args()
+
+    manager = CameraManager()
+    failed = manager.open_ports(args.ports)
+    for port in failed:
+        print(f"No se pudo conectar a {port}.")
+    if not manager.cameras:
+        raise SystemExit(1)
+    if args.output:
+        for path in manager.start_recording(args.output):
+            print(f"Grabando en {path}")
+    manager.start()
+    started = time.monotonic()
+    skews = []
+    while time.monotonic() - started < args.duration:
+        time.sleep(0.05)
+        manager.poll()
+        reference, frames, skew = manager.aligned()
+        if len(frames) == len(manager.cameras):
+            skews.append(skew)
+    elapsed = time.monotonic() - started
+    manager.stop()
+    for camera in manager.cameras.values():
+        shape = "x".join(map(str, camera.shape)) if camera.shape else "?"
+        print(f"{camera.name}: {shape}, {camera.frames_received / elapsed:.1f} fps, "
+              f"{camera.source.dropped_frames} perdidos{', ' + camera.error if camera.error else ''}")
+    if skews:
+        print(f"Desfase entre cámaras: mediana {sorted(skews)[len(skews) // 2] * 1e3:.1f} ms, "
+              f"máximo {max(skews) * 1e3:.1f} ms")
+    manager.close()
@@ -0,0 +1,176 @@
+import argparse
+import math
+import sys
+
+import numpy as np
+from PyQt5.QtWidgets import (
+    QApplication, QMainWindow, QWidget, QGridLayout, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+    QFrame, QFileDialog, QMessageBox, QSizePolicy
+)
+from PyQt5.QtCore import Qt, QTimer, QDateTime
+from PyQt5.QtGui import QImage, QPixmap
+
+from app_parameters import APP_TITLE, GUI_UPDATE_INTERVAL_MS, HEATMAP_COLORMAP, CSV_FILENAME_PREFIX
+from colormap_lut import build_lut, apply_lut
+from color_scale import ColorScale
+from multi_camera import CameraManager
+
+
+class CameraTile(QFrame):
+    """Mosaico de una cámara: nombre, mapa de calor con escala de color propia y estadísticas."""
+
+    def __init__(self, name, lut, parent=None):
+        super().__init__(parent)
+        self.setFrameShape(QFrame.StyledPanel)
+        self.lut = lut
+        self.color_scale = ColorScale()
+        self._rgba = None
+        layout = QVBoxLayout(self)
+        self.title_label = QLabel(f"<b>{name}</b>")
+        layout.addWidget(self.title_label)
+        self.image_label = QLabel()
+        self.image_label.setAlignment(Qt.AlignCenter)
+        self.image_label.setMinimumSize(160, 120)
+        self.image_label.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Ignored)
+        layout.addWidget(self.image_label, 1)
+        self.stats_label = QLabel("Esperando datos...")
+        layout.addWidget(self.stats_label)
+
+    def update_frame(self, frame, fps):
+        data = frame.data
+        vmin, vmax = self.color_scale.update(data)
+        if self._rgba is None or self._rgba.shape[:2] != data.shape:
+            self._rgba = np.empty(data.shape + (4,), dtype=np.uint8)
+        apply_lut(data, vmin, vmax, self.lut, out=self._rgba)
+        rows, cols = data.shape
+        image = QImage(self._rgba.data, cols, rows, cols * 4, QImage.Format_RGBA8888)
+        # Píxeles del sensor nítidos: escalado sin interpolación
+        self.image_label.setPixmap(QPixmap.fromImage(image).scaled(
+            self.image_label.size(), Qt.KeepAspectRatio, Qt.FastTransformation))
+        self.stats_label.setText(f"{rows}x{cols}  Mín {data.min():.1f}  Máx {data.max():.1f}°C  "
+                                 f"{fps:.1f} fps")
+
+
+class MultiCameraWindow(QMainWindow):
+    def __init__(self, names, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"{APP_TITLE} - Varias cámaras")
+        self.setGeometry(100, 100, 1000, 750)
+        lut = build_lut(HEATMAP_COLORMAP)
+
+        central = QWidget()
+        layout = QVBoxLayout(central)
+        grid = QGridLayout()
+        columns = max(1, math.ceil(math.sqrt(len(names))))
+        self.tiles = {}
+        for position, name in enumerate(names):
+            tile = CameraTile(name, lut)
+            grid.addWidget(tile, position // columns, position % columns)
+            self.tiles[name] = tile
+        layout.addLayout(grid, 1)
+
+        buttons = QHBoxLayout()
+        self.start_record_button = QPushButton("Iniciar Registro")
+        self.stop_record_button = QPushButton("Detener Registro")
+        self.stop_record_button.setEnabled(False)
+        buttons.addWidget(self.start_record_button)
+        buttons.addWidget(self.stop_record_button)
+        buttons.addStretch(1)
+        layout.addLayout(buttons)
+        self.setCentralWidget(central)
+
+    def set_record_buttons_state(self, recording):
+        self.start_record_button.setEnabled(not recording)
+        self.stop_record_button.setEnabled(recording)
+
+    def show_message(self, title, message):
+        QMessageBox.information(self, title, message)
+
+    def show_error(self, title, message):
+        QMessageBox.critical(self, title, message)
+
+
+class MultiCameraApp:
+    """
+    Vista en mosaico de varias cámaras. Cada temporizador vacía las colas de todas (los
+    grabadores reciben todos los fotogramas) y dibuja el conjunto de fotogramas más
+    próximos en el tiempo, con el desfase entre cámaras en la barra de estado.
+    """
+
+    def __init__(self, ports, argv=None):
+        self.app = QApplication(sys.argv if argv is None else argv)
+        self.manager = CameraManager()
+        failed = self.manager.open_ports(ports)
+        self.window = MultiCameraWindow(list(self.manager.cameras))
+        if failed:
+            self.window.show_error("Error de Conexión", f"No se pudo conectar a: {', '.join(failed)}")
+
+        self.window.start_record_button.clicked.connect(self._start_recording)
+        self.window.stop_record_button.clicked.connect(self._stop_recording)
+        self._previous_counts = {}
+        self._fps = {}
+        self.timer = QTimer()
+        self.timer.setInterval(GUI_UPDATE_INTERVAL_MS)
+        self.timer.timeout.connect(self._update_data)
+        self.fps_timer = QTimer()
+        self.fps_timer.setInterval(1000)
+        self.fps_timer.timeout.connect(self._update_fps)
+        self.app.aboutToQuit.connect(self.manager.close)
+
+        self.manager.start()
+        self.timer.start()
+        self.fps_timer.start()
+
+    def _update_fps(self):
+        for name, camera in self.manager.cameras.items():
+            self._fps[name] = camera.frames_received - self._previous_counts.get(name, 0)
+            self._previous_counts[name] = camera.frames_received
+
+    def _update_data(self):
+        if not self.manager.poll():
+            return
+        errors = self.manager.recording_errors()
+        if errors:
+            self._stop_recording(notify=False)
+            self.window.show_error("Error de Archivo", "\n".join(errors.values()))
+
+        reference, frames, skew = self.manager.aligned()
+        for name, frame in frames.items():
+            self.window.tiles[name].update_frame(frame, self._fps.get(name, 0))
+        stopped = [name for name, camera in self.manager.cameras.items() if not camera.running]
+        status = f"Desfase entre cámaras: {skew * 1e3:.0f} ms"
+        if stopped:
+            status += f" | Sin conexión: {', '.join(stopped)}"
+        self.window.statusBar().showMessage(status)
+
+    def _start_recording(self):
+        current_datetime = QDateTime.currentDateTime().toString("yyyyMMdd_HHmmss")
+        base_path, _ = QFileDialog.getSaveFileName(
+            self.window, "Guardar datos de temperatura como...", f"{CSV_FILENAME_PREFIX}{current_datetime}.csv",
+            "Archivos CSV (*.csv);;Grabación binaria NumPy (*.npy)")
+        if not base_path:
+            return
+        try:
+            paths = self.manager.start_recording(base_path)
+        except IOError as e:
+            self.window.show_error("Error de Archivo", f"No se pudo abrir el archivo para escritura: {e}")
+            return
+        self.window.set_record_buttons_state(True)
+        self.window.show_message("Registro Iniciado", "Grabando en:\n" + "\n".join(paths))
+
+    def _stop_recording(self, notify=True):
+        self.manager.stop_recording()
+        self.window.set_record_buttons_state(False)
+        if notify:
+            self.window.show_message("Registro Detenido", "Registro de datos finalizado.")
+
+    def run(self):
+        self.window.show()
+        sys.exit(self.app.exec_())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vista en mosaico de varias cámaras MLX90640 / AMG8833")
+    parser.add_argument("ports", nargs="+", help="Puertos, URL de pyserial o 'Simulador' / 'Simulador 24x32'")
+    args, qt_args = parser.parse_known_args()
+    MultiCameraApp(args.ports, argv=[sys.argv[0]] + qt_args).run()
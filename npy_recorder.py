@@ -0,0 +1,245 @@
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+from app_parameters import NPY_RECORDING_DTYPE, NPY_INITIAL_CAPACITY_FRAMES, NPY_SYNC_INTERVAL_S
+from csv_recorder import csv_header
+from log_reader import read_log_info, iter_frames
+
+INDEX_DTYPE = np.dtype([("timestamp", "<f8"), ("sequence", "<i8")])
+
+# Cabecera .npy de tamaño fijo: se reescribe en su sitio al crecer, sincronizar o cerrar el archivo
+NPY_HEADER_BYTES = 128
+
+
+def recording_paths(path):
+    base = path[:-4] if path.lower().endswith(".npy") else path
+    return base + ".npy", base + ".index.npy", base + ".json"
+
+
+def _npy_header(dtype, shape):
+    header = "{'descr': %r, 'fortran_order': False, 'shape': %r, }" % (np.lib.format.dtype_to_descr(np.dtype(dtype)), tuple(shape))
+    header = header.ljust(NPY_HEADER_BYTES - 10 - 1) + "\n"
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1")
+
+
+class GrowableNpyArray:
+    """
+    Archivo .npy válido en todo momento cuyo primer eje crece por duplicación.
+    Cada `append` es una copia directa en el mapa de memoria; la cabecera se actualiza al
+    crecer, con `sync` y al cerrar. Si la grabación se interrumpe, np.load devuelve los
+    elementos hasta el último `sync` (o duplicación): los posteriores se pierden.
+    """
+
+    def __init__(self, path, dtype, item_shape=(), capacity=NPY_INITIAL_CAPACITY_FRAMES):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.item_shape = tuple(item_shape)
+        self.count = 0
+        self._file = open(path, "w+b")
+        self._array = None
+        self._resize(max(1, capacity))
+
+    @property
+    def capacity(self):
+        return len(self._array)
+
+    def append(self, item):
+        if self.count == self.capacity:
+            self._resize(self.capacity * 2)
+        self._array[self.count] = item
+        self.count += 1
+
+    def extend(self, items):
+        end = self.count + len(items)
+        if end > self.capacity:
+            self._resize(max(self.capacity * 2, end))
+        self._array[self.count:end] = items
+        self.count = end
+
+    def sync(self):
+        """Lleva los datos al disco y después la cabecera con el número de elementos actual."""
+        self._array.flush()
+        self._write_header(self.count)
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is None:
+            return
+        self._array.flush()
+        self._array = None
+        self._file.truncate(NPY_HEADER_BYTES + self.count * self._item_bytes)
+        self._write_header(self.count)
+        self._file.close()
+        self._file = None
+
+    @property
+    def _item_bytes(self):
+        return self.dtype.itemsize * int(np.prod(self.item_shape, dtype=np.int64))
+
+    def _write_header(self, count):
+        self._file.seek(0)
+        self._file.write(_npy_header(self.dtype, (count,) + self.item_shape))
+        self._file.flush()
+
+    def _resize(self, capacity):
+        if self._array is not None:
+            self._array.flush()
+            self._array = None
+        self._file.truncate(NPY_HEADER_BYTES + capacity * self._item_bytes)
+        self._write_header(self.count)
+        self._array = np.memmap(self._file, dtype=self.dtype, mode="r+", offset=NPY_HEADER_BYTES,
+                                shape=(capacity,) + self.item_shape)
+
+
+class NpyRecorder:
+    """
+    Grabación binaria para capturas largas: <nombre>.npy con los fotogramas
+    (N, filas, columnas), <nombre>.index.npy con marca de tiempo y secuencia de cada
+    fotograma y <nombre>.json con la forma del sensor y el número de fotogramas.
+    Misma interfaz que CsvRecorder (start / write / close). Cada `sync_interval` segundos
+    se sincronizan los tres archivos: una grabación interrumpida conserva todo salvo, como
+    mucho, los fotogramas de ese último intervalo.
+    """
+
+    def __init__(self, file_path, dtype=NPY_RECORDING_DTYPE, sync_interval=NPY_SYNC_INTERVAL_S):
+        self.frames_path, self.index_path, self.metadata_path = recording_paths(file_path)
+        self.dtype = np.dtype(dtype)
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.error = None
+        self._frames = None
+        self._index = None
+        self._shape = None
+        self._started_at = None
+        self.sync_interval = sync_interval
+        self._next_sync = None
+
+    def start(self):
+        # Se comprueba la ruta de inmediato; los archivos se crean con el primer fotograma
+        open(self.metadata_path, "w").close()
+        self._started_at = time.time()
+
+    def write(self, frame):
+        data = frame.data
+        if self._frames is None:
+            self._shape = data.shape
+            self._frames = GrowableNpyArray(self.frames_path, self.dtype, data.shape)
+            self._index = GrowableNpyArray(self.index_path, INDEX_DTYPE)
+            self._write_metadata()
+            self._next_sync = time.monotonic() + self.sync_interval
+        elif data.shape != self._shape:
+            print(f"Aviso: fotograma {data.shape} descartado; la grabación usa {self._shape}.")
+            self.frames_dropped += 1
+            return
+        try:
+            self._frames.append(data)
+            self._index.append((frame.timestamp, -1 if frame.sequence is None else frame.sequence))
+            self.frames_written += 1
+            if time.monotonic() >= self._next_sync:
+                self.sync()
+        except (IOError, OSError) as e:
+            self.error = f"Error al escribir la grabación binaria: {e}"
+
+    def sync(self):
+        # Fotogramas antes que índice y metadatos: ningún archivo anuncia datos que no estén en disco
+        self._frames.sync()
+        self._index.sync()
+        self._write_metadata()
+        self._next_sync = time.monotonic() + self.sync_interval
+
+    def close(self):
+        if self._frames is not None:
+            self._frames.close()
+            self._index.close()
+        self._write_metadata()
+
+    def _write_metadata(self):
+        write_metadata(self.metadata_path, self._shape, self.dtype, self.frames_written, self._started_at)
+
+
+def write_metadata(metadata_path, shape, dtype, frames, started_at=None):
+    frames_path, index_path, _ = recording_paths(metadata_path[:-len(".json")])
+    metadata = {
+        "format": "thermal-npy",
+        "version": 1,
+        "sensor_shape": list(shape) if shape else None,
+        "dtype": np.dtype(dtype).name,
+        "frames": frames,
+        "started_at": started_at,
+        "frames_file": os.path.basename(frames_path),
+        "index_file": os.path.basename(index_path),
+    }
+    # Se reemplaza de una vez: un corte durante la escritura no deja un .json a medias
+    temporary_path = metadata_path + ".tmp"
+    with open(temporary_path, "w") as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(temporary_path, metadata_path)
+
+
+def load_recording(path, mmap_mode="r"):
+    """
+    Devuelve (fotogramas, índice, metadatos). Los fotogramas se abren como mapa de
+    memoria: cualquier rango de tiempo se puede leer sin cargar el archivo completo.
+    """
+    frames_path, index_path, metadata_path = recording_paths(path)
+    with open(metadata_path) as f:
+        metadata = json.load(f)
+    frames = np.load(frames_path, mmap_mode=mmap_mode)
+    index = np.load(index_path, mmap_mode=mmap_mode)
+    count = min(len(frames), len(index))
+    return frames[:count], index[:count], metadata
+
+
+def csv_to_npy(csv_path, npy_path, dtype=NPY_RECORDING_DTYPE):
+    frames_path, index_path, metadata_path = recording_paths(npy_path)
+    shape = read_log_info(csv_path).shape
+    frames = GrowableNpyArray(frames_path, dtype, shape)
+    index = GrowableNpyArray(index_path, INDEX_DTYPE)
+    for chunk in iter_frames(csv_path):
+        entries = np.empty(len(chunk.data), dtype=INDEX_DTYPE)
+        entries["timestamp"] = chunk.timestamps
+        entries["sequence"] = chunk.sequences
+        frames.extend(chunk.data)
+        index.extend(entries)
+    frames.close()
+    index.close()
+    write_metadata(metadata_path, shape, dtype, frames.count)
+    return frames.count
+
+
+def npy_to_csv(npy_path, csv_path, chunk_frames=1024):
+    frames, index, _ = load_recording(npy_path)
+    pixel_count = int(np.prod(frames.shape[1:]))
+    row_format = ",".join(["%.3f", "%d"] + ["%.2f"] * pixel_count) + "\n"
+    with open(csv_path, "w", newline="") as f:
+        f.write(",".join(csv_header(pixel_count)) + "\n")
+        for start in range(0, len(frames), chunk_frames):
+            block = np.asarray(frames[start:start + chunk_frames], dtype=np.float64).reshape(-1, pixel_count)
+            entries = index[start:start + chunk_frames]
+            f.write("".join(
+                row_format % (timestamp, sequence, *values)
+                for timestamp, sequence, values in zip(entries["timestamp"].tolist(),
+                                                       entries["sequence"].tolist(), block.tolist())
+            ))
+    return len(frames)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Conversión entre registros CSV y grabaciones binarias .npy")
+    parser.add_argument("command", choices=["to-npy", "to-csv"])
+    parser.add_argument("source")
+    parser.add_argument("destination")
+    parser.add_argument("--dtype", default=NPY_RECORDING_DTYPE, choices=["float16", "float32"])
+    args = parser.parse_args()
+
+    if args.command == "to-npy":
+        count = csv_to_npy(args.source, args.destination, args.dtype)
+    else:
+        count = npy_to_csv(args.source, args.destination)
+    print(f"{count} fotogramas convertidos: {args.source} -> {args.destination}")
@@ -2,35 +2,70 @@ import serial
 import serial.tools.list_ports
 import numpy as np
 import time
+from collections import deque
 
-from app_parameters import BAUD_RATE, SENSOR_ROWS, SENSOR_COLS, START_DATA_MARKER, END_DATA_MARKER
+from app_parameters import (
+    BAUD_RATE, SENSOR_ROWS, SENSOR_COLS, SERIAL_READ_TIMEOUT_S, FRAME_QUEUE_SIZE, SERIAL_PROTOCOL,
+    ASCII_FRAME_COMMAND, BINARY_FRAME_COMMAND, PROTOCOL_NEGOTIATION_TIMEOUT_S,
+    STREAM_START_COMMAND, STREAM_STOP_COMMAND, ACQUISITION_READ_TIMEOUT_S,
+    DEVICE_READY_TIMEOUT_S, DEVICE_READY_POLL_S, DEVICE_READY_QUIET_S
+)
+from frame_parser import AsciiFrameDecoder, BinaryFrameDecoder, Frame
+from telemetry import telemetry
 
 class SerialHandler:
-    def __init__(self):
+    def __init__(self, rows=SENSOR_ROWS, cols=SENSOR_COLS):
+        self.rows = rows
+        self.cols = cols
         self.ser = None
         self.connected_port = None
         self.latest_data = None
         self.is_reading = False
+        self.last_sequence = None
+        self.is_streaming = False
+        self.dropped_frames = 0
+        self._expected_sequence = None
+        self.protocol = "ascii"
+        self.decoder = AsciiFrameDecoder(rows, cols)
+        self._frame_command = ASCII_FRAME_COMMAND
+        self._pending_frames = deque(maxlen=FRAME_QUEUE_SIZE)
+
+    @property
+    def shape(self):
+        """Forma del sensor; con rows/cols a None, None hasta recibir el primer fotograma."""
+        if self.decoder.rows and self.decoder.cols:
+            return self.decoder.rows, self.decoder.cols
+        return None
 
     @staticmethod
     def list_available_ports():
         ports = serial.tools.list_ports.comports()
         return [port.device for port in ports]
 
-    def connect(self, port):
+    def connect(self, port, protocol=SERIAL_PROTOCOL):
         if self.ser and self.ser.is_open:
             self.disconnect()
         try:
-            self.ser = serial.Serial(
-                port=port,
+            # Acepta nombres de puerto y URL de pyserial (p. ej. socket://127.0.0.1:7000 del emulador)
+            self.ser = serial.serial_for_url(
+                port,
                 baudrate=BAUD_RATE,
-                timeout=1
+                timeout=SERIAL_READ_TIMEOUT_S
             )
-            time.sleep(2)
             if self.ser.is_open:
                 self.connected_port = port
                 self.is_reading = True
-                print(f"Conexión serial establecida en {port} a {BAUD_RATE} baudios.")
+                # Abrir el puerto reinicia el ESP32: en lugar de esperar un tiempo fijo se le
+                # piden fotogramas hasta que responde, y esa respuesta ya indica el protocolo.
+                # Solo se negocia aparte si no respondió o si se exige binario y solo habla ASCII
+                ready_protocol = self.wait_until_ready(protocol)
+                if ready_protocol is None:
+                    print(f"El dispositivo no respondió en {DEVICE_READY_TIMEOUT_S:g} s; se sigue esperando datos.")
+                if ready_protocol == "binary" or (ready_protocol == "ascii" and protocol != "binary"):
+                    self._set_protocol(ready_protocol)
+                else:
+                    self.negotiate_protocol(protocol)
+                print(f"Conexión serial establecida en {port} a {BAUD_RATE} baudios (protocolo {self.protocol}).")
                 return True
             else:
                 print(f"No se pudo abrir el puerto {port}.")
@@ -43,6 +78,8 @@ class SerialHandler:
 
     def disconnect(self):
         if self.ser and self.ser.is_open:
+            if self.is_streaming:
+                self.stop_stream()
             self.is_reading = False
             self.ser.close()
             print(f"Conexión serial en {self.connected_port} cerrada.")
@@ -50,65 +87,158 @@ class SerialHandler:
         else:
             print("No hay conexión serial activa para cerrar.")
 
-    def read_data(self):
-        if not self.ser or not self.ser.is_open or not self.is_reading:
+    def wait_until_ready(self, preferred="auto", timeout=DEVICE_READY_TIMEOUT_S):
+        """
+        Sondea el dispositivo tras el reinicio. Los comandos enviados mientras arranca se
+        pierden, así que se repiten cada DEVICE_READY_POLL_S segundos de silencio en la línea
+        (alternando 'B' y 'T' salvo con preferred="ascii"). Los bytes recibidos se pasan a
+        los dos decodificadores: devuelve "binary" con el primer fotograma binario, "ascii" si
+        solo llegan fotogramas ASCII hasta que la línea queda en silencio, o None si el
+        dispositivo no responde a tiempo. Con el primer fotograma ASCII se envía un último 'B':
+        el dispositivo ya ha arrancado y no lo pierde, así que el silencio posterior confirma
+        que el firmware no tiene modo binario y no hace falta negociarlo de nuevo.
+        """
+        decoders = {"binary": BinaryFrameDecoder(self.rows, self.cols),
+                    "ascii": AsciiFrameDecoder(self.rows, self.cols)}
+        probes = [ASCII_FRAME_COMMAND] if preferred == "ascii" else [BINARY_FRAME_COMMAND, ASCII_FRAME_COMMAND]
+        clock = time.monotonic
+        started = clock()
+        next_probe = started
+        last_activity = started
+        ready_protocol = None
+        probes_sent = 0
+        try:
+            while clock() - started < timeout:
+                now = clock()
+                if ready_protocol is None and now >= next_probe:
+                    self.ser.write(probes[probes_sent % len(probes)])
+                    probes_sent += 1
+                    next_probe = now + DEVICE_READY_POLL_S
+                chunk = self.ser.read(self.ser.in_waiting or 1)
+                now = clock()
+                if chunk:
+                    last_activity = now
+                    # Mientras el dispositivo transmite no se le envían más sondeos
+                    next_probe = max(next_probe, now + DEVICE_READY_POLL_S)
+                    if decoders["binary"].feed(chunk):
+                        ready_protocol = "binary"
+                        break
+                    if decoders["ascii"].feed(chunk) and ready_protocol is None:
+                        ready_protocol = "ascii"
+                        if preferred == "ascii":
+                            break
+                        self.ser.write(BINARY_FRAME_COMMAND)
+                elif ready_protocol and now - last_activity >= DEVICE_READY_QUIET_S:
+                    # El 'B' de confirmación ya habría llegado: el firmware solo habla ASCII
+                    break
+            self.ser.reset_input_buffer()
+        except serial.SerialException as e:
+            print(f"Error de lectura serial: {e}")
             return None
+        return ready_protocol
 
-        data_buffer = []
-        in_data_block = False
-        start_time = time.time()
-        max_wait_time = 5
+    def negotiate_protocol(self, preferred="auto"):
+        # Un firmware sin soporte binario ignora el comando 'B': si no llega ningún
+        # fotograma binario válido a tiempo se sigue usando el formato ASCII
+        self._set_protocol("ascii" if preferred == "ascii" else "binary")
+        if self.protocol == "binary":
+            self.ser.reset_input_buffer()
+            self.request_frame()
+            if self.read_data(timeout=PROTOCOL_NEGOTIATION_TIMEOUT_S) is None:
+                if preferred == "binary":
+                    print("El dispositivo no respondió en modo binario. Usando protocolo ASCII.")
+                self._set_protocol("ascii")
+        if self.ser and self.ser.is_open:
+            self.ser.reset_input_buffer()
+        return self.protocol
+
+    def _set_protocol(self, protocol):
+        self.protocol = protocol
+        if protocol == "binary":
+            self.decoder = BinaryFrameDecoder(self.rows, self.cols)
+            self._frame_command = BINARY_FRAME_COMMAND
+        else:
+            self.decoder = AsciiFrameDecoder(self.rows, self.cols)
+            self._frame_command = ASCII_FRAME_COMMAND
+        self._pending_frames.clear()
+        self._expected_sequence = None
+
+    def request_frame(self):
+        if self.ser and self.ser.is_open:
+            self.ser.write(self._frame_command)
+
+    def start_stream(self):
+        # El comando de fotograma fija el formato (ASCII o binario) del flujo continuo
+        if self.ser and self.ser.is_open:
+            self.ser.write(self._frame_command + STREAM_START_COMMAND)
+            self.is_streaming = True
 
-        while (time.time() - start_time) < max_wait_time:
+    def stop_stream(self):
+        if self.ser and self.ser.is_open:
             try:
-                if self.ser.in_waiting > 0:
-                    line = self.ser.readline().decode('utf-8').strip()
-
-                    if line == START_DATA_MARKER:
-                        in_data_block = True
-                        data_buffer = []
-                        continue
-
-                    if line == END_DATA_MARKER:
-                        if in_data_block:
-                            in_data_block = False
-                            if len(data_buffer) == SENSOR_ROWS:
-                                try:
-                                    temp_matrix = []
-                                    for row_str in data_buffer:
-                                        temp_matrix.append([float(x) for x in row_str.split(',')])
-                                    if all(len(row) == SENSOR_COLS for row in temp_matrix):
-                                        temp_array = np.array(temp_matrix, dtype=np.float32)
-                                        self.latest_data = temp_array
-                                        return temp_array
-                                    else:
-                                        print(f"Error: Fila con número incorrecto de columnas. Esperado {SENSOR_COLS}.")
-                                        return None
-                                except ValueError as ve:
-                                    print(f"Error al convertir datos a flotante: {ve}")
-                                    return None
-                            else:
-                                print(f"Error: Número de filas incorrecto. Esperado {SENSOR_ROWS}, Recibido {len(data_buffer)}.")
-                                return None
-                        continue
-
-                    if in_data_block:
-                        data_buffer.append(line)
+                self.ser.write(STREAM_STOP_COMMAND)
+            except serial.SerialException as e:
+                print(f"Error al detener el flujo continuo: {e}")
+        self.is_streaming = False
+
+    def iter_frames(self, timeout=ACQUISITION_READ_TIMEOUT_S):
+        """
+        Generador de fotogramas (Frame) recibidos del puerto.
+        Termina si no llega ningún fotograma en `timeout` segundos o si se pierde la conexión.
+        En modo continuo se omiten los fotogramas ASCII sin número de secuencia: son la
+        respuesta al comando 'T' que start_stream envía antes de 'S' para fijar el formato,
+        y la columna de secuencia de los registros empezaría con un hueco.
+        """
+        while self.is_reading:
+            data = self.read_data(timeout=timeout)
+            if data is None:
+                return
+            if self.is_streaming and self.last_sequence is None:
+                continue
+            yield Frame(data, time.time(), self.last_sequence)
+
+    def read_data(self, timeout=5):
+        if not self.ser or not self.ser.is_open or not self.is_reading:
+            return None
 
+        deadline = time.monotonic() + timeout
+
+        while not self._pending_frames:
+            if time.monotonic() >= deadline:
+                telemetry.count("timeouts")
+                return None
+            try:
+                # Bloquea como máximo SERIAL_READ_TIMEOUT_S si no hay datos: sin espera activa
+                chunk = self.ser.read(self.ser.in_waiting or 1)
             except serial.SerialException as e:
                 print(f"Error de lectura serial: {e}")
                 self.disconnect()
                 return None
-            except UnicodeDecodeError as e:
-                print(f"Error de decodificación Unicode: {e}. Ignorando línea.")
+            if chunk:
+                telemetry.count("serial_bytes", len(chunk))
+                started = telemetry.start()
+                self._pending_frames.extend(self.decoder.feed(chunk))
+                telemetry.stop("parse", started)
 
-        return None
+        self.latest_data, self.last_sequence = self._pending_frames.popleft()
+        self._track_sequence(self.last_sequence)
+        return self.latest_data
+
+    def _track_sequence(self, sequence):
+        if sequence is None:
+            return
+        if self._expected_sequence is not None:
+            gap = (sequence - self._expected_sequence) & 0xFFFFFFFF
+            # Un salto "negativo" indica que el dispositivo se reinició, no una pérdida
+            if gap < 0x80000000:
+                self.dropped_frames += gap
+        self._expected_sequence = (sequence + 1) & 0xFFFFFFFF
 
     def get_latest_data(self):
         return self.latest_data
 
 if __name__ == "__main__":
-    handler = SerialHandler()
+    handler = SerialHandler(rows=None, cols=None)
     ports = handler.list_available_ports()
 
     if not ports:
@@ -119,6 +249,7 @@ if __name__ == "__main__":
         if handler.connect(chosen_port):
             print(f"Intentando leer datos del sensor desde {chosen_port}...")
             for i in range(5):
+                handler.request_frame()
                 data = handler.read_data()
                 if data is not None:
                     print(f"\n--- Paquete {i+1} Recibido ---")
@@ -0,0 +1,147 @@
+import json
+import threading
+import time
+
+import numpy as np
+
+from app_parameters import TELEMETRY_ENABLED, TELEMETRY_WINDOW
+
+perf_counter_ns = time.perf_counter_ns
+
+
+class StageTimer:
+    """
+    Histograma móvil de las últimas `window` duraciones (ns) de una etapa.
+    """
+
+    def __init__(self, window=TELEMETRY_WINDOW):
+        self._values = np.zeros(window, dtype=np.int64)
+        self._next = 0
+
+    def record(self, duration_ns):
+        self._values[self._next % len(self._values)] = duration_ns
+        self._next += 1
+
+    def summary(self):
+        values = self._values[:min(self._next, len(self._values))]
+        if not values.size:
+            return None
+        p50, p99 = np.percentile(values, (50, 99))
+        return {"p50_us": p50 / 1e3, "p99_us": p99 / 1e3, "max_us": values.max() / 1e3, "samples": self._next}
+
+
+class Telemetry:
+    """
+    Temporizadores por etapa, contadores y valores instantáneos del pipeline.
+    Uso en el camino crítico:
+        started = telemetry.start()
+        ...
+        telemetry.stop("parse", started)
+    Desactivada, `start` devuelve 0 y `stop`, `count` y `gauge` retornan de inmediato.
+    `snapshot()` convierte los contadores en tasas por segundo desde la instantánea anterior.
+    """
+
+    def __init__(self, enabled=TELEMETRY_ENABLED, window=TELEMETRY_WINDOW):
+        self.enabled = enabled
+        self.window = window
+        self._stages = {}
+        self._counters = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+        self._last_counters = {}
+        self._last_snapshot = time.perf_counter()
+
+    def start(self):
+        return perf_counter_ns() if self.enabled else 0
+
+    def stop(self, stage, started_ns):
+        if not self.enabled or not started_ns:
+            return
+        timer = self._stages.get(stage)
+        if timer is None:
+            with self._lock:
+                timer = self._stages.setdefault(stage, StageTimer(self.window))
+        timer.record(perf_counter_ns() - started_ns)
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def gauge(self, name, value):
+        if self.enabled:
+            self._gauges[name] = value
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+            self._gauges.clear()
+            self._last_counters = {}
+            self._last_snapshot = time.perf_counter()
+
+    def snapshot(self):
+        now = time.perf_counter()
+        elapsed = max(now - self._last_snapshot, 1e-9)
+        counters = dict(self._counters)
+        rates = {name: (value - self._last_counters.get(name, 0)) / elapsed for name, value in counters.items()}
+        with self._lock:
+            stages = {name: timer.summary() for name, timer in self._stages.items()}
+        self._last_counters = counters
+        self._last_snapshot = now
+        return {
+            "time": time.time(),
+            "interval_s": elapsed,
+            "rates": rates,
+            "counters": counters,
+            "gauges": dict(self._gauges),
+            "stages": {name: summary for name, summary in stages.items() if summary},
+        }
+
+
+def format_status(snapshot):
+    """Resumen de una línea para la barra de estado."""
+    rates = snapshot["rates"]
+    counters = snapshot["counters"]
+    gauges = snapshot["gauges"]
+    parts = [
+        f"Recibidos {rates.get('frames_received', 0):.0f} fps",
+        f"Dibujados {rates.get('frames_rendered', 0):.0f} fps",
+    ]
+    if "serial_bytes" in rates:
+        parts.append(f"Serial {rates['serial_bytes'] / 1024:.1f} KiB/s")
+    parts.append(f"Cola {gauges.get('queue_depth', 0)}")
+    parts.append(f"Perdidos {gauges.get('dropped_frames', 0) + gauges.get('queue_dropped', 0)}")
+    parts.append(f"Sin respuesta {counters.get('timeouts', 0)}")
+    for stage in ("parse", "stats", "render", "paint"):
+        summary = snapshot["stages"].get(stage)
+        if summary:
+            parts.append(f"{stage} p99 {summary['p99_us']:.0f} µs")
+    return " | ".join(parts)
+
+
+class TelemetryLog:
+    """Registro periódico en formato JSON Lines: una instantánea por línea."""
+
+    def __init__(self, path):
+        self._file = open(path, "a")
+
+    def write(self, snapshot):
+        self._file.write(json.dumps(snapshot) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+telemetry = Telemetry()
+
+
+if __name__ == "__main__":
+    import timeit
+
+    number = 200000
+    for enabled in (False, True):
+        probe = Telemetry(enabled)
+        elapsed = timeit.timeit(lambda: probe.stop("etapa", probe.start()), number=number)
+        print(f"Telemetría {'activada' if enabled else 'desactivada'}: {elapsed / number * 1e9:.0f} ns por medición")
+    print(format_status(probe.snapshot()))
@@ -2,14 +2,23 @@
 // Envía una matriz de 8x8 temperaturas aleatorias por el puerto serial
 // SOLAMENTE cuando recibe el comando 'T' (seguido de un salto de línea) desde la terminal.
 // Cada fila de la matriz se envía en una línea separada.
+// Con el comando 'B' envía el mismo fotograma en formato binario compacto.
+// Con 'S' pasa a modo continuo (fotogramas con número de secuencia, en el formato del
+// último comando 'T' o 'B') hasta recibir 'P'.
 
 const int SENSOR_ROWS = 8;  // Filas de la matriz del sensor AMG8833
 const int SENSOR_COLS = 8;  // Columnas de la matriz del sensor AMG8833
 const long BAUD_RATE = 115200; // Velocidad de comunicación serial
 const char* START_DATA_MARKER = "START DATA";
 const char* END_DATA_MARKER = "END DATA";
+const unsigned long STREAM_INTERVAL_MS = 50; // 20 fotogramas por segundo en modo continuo
 
 float temperatureData[SENSOR_ROWS * SENSOR_COLS]; // Array plano para almacenar las temperaturas
+int16_t binaryPayload[SENSOR_ROWS * SENSOR_COLS]; // Temperaturas en centésimas de grado para el modo binario
+uint32_t frameSequence = 0;
+bool binaryMode = false;
+bool streaming = false;
+unsigned long lastStreamFrameMs = 0;
 
 void setup() {
   Serial.begin(BAUD_RATE);
@@ -20,41 +29,104 @@ void setup() {
 }
 
 void loop() {
-  // Solo genera y envía datos si se recibe el comando 'T'
+  // Genera y envía datos al recibir 'T' o 'B', o continuamente tras 'S'
   if (Serial.available()) {
     String command = Serial.readStringUntil('\n'); // Lee hasta el salto de línea
     command.trim(); // Elimina espacios en blanco (incluido el salto de línea)
 
-    if (command.equals("T")) {
-      // Generar datos de temperatura simulados
-      generateSimulatedTemperatureData();
-
-      // Enviar el marcador de inicio
-      Serial.println(START_DATA_MARKER);
-
-      // Enviar los datos de temperatura, una fila por línea
-      for (int r = 0; r < SENSOR_ROWS; r++) {
-        for (int c = 0; c < SENSOR_COLS; c++) {
-          int index = r * SENSOR_COLS + c;
-          Serial.print(temperatureData[index], 2); // Imprimir con 2 decimales
-          if (c < SENSOR_COLS - 1) {
-            Serial.print(","); // Separador CSV dentro de la fila
-          }
-        }
-        Serial.println(); // Salto de línea al final de cada fila
-      }
+    if (command.equals("T") || command.equals("B")) {
+      binaryMode = command.equals("B");
 
-      // Enviar el marcador de fin
-      Serial.println(END_DATA_MARKER);
+      // Generar datos de temperatura simulados y enviarlos
+      generateSimulatedTemperatureData();
+      sendFrame(false);
 
       // Pequeña pausa para simular el tiempo de muestreo del sensor real.
       // Ajusta este valor para controlar la velocidad de actualización.
       // 100 ms = 10 actualizaciones por segundo
       delay(100); 
+    } else if (command.equals("S")) {
+      streaming = true;
+    } else if (command.equals("P")) {
+      streaming = false;
     } else {
       Serial.println("Comando desconocido. Esperando 'T'.");
     }
   }
+
+  // En modo continuo no se espera ninguna petición: se envía a intervalos fijos
+  if (streaming && millis() - lastStreamFrameMs >= STREAM_INTERVAL_MS) {
+    lastStreamFrameMs = millis();
+    generateSimulatedTemperatureData();
+    sendFrame(true);
+  }
+}
+
+void sendFrame(bool withSequence) {
+  if (binaryMode) {
+    sendBinaryFrame(temperatureData, SENSOR_ROWS, SENSOR_COLS, binaryPayload);
+    return;
+  }
+
+  // Enviar el marcador de inicio (con número de secuencia en modo continuo)
+  Serial.print(START_DATA_MARKER);
+  if (withSequence) {
+    Serial.print(" ");
+    Serial.print(frameSequence++);
+  }
+  Serial.println();
+
+  // Enviar los datos de temperatura, una fila por línea
+  for (int r = 0; r < SENSOR_ROWS; r++) {
+    for (int c = 0; c < SENSOR_COLS; c++) {
+      int index = r * SENSOR_COLS + c;
+      Serial.print(temperatureData[index], 2); // Imprimir con 2 decimales
+      if (c < SENSOR_COLS - 1) {
+        Serial.print(","); // Separador CSV dentro de la fila
+      }
+    }
+    Serial.println(); // Salto de línea al final de cada fila
+  }
+
+  // Enviar el marcador de fin
+  Serial.println(END_DATA_MARKER);
+}
+
+// Formato binario (comando 'B'): cabecera de 12 bytes little-endian
+// magic 0xA5 0x5A, filas, columnas, secuencia (uint32) y CRC32 de filas, columnas,
+// secuencia y carga útil; después la carga útil en int16 con centésimas de grado.
+uint32_t crc32Update(uint32_t crc, const uint8_t* data, size_t length) {
+  for (size_t i = 0; i < length; i++) {
+    crc ^= data[i];
+    for (uint8_t bit = 0; bit < 8; bit++) {
+      crc = (crc >> 1) ^ (0xEDB88320UL & (0UL - (crc & 1UL)));
+    }
+  }
+  return crc;
+}
+
+void sendBinaryFrame(const float* values, uint8_t rows, uint8_t cols, int16_t* payload) {
+  uint16_t count = (uint16_t)rows * cols;
+  for (uint16_t i = 0; i < count; i++) {
+    float centi = values[i] * 100.0f;
+    if (centi > 32767.0f) centi = 32767.0f;
+    if (centi < -32768.0f) centi = -32768.0f;
+    payload[i] = (int16_t)lroundf(centi);
+  }
+
+  uint8_t header[12];
+  uint32_t sequence = frameSequence++;
+  header[0] = 0xA5;
+  header[1] = 0x5A;
+  header[2] = rows;
+  header[3] = cols;
+  memcpy(&header[4], &sequence, 4);
+  uint32_t crc = crc32Update(0xFFFFFFFFUL, &header[2], 6);
+  crc = crc32Update(crc, (const uint8_t*)payload, count * 2) ^ 0xFFFFFFFFUL;
+  memcpy(&header[8], &crc, 4);
+
+  Serial.write(header, sizeof(header));
+  Serial.write((const uint8_t*)payload, count * 2);
 }
 
 void generateSimulatedTemperatureData() {
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from alarm_engine import AlarmEngine
+from frame_filter import FrameFilter
+from frame_parser import Frame
+
+
+def _run(engine, values, shape=(8, 8)):
+    states = []
+    for position, value in enumerate(values):
+        data = np.full(shape, 25.0, dtype=np.float32)
+        data[4, 4] = value
+        for event in engine.process(Frame(data, position / 10.0, position)):
+            states.append((position, event.state))
+    return states
+
+
+def test_noise_sigma_widens_threshold_hysteresis():
+    noise = np.full((8, 8), 0.5, dtype=np.float32)
+    rule = {"name": "maxima", "threshold": 40.0, "hysteresis": 0.5, "debounce": 1, "noise_sigma": 4.0}
+    engine = AlarmEngine([rule], noise_source=lambda: noise)
+    # Con ruido de 0.5 °C la histéresis pasa a 2 °C: 39.0 ya no desactiva la alarma, 37.5 sí
+    assert _run(engine, [41.0, 39.0, 39.0, 37.5]) == [(0, "raised"), (3, "cleared")]
+    assert engine.rules[0].band == pytest.approx(2.0)
+
+    plain = AlarmEngine([dict(rule, noise_sigma=0.0)], noise_source=lambda: noise)
+    assert _run(plain, [41.0, 39.0]) == [(0, "raised"), (1, "cleared")]
+
+
+def test_hotspot_hysteresis_follows_per_pixel_noise():
+    noise = np.zeros((8, 8), dtype=np.float32)
+    noise[4, 4] = 1.0
+    rule = {"type": "hotspot", "name": "puntos", "threshold": 40.0, "hysteresis": 0.2, "debounce": 1,
+            "noise_sigma": 3.0}
+    engine = AlarmEngine([rule], noise_source=lambda: noise)
+    assert _run(engine, [41.0, 38.0, 36.5]) == [(0, "raised"), (2, "cleared")]
+
+
+def test_noise_source_from_frame_filter_and_rate_rules_reject_noise_sigma():
+    frame_filter = FrameFilter("none", noise_alpha=0.5)
+    engine = AlarmEngine([{"name": "maxima", "threshold": 40.0, "noise_sigma": 3.0}],
+                         noise_source=frame_filter.noise_std)
+    rng = np.random.default_rng(0)
+    for position in range(50):
+        data = frame_filter.apply(rng.normal(25.0, 0.5, (8, 8)).astype(np.float32))
+        engine.process(Frame(data, position / 10.0, position))
+    assert engine.rules[0].band > engine.rules[0].hysteresis
+
+    with pytest.raises(ValueError):
+        AlarmEngine([{"type": "rate", "name": "subida", "rate": 1.0, "noise_sigma": 3.0}])
@@ -0,0 +1,157 @@
+import numpy as np
+
+from app_parameters import END_DATA_MARKER, START_DATA_MARKER
+from frame_parser import AsciiFrameDecoder, BinaryFrameDecoder, encode_ascii_frame, encode_binary_frame
+
+
+def _frames(count, rows, cols, seed=0):
+    rng = np.random.default_rng(seed)
+    return [np.round(rng.uniform(20, 35, (rows, cols)), 2).astype(np.float32) for _ in range(count)]
+
+
+def test_unterminated_end_marker_delivers_each_frame_back_to_back():
+    # Firmware del MLX90640: "END DATA" sin salto de línea. Cada fotograma debe salir con el
+    # bloque que lo completa, sin esperar al START del siguiente
+    frames = _frames(5, 24, 32)
+    decoder = AsciiFrameDecoder(rows=24, cols=32)
+    for frame, block in ((frame, encode_ascii_frame(frame, terminate_end_marker=False)) for frame in frames):
+        without_end = block[:-len(END_DATA_MARKER)]
+        decoded = decoder.feed(without_end) + decoder.feed(block[len(without_end):])
+        assert len(decoded) == 1
+        assert np.array_equal(decoded[0][0], frame)
+    assert decoder.frames_decoded == 5
+    assert decoder.frames_rejected == 0
+
+
+def test_truncated_frame_resyncs_on_next_start_marker():
+    frames = _frames(2, 8, 8)
+    truncated, complete = map(encode_ascii_frame, frames)
+    decoder = AsciiFrameDecoder(rows=8, cols=8)
+    decoded = decoder.feed(truncated[:len(truncated) // 2] + complete)
+    assert len(decoded) == 1
+    assert np.array_equal(decoded[0][0], frames[1])
+    assert decoder.frames_rejected == 1
+
+
+def test_frame_without_end_marker_is_discarded_past_max_buffer_size():
+    decoder = AsciiFrameDecoder(rows=8, cols=8, max_buffer_size=256)
+    # Sin saltos de línea ni END DATA el fotograma no se completa nunca
+    assert decoder.feed(f"{START_DATA_MARKER}\r\n".encode("ascii") + b"25.00," * 100) == []
+    assert decoder.frames_rejected == 1
+    assert len(decoder._buffer) <= 256
+
+    # Tras descartar, el decodificador sigue funcionando con el siguiente fotograma
+    frame = _frames(1, 8, 8)[0]
+    decoded = decoder.feed(encode_ascii_frame(frame))
+    assert len(decoded) == 1
+    assert np.array_equal(decoded[0][0], frame)
+
+
+def test_random_chunks_decode_every_frame_unchanged():
+    # Captura troceada al azar, como llegaría desde el puerto
+    rng = np.random.default_rng(1)
+    frames = _frames(20, 8, 8)
+    stream = b"".join(map(encode_ascii_frame, frames))
+    decoder = AsciiFrameDecoder(rows=8, cols=8)
+    decoded = []
+    position = 0
+    while position < len(stream):
+        size = int(rng.integers(1, 200))
+        decoded.extend(data for data, _ in decoder.feed(stream[position:position + size]))
+        position += size
+    assert len(decoded) == len(frames)
+    assert all(np.array_equal(a, b) for a, b in zip(decoded, frames))
+    assert decoder.frames_rejected == 0
+
+
+def test_partial_frame_is_kept_between_feeds():
+    frame = _frames(1, 8, 8)[0]
+    capture = encode_ascii_frame(frame)
+    decoder = AsciiFrameDecoder(rows=8, cols=8)
+    # Marcador de inicio partido y filas a medias: nada todavía, pero sin perder bytes
+    assert decoder.feed(capture[:5]) == []
+    assert decoder.feed(capture[5:len(capture) // 2]) == []
+    decoded = decoder.feed(capture[len(capture) // 2:])
+    assert len(decoded) == 1
+    assert np.array_equal(decoded[0][0], frame)
+
+
+def test_leading_garbage_is_skipped():
+    frames = _frames(2, 8, 8)
+    stream = b"Esperando comando 'T' para enviar datos...\r\n\x00\xff" + b"".join(map(encode_ascii_frame, frames))
+    decoder = AsciiFrameDecoder(rows=8, cols=8)
+    decoded = decoder.feed(stream)
+    assert len(decoded) == 2
+    assert all(np.array_equal(a, b) for (a, _), b in zip(decoded, frames))
+    assert decoder.frames_rejected == 0
+
+
+def test_sequence_number_in_ascii_header():
+    frames = _frames(2, 8, 8)
+    decoder = AsciiFrameDecoder(rows=8, cols=8)
+    decoded = decoder.feed(encode_ascii_frame(frames[0], 41) + encode_ascii_frame(frames[1]))
+    assert [sequence for _, sequence in decoded] == [41, None]
+
+
+def test_binary_round_trip_keeps_hundredths_and_sequence():
+    frames = _frames(3, 24, 32)
+    decoder = BinaryFrameDecoder(rows=24, cols=32)
+    decoded = decoder.feed(b"".join(encode_binary_frame(frame, 0xFFFFFFFE + i) for i, frame in enumerate(frames)))
+    assert [sequence for _, sequence in decoded] == [0xFFFFFFFE, 0xFFFFFFFF, 0]
+    for (data, _), frame in zip(decoded, frames):
+        assert data.dtype == np.float32
+        # Mismos valores que el formato ASCII con dos decimales
+        assert np.array_equal(data, frame)
+
+
+def test_binary_frame_split_across_chunks():
+    frame = _frames(1, 24, 32)[0]
+    encoded = encode_binary_frame(frame, 7)
+    decoder = BinaryFrameDecoder(rows=24, cols=32)
+    for cut in (1, 5, 12, len(encoded) - 1):
+        assert decoder.feed(encoded[:cut]) == []
+        decoded = decoder.feed(encoded[cut:])
+        assert len(decoded) == 1
+        assert decoded[0][1] == 7
+        assert np.array_equal(decoded[0][0], frame)
+
+
+def test_binary_bad_crc_is_rejected_and_next_frame_decoded():
+    frames = _frames(2, 8, 8)
+    damaged = bytearray(encode_binary_frame(frames[0], 1))
+    damaged[-1] ^= 0xFF
+    decoder = BinaryFrameDecoder(rows=8, cols=8)
+    decoded = decoder.feed(bytes(damaged) + encode_binary_frame(frames[1], 2))
+    assert [sequence for _, sequence in decoded] == [2]
+    assert np.array_equal(decoded[0][0], frames[1])
+    assert decoder.frames_rejected == 1
+
+
+def test_binary_fake_magic_in_payload_does_not_desync():
+    # 0x5AA5 en little-endian son justo los bytes del "magic": 232,05 °C
+    frame = np.full((8, 8), 20.0, dtype=np.float32)
+    frame[3, 4] = 232.05
+    encoded = encode_binary_frame(frame, 3)
+    assert encoded.count(b"\xa5\x5a") == 2
+    decoder = BinaryFrameDecoder(rows=8, cols=8)
+    decoded = decoder.feed(b"\xa5\x5a\x01" + encoded + encode_binary_frame(frame, 4))
+    assert [sequence for _, sequence in decoded] == [3, 4]
+    assert np.array_equal(decoded[0][0], frame)
+
+
+def test_binary_shape_inferred_from_first_valid_frame():
+    decoder = BinaryFrameDecoder(rows=None, cols=None)
+    frames = _frames(2, 24, 32)
+    decoded = decoder.feed(b"".join(encode_binary_frame(frame, i) for i, frame in enumerate(frames)))
+    assert (decoder.rows, decoder.cols) == (24, 32)
+    assert len(decoded) == 2
+    # Una vez fijada la forma, los fotogramas de otro sensor se ignoran
+    assert decoder.feed(encode_binary_frame(_frames(1, 8, 8)[0], 2)) == []
+
+
+def test_ascii_shape_inferred_from_first_valid_frame():
+    decoder = AsciiFrameDecoder(rows=None, cols=None)
+    frame = _frames(1, 24, 32)[0]
+    decoded = decoder.feed(encode_ascii_frame(frame))
+    assert (decoder.rows, decoder.cols) == (24, 32)
+    assert np.array_equal(decoded[0][0], frame)
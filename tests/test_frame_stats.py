@@ -0,0 +1,27 @@
+import csv
+
+import numpy as np
+
+from frame_parser import Frame
+from frame_stats import FrameStatsEngine, StatsLog, stats_log_path
+
+
+def test_stats_log_writes_one_row_per_frame_with_roi_columns(tmp_path):
+    engine = FrameStatsEngine([{"name": "centro", "rect": (2, 6, 2, 6)}])
+    path = stats_log_path(str(tmp_path / "captura.npy"))
+    assert path.endswith("captura.stats.csv")
+    log = StatsLog(path)
+    for sequence in range(3):
+        data = np.full((8, 8), 25.0, dtype=np.float32)
+        data[3, 4] = 30.0 + sequence
+        log.write(Frame(data, 100.0 + sequence, sequence), engine.compute(data))
+    log.close()
+
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 3
+    assert [row["sequence"] for row in rows] == ["0", "1", "2"]
+    assert float(rows[2]["max"]) == 32.0
+    assert (rows[2]["argmax_row"], rows[2]["argmax_col"]) == ("3", "4")
+    assert float(rows[2]["centro_max"]) == 32.0
+    assert float(rows[2]["centro_min"]) == 25.0
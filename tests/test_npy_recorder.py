@@ -0,0 +1,42 @@
+import json
+
+import numpy as np
+
+from frame_parser import Frame
+from npy_recorder import NpyRecorder, load_recording
+
+
+def _frame(position):
+    return Frame(np.full((8, 8), 20.0 + position, dtype=np.float32), 1000.0 + position, position)
+
+
+def test_interrupted_recording_keeps_frames_up_to_last_sync(tmp_path):
+    # Capacidad inicial 1024: sin sincronización periódica la cabecera seguiría diciendo 0
+    recorder = NpyRecorder(str(tmp_path / "captura.npy"), sync_interval=3600)
+    recorder.start()
+    for position in range(10):
+        recorder.write(_frame(position))
+    recorder.sync()
+    for position in range(10, 15):
+        recorder.write(_frame(position))
+
+    # Sin close(), como tras un corte: se leen los fotogramas hasta el último sync
+    frames, index, metadata = load_recording(str(tmp_path / "captura.npy"))
+    assert len(frames) == len(index) == metadata["frames"] == 10
+    assert index["sequence"].tolist() == list(range(10))
+    assert float(frames[9, 0, 0]) == 29.0
+
+    recorder.close()
+    frames, index, metadata = load_recording(str(tmp_path / "captura.npy"))
+    assert len(frames) == metadata["frames"] == 15
+
+
+def test_recording_syncs_every_interval(tmp_path):
+    recorder = NpyRecorder(str(tmp_path / "captura.npy"), sync_interval=0)
+    recorder.start()
+    for position in range(3):
+        recorder.write(_frame(position))
+    assert np.load(str(tmp_path / "captura.npy"), mmap_mode="r").shape == (3, 8, 8)
+    with open(tmp_path / "captura.json") as f:
+        assert json.load(f)["frames"] == 3
+    recorder.close()
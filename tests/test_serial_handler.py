@@ -0,0 +1,63 @@
+import numpy as np
+import serial
+
+from frame_parser import encode_ascii_frame
+from serial_handler import SerialHandler
+
+
+def _loopback_handler(rows=8, cols=8):
+    # loop:// de pyserial devuelve por lectura lo que se escribe: hace de dispositivo
+    handler = SerialHandler(rows, cols)
+    handler.ser = serial.serial_for_url("loop://", timeout=0.01)
+    handler.is_reading = True
+    return handler
+
+
+def test_sequence_gaps_are_counted_as_dropped_frames():
+    handler = SerialHandler()
+    for sequence in (10, 11, 14, 15, 20):
+        handler._track_sequence(sequence)
+    assert handler.dropped_frames == 2 + 4
+
+
+def test_sequence_wraparound_is_not_a_gap():
+    handler = SerialHandler()
+    for sequence in (0xFFFFFFFE, 0xFFFFFFFF, 0, 1):
+        handler._track_sequence(sequence)
+    assert handler.dropped_frames == 0
+    handler._track_sequence(3)
+    assert handler.dropped_frames == 1
+
+
+def test_device_restart_is_not_counted_as_loss():
+    handler = SerialHandler()
+    for sequence in (500, 501, 0, 1):
+        handler._track_sequence(sequence)
+    assert handler.dropped_frames == 0
+
+
+def test_unsequenced_frames_do_not_reset_tracking():
+    handler = SerialHandler()
+    for sequence in (5, None, 6, None, 8):
+        handler._track_sequence(sequence)
+    assert handler.dropped_frames == 1
+
+
+def test_stream_skips_the_unsequenced_reply_to_the_format_command():
+    handler = _loopback_handler()
+    handler.is_streaming = True
+    frame = np.full((8, 8), 25.0, dtype=np.float32)
+    # Respuesta a 'T' (sin secuencia) y después el flujo continuo
+    handler.ser.write(encode_ascii_frame(frame) + b"".join(encode_ascii_frame(frame, i) for i in (7, 8, 9)))
+    frames = list(handler.iter_frames(timeout=0.2))
+    assert [frame.sequence for frame in frames] == [7, 8, 9]
+    assert handler.dropped_frames == 0
+
+
+def test_request_mode_keeps_unsequenced_frames():
+    handler = _loopback_handler()
+    frame = np.full((8, 8), 25.0, dtype=np.float32)
+    handler.ser.write(encode_ascii_frame(frame) * 2)
+    frames = list(handler.iter_frames(timeout=0.2))
+    assert len(frames) == 2
+    assert all(frame.sequence is None for frame in frames)
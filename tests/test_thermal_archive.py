@@ -0,0 +1,49 @@
+import threading
+import time
+
+import numpy as np
+
+from frame_parser import Frame
+from thermal_archive import ArchiveRecorder, ThermalArchive
+
+
+def _frames(count, shape=(4, 4)):
+    return [Frame(np.full(shape, 20.0 + position / 100, dtype=np.float32), 1000.0 + position, position)
+            for position in range(count)]
+
+
+def test_archive_round_trip(tmp_path):
+    path = str(tmp_path / "captura.thz")
+    recorder = ArchiveRecorder(path, block_frames=8)
+    recorder.start()
+    for frame in _frames(20):
+        recorder.write(frame)
+    recorder.close()
+    assert (recorder.frames_written, recorder.frames_dropped) == (20, 0)
+    with ThermalArchive(path) as archive:
+        data = np.concatenate([chunk for chunk, _, _ in archive.iter_chunks()])
+    assert data.shape == (20, 4, 4)
+    assert float(data[19, 0, 0]) == np.float32(20.19)
+
+
+def test_slow_disk_drops_blocks_instead_of_blocking_the_caller(tmp_path):
+    recorder = ArchiveRecorder(str(tmp_path / "captura.thz"), block_frames=2, submit_timeout=0.01)
+    recorder.start()
+    frames = _frames(40)
+    recorder.write(frames[0])
+    # Disco bloqueado: el hilo escritor no avanza hasta que se libera
+    release = threading.Event()
+    write_block = recorder._writer.write_block
+    recorder._writer.write_block = lambda *block: (release.wait(), write_block(*block))
+
+    started = time.perf_counter()
+    for frame in frames[1:]:
+        recorder.write(frame)
+    elapsed = time.perf_counter() - started
+    assert elapsed < 1.0
+    assert recorder.blocks_dropped > 0
+    assert recorder.frames_dropped == 2 * recorder.blocks_dropped
+
+    release.set()
+    recorder.close()
+    assert recorder.frames_written + recorder.frames_dropped == 40
@@ -0,0 +1,511 @@
+import json
+import lzma
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from app_parameters import (
+    ARCHIVE_CODEC, ARCHIVE_BLOCK_FRAMES, ARCHIVE_BLOCK_MAX_S, ARCHIVE_COMPRESSION_LEVEL, ARCHIVE_PENDING_BLOCKS,
+    ARCHIVE_SUBMIT_TIMEOUT_S
+)
+
+ARCHIVE_CODECS = ("zlib", "lzma")
+# Resolución de los sensores (centésimas de grado, como el "%.2f" del firmware): un int16
+# cubre de -327.68 a 327.67 °C
+ARCHIVE_SCALE = 100
+
+FILE_MAGIC = b"THZ1"
+FILE_HEADER = struct.Struct("<4sI")
+BLOCK_MAGIC = b"TB"
+# Cabecera de cada bloque: marca, predicción, fotogramas, paso de los residuos, bytes comprimidos,
+# primera y última marca de tiempo
+BLOCK_HEADER = struct.Struct("<2sBHHIdd")
+INDEX_MAGIC = b"TIDX"
+TRAILER = struct.Struct("<Q4s")
+TRAILER_MAGIC = b"TEND"
+PREDICT_NONE, PREDICT_TEMPORAL, PREDICT_SPATIAL = 0, 1, 2
+PREDICTORS = (PREDICT_TEMPORAL, PREDICT_SPATIAL, PREDICT_NONE)
+INDEX_DTYPE = np.dtype([("offset", "<u8"), ("first_frame", "<i8"), ("frames", "<u4"),
+                        ("first_timestamp", "<f8"), ("last_timestamp", "<f8")])
+
+
+def quantize(data):
+    """Fotograma(s) en °C -> int16 en centésimas. Devuelve (valores, píxeles fuera de rango)."""
+    scaled = np.rint(np.asarray(data, dtype=np.float64) * ARCHIVE_SCALE)
+    clipped = np.count_nonzero((scaled < -32768) | (scaled > 32767))
+    return np.clip(scaled, -32768, 32767).astype(np.int16), clipped
+
+
+def dequantize(values):
+    # División en float32 de dos valores exactos: el float32 más próximo a la centésima,
+    # el mismo que se obtiene al leer "25.39" del CSV
+    return values.astype(np.float32) / np.float32(ARCHIVE_SCALE)
+
+
+def _compress(payload, codec, level):
+    if codec == "lzma":
+        return lzma.compress(payload, preset=level)
+    return zlib.compress(payload, level)
+
+
+def _predict(frames, predictor):
+    """Residuos int16 (aritmética modular) de la predicción: exactos aunque un salto no quepa en 16 bits."""
+    if predictor == PREDICT_TEMPORAL:
+        # Primer fotograma completo (fotograma clave del bloque) y después la diferencia con el anterior
+        return np.concatenate([frames[:1], np.diff(frames, axis=0)])
+    if predictor == PREDICT_SPATIAL:
+        # Diferencia con el píxel anterior del mismo fotograma: escenas que cambian entre fotogramas
+        return np.concatenate([frames[:, :1], np.diff(frames, axis=1)], axis=1)
+    return frames
+
+
+def _reconstruct(residuals, predictor):
+    if predictor == PREDICT_TEMPORAL:
+        return np.cumsum(residuals, axis=0, dtype=np.int16)
+    if predictor == PREDICT_SPATIAL:
+        return np.cumsum(residuals, axis=1, dtype=np.int16)
+    return residuals
+
+
+def _pack_residuals(residuals):
+    """
+    Residuos -> bytes: se dividen por su paso común (p. ej. 25 con los 0.25 °C del AMG8833),
+    se pasan a zigzag (0, -1, 1, -2... -> 0, 1, 2, 3...) y se separan los bytes bajos de los
+    altos, que con residuos pequeños son casi todos cero y se comprimen mucho mejor.
+    """
+    wide = residuals.astype(np.int32)
+    step = int(np.gcd.reduce(wide.ravel())) or 1
+    if step > 1:
+        wide //= step
+    zigzag = ((wide << 1) ^ (wide >> 31)).astype(np.uint16)
+    planes = zigzag.view(np.uint8).reshape(len(zigzag), -1, 2).transpose(2, 0, 1)
+    return step, np.ascontiguousarray(planes).tobytes()
+
+
+def _unpack_residuals(data, step, count, pixels):
+    planes = np.frombuffer(data, dtype=np.uint8).reshape(2, count, pixels)
+    zigzag = np.ascontiguousarray(planes.transpose(1, 2, 0)).view("<u2").reshape(count, pixels).astype(np.int32)
+    wide = (zigzag >> 1) ^ -(zigzag & 1)
+    if step > 1:
+        wide *= step
+    return wide.astype(np.int16)
+
+
+def encode_block(values, timestamps, sequences, codec=ARCHIVE_CODEC, level=ARCHIVE_COMPRESSION_LEVEL):
+    """
+    Comprime un bloque de valores int16 (n, filas, columnas). Se prueban las tres
+    predicciones con zlib rápido y se guarda la que ocupa menos: la temporal gana con escenas
+    estables, la espacial con escenas en movimiento y la directa con valores muy repetidos.
+    Devuelve (predicción, paso, bytes comprimidos).
+    """
+    frames = values.reshape(len(values), -1)
+    candidates = []
+    for predictor in PREDICTORS:
+        step, packed = _pack_residuals(_predict(frames, predictor))
+        candidates.append((len(zlib.compress(packed, 1)), predictor, step, packed))
+    _, predictor, step, packed = min(candidates, key=lambda candidate: candidate[0])
+    payload = b"".join((np.asarray(timestamps, dtype="<f8").tobytes(), np.asarray(sequences, dtype="<i8").tobytes(),
+                        packed))
+    return predictor, step, _compress(payload, codec, level)
+
+
+def decode_block(compressed, count, shape, predictor, step, codec=ARCHIVE_CODEC):
+    """Inverso de encode_block: (valores int16 (n, filas, columnas), marcas de tiempo, secuencias)."""
+    payload = lzma.decompress(compressed) if codec == "lzma" else zlib.decompress(compressed)
+    timestamps = np.frombuffer(payload, dtype="<f8", count=count)
+    sequences = np.frombuffer(payload, dtype="<i8", count=count, offset=8 * count)
+    residuals = _unpack_residuals(payload[16 * count:], step, count, int(np.prod(shape)))
+    values = _reconstruct(residuals, predictor)
+    return values.reshape((count,) + tuple(shape)), timestamps, sequences
+
+
+class ArchiveWriter:
+    """
+    Archivo .thz: cabecera JSON, bloques independientes (cada uno empieza con un fotograma
+    clave) y, al cerrar, un índice de bloques para el acceso aleatorio. Cada bloque lleva su
+    propia cabecera, así que un archivo sin cerrar (corte de luz) se puede leer igualmente
+    recorriendo los bloques. Escritura síncrona: ArchiveRecorder la lleva a un hilo.
+    """
+
+    def __init__(self, path, shape, codec=ARCHIVE_CODEC, level=ARCHIVE_COMPRESSION_LEVEL, started_at=None):
+        if codec not in ARCHIVE_CODECS:
+            raise ValueError(f"Compresión desconocida: {codec}. Opciones: {', '.join(ARCHIVE_CODECS)}")
+        self.path = path
+        self.shape = tuple(shape)
+        self.codec = codec
+        self.level = level
+        self.frames_written = 0
+        self.bytes_written = 0
+        self._index = []
+        self._file = open(path, "wb")
+        header = json.dumps({
+            "format": "thermal-archive",
+            "version": 1,
+            "sensor_shape": list(self.shape),
+            "scale": ARCHIVE_SCALE,
+            "codec": codec,
+            "started_at": started_at,
+        }).encode("utf-8")
+        self._write(FILE_HEADER.pack(FILE_MAGIC, len(header)) + header)
+
+    def _write(self, data):
+        self._file.write(data)
+        self.bytes_written += len(data)
+
+    def write_block(self, values, timestamps, sequences):
+        """Añade un bloque de valores int16 (n, filas, columnas) ya cuantizados."""
+        count = len(values)
+        if not count:
+            return
+        predictor, step, compressed = encode_block(values, timestamps, sequences, self.codec, self.level)
+        offset = self.bytes_written
+        first_timestamp, last_timestamp = float(timestamps[0]), float(timestamps[-1])
+        self._write(BLOCK_HEADER.pack(BLOCK_MAGIC, predictor, count, step, len(compressed), first_timestamp,
+                                      last_timestamp))
+        self._write(compressed)
+        self._file.flush()
+        self._index.append((offset, self.frames_written, count, first_timestamp, last_timestamp))
+        self.frames_written += count
+
+    def close(self):
+        if self._file is None:
+            return
+        index_offset = self.bytes_written
+        self._write(INDEX_MAGIC + np.array(self._index, dtype=INDEX_DTYPE).tobytes())
+        self._write(TRAILER.pack(index_offset, TRAILER_MAGIC))
+        self._file.close()
+        self._file = None
+
+
+class ArchiveRecorder:
+    """
+    Grabación comprimida (.thz) con la interfaz de CsvRecorder / NpyRecorder. `write`
+    cuantiza el fotograma en el bloque en curso; los bloques completos (ARCHIVE_BLOCK_FRAMES
+    fotogramas o ARCHIVE_BLOCK_MAX_S segundos, lo que llegue antes) se comprimen y escriben
+    en un hilo de fondo. Un corte pierde como mucho el bloque en curso. `write` no espera
+    al disco más de `submit_timeout` segundos: si el hilo escritor acumula ARCHIVE_PENDING_BLOCKS
+    bloques, el bloque nuevo se descarta y se cuenta en `blocks_dropped` y `frames_dropped`
+    (que también cuenta los fotogramas con una forma distinta a la del primero).
+    """
+
+    def __init__(self, file_path, codec=ARCHIVE_CODEC, block_frames=ARCHIVE_BLOCK_FRAMES,
+                 block_seconds=ARCHIVE_BLOCK_MAX_S, submit_timeout=ARCHIVE_SUBMIT_TIMEOUT_S):
+        self.file_path = file_path
+        self.codec = codec
+        self.block_frames = block_frames
+        self.block_seconds = block_seconds
+        self.submit_timeout = submit_timeout
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.blocks_dropped = 0
+        self.pixels_clipped = 0
+        self.error = None
+        self._writer = None
+        self._thread = None
+        self._blocks = queue.Queue(maxsize=ARCHIVE_PENDING_BLOCKS)
+        self._values = None
+        self._timestamps = None
+        self._sequences = None
+        self._count = 0
+        self._block_started = None
+        self._started_at = None
+
+    def start(self):
+        # Se comprueba la ruta de inmediato; la cabecera se escribe con el primer fotograma
+        open(self.file_path, "wb").close()
+        self._started_at = time.time()
+
+    def write(self, frame):
+        if self.error:
+            return
+        data = frame.data
+        if self._writer is None:
+            try:
+                self._writer = ArchiveWriter(self.file_path, data.shape, self.codec, started_at=self._started_at)
+            except (IOError, OSError) as e:
+                self.error = f"Error al escribir el archivo comprimido: {e}"
+                return
+            self._allocate(data.shape)
+            self._thread = threading.Thread(target=self._run, name="ArchiveRecorder", daemon=True)
+            self._thread.start()
+        elif data.shape != self._values.shape[1:]:
+            print(f"Aviso: fotograma {data.shape} descartado; la grabación usa {self._values.shape[1:]}.")
+            self.frames_dropped += 1
+            return
+        values, clipped = quantize(data)
+        if clipped:
+            self.pixels_clipped += clipped
+        slot = self._count
+        self._values[slot] = values
+        self._timestamps[slot] = frame.timestamp
+        self._sequences[slot] = -1 if frame.sequence is None else frame.sequence
+        self._count += 1
+        if self._block_started is None:
+            self._block_started = time.monotonic()
+        if self._count == self.block_frames or time.monotonic() - self._block_started >= self.block_seconds:
+            self._submit_block()
+
+    @property
+    def pending_blocks(self):
+        """Bloques a la espera del hilo escritor (ARCHIVE_PENDING_BLOCKS como máximo)."""
+        return self._blocks.qsize()
+
+    def close(self):
+        if self._writer is None:
+            return
+        # Al cerrar sí se espera al disco: el último bloque no se descarta
+        self._submit_block(wait=True)
+        self._blocks.put(None)
+        self._thread.join()
+        self._thread = None
+        try:
+            self._writer.close()
+        except (IOError, OSError) as e:
+            self.error = f"Error al escribir el archivo comprimido: {e}"
+        self._writer = None
+
+    def _allocate(self, shape):
+        self._values = np.empty((self.block_frames,) + tuple(shape), dtype=np.int16)
+        self._timestamps = np.empty(self.block_frames, dtype=np.float64)
+        self._sequences = np.empty(self.block_frames, dtype=np.int64)
+
+    def _submit_block(self, wait=False):
+        count = self._count
+        if not count:
+            return
+        self._count = 0
+        self._block_started = None
+        try:
+            # write() se llama desde el hilo de la interfaz: la espera por un disco lento está acotada
+            self._blocks.put((self._values[:count], self._timestamps[:count], self._sequences[:count]),
+                             timeout=None if wait else self.submit_timeout)
+        except queue.Full:
+            # El bloque se descarta y sus arrays se reutilizan para el siguiente
+            self.blocks_dropped += 1
+            self.frames_dropped += count
+            print(f"Aviso: el disco no da abasto; bloque de {count} fotogramas descartado "
+                  f"({self.blocks_dropped} bloques descartados).")
+            return
+        # El hilo escritor se queda con los arrays: el bloque siguiente usa otros nuevos
+        self._allocate(self._values.shape[1:])
+
+    def _run(self):
+        while True:
+            block = self._blocks.get()
+            if block is None:
+                return
+            if self.error:
+                continue
+            try:
+                self._writer.write_block(*block)
+                self.frames_written = self._writer.frames_written
+            except (IOError, OSError) as e:
+                self.error = f"Error al escribir el archivo comprimido: {e}"
+                print(self.error)
+
+
+class ThermalArchive:
+    """
+    Lectura de un archivo .thz con acceso aleatorio por número de fotograma (`read`,
+    `frame`) o por marca de tiempo (`find_time`). Solo se descomprimen los bloques
+    necesarios; el último se conserva para lecturas consecutivas. Los valores se devuelven
+    en float32, idénticos a los de un CSV con dos decimales.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        header = self._file.read(FILE_HEADER.size)
+        magic, header_length = FILE_HEADER.unpack(header) if len(header) == FILE_HEADER.size else (None, 0)
+        if magic != FILE_MAGIC:
+            self._file.close()
+            raise ValueError(f"'{path}' no es un archivo comprimido de la cámara térmica.")
+        self.metadata = json.loads(self._file.read(header_length))
+        self.shape = tuple(self.metadata["sensor_shape"])
+        self.codec = self.metadata["codec"]
+        self._data_start = FILE_HEADER.size + header_length
+        self.index = self._read_index()
+        self._cached = None
+
+    def _read_index(self):
+        size = os.fstat(self._file.fileno()).st_size
+        if size >= self._data_start + TRAILER.size:
+            self._file.seek(size - TRAILER.size)
+            index_offset, magic = TRAILER.unpack(self._file.read(TRAILER.size))
+            if magic == TRAILER_MAGIC and self._data_start <= index_offset < size:
+                self._file.seek(index_offset)
+                if self._file.read(len(INDEX_MAGIC)) == INDEX_MAGIC:
+                    raw = self._file.read(size - TRAILER.size - index_offset - len(INDEX_MAGIC))
+                    return np.frombuffer(raw, dtype=INDEX_DTYPE)
+        return self._scan_blocks(size)
+
+    def _scan_blocks(self, size):
+        """Archivo sin cerrar: el índice se reconstruye con las cabeceras de los bloques completos."""
+        entries = []
+        offset = self._data_start
+        first_frame = 0
+        while offset + BLOCK_HEADER.size <= size:
+            self._file.seek(offset)
+            magic, _, count, _, length, first_timestamp, last_timestamp = BLOCK_HEADER.unpack(
+                self._file.read(BLOCK_HEADER.size))
+            if magic != BLOCK_MAGIC or offset + BLOCK_HEADER.size + length > size:
+                break
+            entries.append((offset, first_frame, count, first_timestamp, last_timestamp))
+            first_frame += count
+            offset += BLOCK_HEADER.size + length
+        return np.array(entries, dtype=INDEX_DTYPE)
+
+    def __len__(self):
+        if not len(self.index):
+            return 0
+        return int(self.index["first_frame"][-1] + self.index["frames"][-1])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def read_block(self, block):
+        """(valores float32 (n, filas, columnas), marcas de tiempo, secuencias) de un bloque."""
+        if self._cached is not None and self._cached[0] == block:
+            return self._cached[1]
+        entry = self.index[block]
+        self._file.seek(int(entry["offset"]))
+        _, predictor, count, step, length, _, _ = BLOCK_HEADER.unpack(self._file.read(BLOCK_HEADER.size))
+        values, timestamps, sequences = decode_block(self._file.read(length), count, self.shape, predictor, step,
+                                                     self.codec)
+        decoded = dequantize(values), timestamps, sequences
+        self._cached = block, decoded
+        return decoded
+
+    def read(self, start=0, stop=None):
+        """Fotogramas [start, stop): (datos float32, marcas de tiempo, secuencias)."""
+        total = len(self)
+        stop = total if stop is None else min(stop, total)
+        start = max(0, start)
+        if start >= stop:
+            return (np.empty((0,) + self.shape, dtype=np.float32), np.empty(0), np.empty(0, dtype=np.int64))
+        first_frames = self.index["first_frame"]
+        first_block = int(np.searchsorted(first_frames, start, side="right")) - 1
+        last_block = int(np.searchsorted(first_frames, stop - 1, side="right")) - 1
+        parts = []
+        for block in range(first_block, last_block + 1):
+            data, timestamps, sequences = self.read_block(block)
+            offset = int(first_frames[block])
+            window = slice(max(start - offset, 0), min(stop - offset, len(data)))
+            parts.append((data[window], timestamps[window], sequences[window]))
+        if len(parts) == 1:
+            return parts[0]
+        return tuple(np.concatenate(column) for column in zip(*parts))
+
+    def frame(self, position):
+        data, timestamps, sequences = self.read(position, position + 1)
+        if not len(data):
+            raise IndexError(f"Fotograma {position} fuera de rango (0-{len(self) - 1}).")
+        return data[0], float(timestamps[0]), int(sequences[0])
+
+    def find_time(self, timestamp):
+        """Número del primer fotograma con marca de tiempo >= `timestamp` (len(self) si no hay)."""
+        block = int(np.searchsorted(self.index["last_timestamp"], timestamp, side="left"))
+        if block >= len(self.index):
+            return len(self)
+        _, timestamps, _ = self.read_block(block)
+        return int(self.index["first_frame"][block] + np.searchsorted(timestamps, timestamp, side="left"))
+
+    def iter_chunks(self):
+        """Recorre el archivo bloque a bloque: (datos, marcas de tiempo, secuencias)."""
+        for block in range(len(self.index)):
+            yield self.read_block(block)
+
+
+def convert_to_archive(source, archive_path, codec=ARCHIVE_CODEC, block_frames=ARCHIVE_BLOCK_FRAMES):
+    """Registro CSV de píxeles o grabación .npy -> .thz. Devuelve el número de fotogramas."""
+    if source.lower().endswith(".npy"):
+        from npy_recorder import load_recording
+
+        frames, index, metadata = load_recording(source)
+        shape = frames.shape[1:]
+        started_at = metadata.get("started_at")
+        chunks = ((np.asarray(frames[start:start + block_frames]), index["timestamp"][start:start + block_frames],
+                   index["sequence"][start:start + block_frames]) for start in range(0, len(frames), block_frames))
+    else:
+        from log_reader import read_log_info, iter_frames
+
+        shape = read_log_info(source).shape
+        started_at = None
+        chunks = ((chunk.data, chunk.timestamps, chunk.sequences) for chunk in iter_frames(source, block_frames))
+
+    writer = ArchiveWriter(archive_path, shape, codec, started_at=started_at)
+    clipped = 0
+    try:
+        for data, timestamps, sequences in chunks:
+            values, chunk_clipped = quantize(data)
+            clipped += chunk_clipped
+            writer.write_block(values, timestamps, sequences)
+    finally:
+        writer.close()
+    if clipped:
+        print(f"Aviso: {clipped} valores fuera de ±327 °C recortados.")
+    return writer.frames_written
+
+
+def archive_to_csv(archive_path, csv_path):
+    from csv_recorder import csv_header
+
+    with ThermalArchive(archive_path) as archive:
+        pixel_count = int(np.prod(archive.shape))
+        row_format = ",".join(["%.3f", "%d"] + ["%.2f"] * pixel_count) + "\n"
+        with open(csv_path, "w", newline="") as f:
+            f.write(",".join(csv_header(pixel_count)) + "\n")
+            for data, timestamps, sequences in archive.iter_chunks():
+                f.write("".join(
+                    row_format % (timestamp, sequence, *values)
+                    for timestamp, sequence, values in zip(timestamps.tolist(), sequences.tolist(),
+                                                           data.reshape(len(data), -1).astype(np.float64).tolist())
+                ))
+        return len(archive)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Archivo comprimido sin pérdidas (.thz) de grabaciones térmicas")
+    parser.add_argument("command", choices=["to-archive", "to-csv", "info"])
+    parser.add_argument("source", help="CSV de píxeles o .npy (to-archive) / archivo .thz (to-csv, info)")
+    parser.add_argument("destination", nargs="?")
+    parser.add_argument("--codec", choices=ARCHIVE_CODECS, default=ARCHIVE_CODEC)
+    args = parser.parse_args()
+
+    if args.command == "info":
+        with ThermalArchive(args.source) as archive:
+            count = len(archive)
+            size = os.path.getsize(args.source)
+            raw = count * int(np.prod(archive.shape)) * 4
+            print(f"{args.source}: {count} fotogramas {archive.shape[0]}x{archive.shape[1]}, "
+                  f"{len(archive.index)} bloques ({archive.codec})")
+            if count:
+                duration = archive.index["last_timestamp"][-1] - archive.index["first_timestamp"][0]
+                print(f"  {duration:.1f} s registrados, {size / 1024:.0f} KiB, {size / count:.0f} bytes por fotograma "
+                      f"({raw / size:.1f}x frente a float32)")
+    elif not args.destination:
+        parser.error("falta el archivo de destino")
+    else:
+        started = time.perf_counter()
+        if args.command == "to-archive":
+            count = convert_to_archive(args.source, args.destination, args.codec)
+        else:
+            count = archive_to_csv(args.source, args.destination)
+        elapsed = time.perf_counter() - started
+        print(f"{count} fotogramas convertidos en {elapsed:.1f} s: {args.source} -> {args.destination}")
+        if args.command == "to-archive":
+            ratio = os.path.getsize(args.source) / max(1, os.path.getsize(args.destination))
+            print(f"  {ratio:.1f} veces más pequeño que el original")